@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LocalidadesBrasileirasConfig(AppConfig):
     name = 'controle_colaboradores_api.apps.localidades_brasileiras'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,29 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import UnidadeFederativa, Municipio
+
+CHAVE_DA_VERSAO_DOS_DADOS = 'localidades_brasileiras:versao'
+
+
+def obter_versao_dos_dados():
+    """
+    Identificador da versão atual dos dados de UFs e municípios, mantido em cache
+    até que os dados sejam alterados (vide invalidar_versao_dos_dados).
+    """
+    versao = cache.get(CHAVE_DA_VERSAO_DOS_DADOS)
+    if versao is None:
+        agregados = [
+            model.objects.aggregate(quantidade=Count('id'), ultima_modificacao=Max('modificacao'))
+            for model in (UnidadeFederativa, Municipio)
+        ]
+        versao = hashlib.sha256(repr(agregados).encode()).hexdigest()[:32]
+        cache.set(CHAVE_DA_VERSAO_DOS_DADOS, versao, settings.LOCALIDADES_CACHE_TIMEOUT)
+    return versao
+
+
+def invalidar_versao_dos_dados():
+    cache.delete(CHAVE_DA_VERSAO_DOS_DADOS)
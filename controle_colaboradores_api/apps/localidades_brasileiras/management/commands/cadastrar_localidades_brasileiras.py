@@ -1,93 +1,170 @@
 import csv
+import hashlib
+import io
+from pathlib import Path
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.utils import timezone
 
-from controle_colaboradores_api.apps.localidades_brasileiras.models import UnidadeFederativa, Municipio
+from controle_colaboradores_api.cache_de_respostas import invalidar_respostas
+from controle_colaboradores_api.apps.localidades_brasileiras.cache import invalidar_versao_dos_dados
+from controle_colaboradores_api.apps.localidades_brasileiras.models import (
+    UnidadeFederativa,
+    Municipio,
+    VersaoDeDados,
+    normalizar_para_busca
+)
+from controle_colaboradores_api.apps.localidades_brasileiras.signals import localidades_atualizadas_em_lote
+
+DIRETORIO_DOS_DADOS = Path(__file__).resolve().parents[2] / 'dados'
+ARQUIVO_UFS = 'unidades_federativas.csv'
+ARQUIVO_MUNICIPIOS = 'municipios.csv'
+TAMANHO_DO_LOTE = 1000
 
 
 class Command(BaseCommand):
-    help = "Cadastra ou confirma a existência das localidades brasileiras no banco de dados."
+    help = "Cadastra ou confirma a existência das localidades brasileiras no banco de dados. " \
+           "Arquivos de dados inalterados desde a última execução são ignorados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcar',
+                            action='store_true',
+                            help="Sincroniza todos os arquivos, mesmo os que não foram alterados.")
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        self._cadastrar_unidades_federativas()
-        self._cadastrar_municipios()
-        self._relacionar_capitais_com_ufs()
+        conteudos = {arquivo: (DIRETORIO_DOS_DADOS / arquivo).read_bytes()
+                     for arquivo in (ARQUIVO_UFS, ARQUIVO_MUNICIPIOS)}
+        hashes = {arquivo: hashlib.sha256(conteudo).hexdigest() for arquivo, conteudo in conteudos.items()}
+
+        if options.get('forcar'):
+            arquivos_alterados = set(hashes)
+        else:
+            hashes_carregados = dict(VersaoDeDados.objects.values_list('arquivo', 'hash_do_conteudo'))
+            arquivos_alterados = {arquivo for arquivo, hash_do_conteudo in hashes.items()
+                                  if hashes_carregados.get(arquivo) != hash_do_conteudo}
+        if not arquivos_alterados:
+            self.stdout.write("-- Localidades brasileiras já estavam atualizadas.")
+            return "Fim da execução bem sucedida."
+
+        self.uf_ids_alteradas, self.municipio_ids_alterados = set(), set()
+        with transaction.atomic():
+            linhas_ufs = self._ler_csv(conteudos[ARQUIVO_UFS])
+            if ARQUIVO_UFS in arquivos_alterados:
+                self._cadastrar_unidades_federativas(linhas_ufs)
+            if ARQUIVO_MUNICIPIOS in arquivos_alterados:
+                self._cadastrar_municipios(self._ler_csv(conteudos[ARQUIVO_MUNICIPIOS]))
+            self._relacionar_capitais_com_ufs(linhas_ufs)
+            for arquivo in arquivos_alterados:
+                VersaoDeDados.objects.update_or_create(arquivo=arquivo,
+                                                       defaults={'hash_do_conteudo': hashes[arquivo]})
+            # bulk_create e bulk_update não disparam os signals que invalidam os caches e os
+            # documentos dos perfis que representam as localidades alteradas
+            transaction.on_commit(invalidar_versao_dos_dados)
+            for model in (UnidadeFederativa, Municipio):
+                invalidar_respostas(model)
+            if self.uf_ids_alteradas or self.municipio_ids_alterados:
+                localidades_atualizadas_em_lote.send(sender=self.__class__,
+                                                     uf_ids=self.uf_ids_alteradas,
+                                                     municipio_ids=self.municipio_ids_alterados)
         self.stdout.write(self.style.SUCCESS(f"-- Localidades brasileiras registradas/atualizadas com sucesso."))
         return "Fim da execução bem sucedida."
 
+    @staticmethod
+    def _ler_csv(conteudo):
+        leitor = csv.reader(io.StringIO(conteudo.decode('utf-8')))
+        next(leitor)  # ignora o cabeçalho
+        return list(leitor)
+
+    def _sincronizar(self, model, dados_por_cod_ibge):
+        """
+        Cria ou atualiza, em lotes, os registros do model identificados pelo cod_ibge,
+        sem executar queries por linha. Registros já atualizados não são modificados.
+        Retorna a quantidade de registros criados e os ids dos atualizados.
+        """
+        existentes = {obj.cod_ibge: obj for obj in model.objects.all()}
+        campos = list(next(iter(dados_por_cod_ibge.values())))
+        agora = timezone.now()
+
+        novos, alterados = [], []
+        for cod_ibge, dados in dados_por_cod_ibge.items():
+            obj = existentes.get(cod_ibge)
+            if obj is None:
+                novos.append(model(cod_ibge=cod_ibge, **dados))
+            elif any(getattr(obj, campo) != valor for campo, valor in dados.items()):
+                for campo, valor in dados.items():
+                    setattr(obj, campo, valor)
+                obj.modificacao = agora
+                alterados.append(obj)
+
+        model.objects.bulk_create(novos, batch_size=TAMANHO_DO_LOTE)
+        model.objects.bulk_update(alterados, campos + ['modificacao'], batch_size=TAMANHO_DO_LOTE)
+        return len(novos), [obj.id for obj in alterados]
+
     @transaction.atomic
-    def _cadastrar_unidades_federativas(self):
+    def _cadastrar_unidades_federativas(self, linhas):
         try:
-            with open('controle_colaboradores_api/apps/localidades_brasileiras/dados/unidades_federativas.csv') as f:
-                leitor = csv.reader(f)
-                next(leitor)  # ignora o cabeçalho
-                for row in leitor:
-                    obj, created = UnidadeFederativa.objects.get_or_create(
-                        cod_ibge=row[0],
-                        sigla=row[1],
-                        nome=row[2],
-                        latitude=row[3],
-                        longitude=row[4]
-                    )
-                    if created:
-                        self.stdout.write(self.style.SUCCESS(f"UF {row[2]} cadastrada."))
-                    else:
-                        self.stdout.write(f"UF {row[2]} não precisou ser cadastrada pois já existe.")
+            dados_por_cod_ibge = {
+                row[0]: {
+                    'sigla': row[1],
+                    'nome': row[2],
+                    'latitude': row[3],
+                    'longitude': row[4]
+                } for row in linhas
+            }
+            cadastradas, ids_atualizadas = self._sincronizar(UnidadeFederativa, dados_por_cod_ibge)
+            self.uf_ids_alteradas.update(ids_atualizadas)
+            atualizadas = len(ids_atualizadas)
+            self.stdout.write(f"UFs: {cadastradas} cadastradas, {atualizadas} atualizadas, "
+                              f"{len(linhas) - cadastradas - atualizadas} já existentes.")
         except Exception as e:
             print(f"Ocorreu um erro no cadastro de Unidades Federativas: {repr(e)}")
             raise
 
     @transaction.atomic
-    def _cadastrar_municipios(self):
+    def _cadastrar_municipios(self, linhas):
         try:
-            with open('controle_colaboradores_api/apps/localidades_brasileiras/dados/municipios.csv') as f:
-                leitor = csv.reader(f)
-                next(leitor)  # ignora o cabeçalho
-                for row in leitor:
-                    uf = UnidadeFederativa.objects.get(cod_ibge=row[4])
-                    obj, created = Municipio.objects.get_or_create(
-                        cod_ibge=row[0],
-                        nome=row[1],
-                        latitude=row[2],
-                        longitude=row[3],
-                        uf=uf,
-                        cod_siafi=row[5],
-                        ddd=row[6],
-                        fuso_horario=row[7]
-                        )
-                    if created:
-                        self.stdout.write(self.style.SUCCESS(f"Município {row[1]} cadastrado."))
-                    else:
-                        self.stdout.write(f"Município {row[1]} não precisou ser cadastrado pois já existe.")
+            ufs_por_cod_ibge = dict(UnidadeFederativa.objects.values_list('cod_ibge', 'id'))
+            dados_por_cod_ibge = {
+                row[0]: {
+                    'nome': row[1],
+                    'nome_normalizado': normalizar_para_busca(row[1]),
+                    'latitude': row[2],
+                    'longitude': row[3],
+                    'uf_id': ufs_por_cod_ibge[row[4]],
+                    'cod_siafi': row[5],
+                    'ddd': int(row[6]),
+                    'fuso_horario': row[7]
+                } for row in linhas
+            }
+            cadastrados, ids_atualizados = self._sincronizar(Municipio, dados_por_cod_ibge)
+            self.municipio_ids_alterados.update(ids_atualizados)
+            atualizados = len(ids_atualizados)
+            self.stdout.write(f"Municípios: {cadastrados} cadastrados, {atualizados} atualizados, "
+                              f"{len(linhas) - cadastrados - atualizados} já existentes.")
         except Exception as e:
             print(f"Ocorreu um erro no cadastro de Municípios: {repr(e)}")
             raise
 
     @transaction.atomic
-    def _relacionar_capitais_com_ufs(self):
+    def _relacionar_capitais_com_ufs(self, linhas):
         try:
-            with open('controle_colaboradores_api/apps/localidades_brasileiras/dados/unidades_federativas.csv') as f:
-                leitor = csv.reader(f)
-                next(leitor)  # ignora o cabeçalho
-                for row in leitor:
-                    codigo_ibge_uf = row[0]
-                    codigo_ibge_capital = row[5]
-
-                    uf = UnidadeFederativa.objects.get(cod_ibge=codigo_ibge_uf)
-                    capital = Municipio.objects.get(cod_ibge=codigo_ibge_capital)
-                    if uf.capital != capital:
-                        uf.capital = capital
-                        uf.save(update_fields=['capital'])
-                        self.stdout.write(self.style.SUCCESS(f"Capital da UF {uf.nome} foi atualizada para:"
-                                                             f" {capital.nome}."))
-                    else:
-                        self.stdout.write(f"Capital da UF {uf.nome} não precisou ser modificada pois"
-                                          f" já estava atualizada.")
+            codigos_ibge_capitais = {row[0]: row[5] for row in linhas}
+            municipios_por_cod_ibge = dict(Municipio.objects.filter(
+                cod_ibge__in=codigos_ibge_capitais.values()
+            ).values_list('cod_ibge', 'id'))
+
+            ufs_alteradas = []
+            for uf in UnidadeFederativa.objects.filter(cod_ibge__in=codigos_ibge_capitais):
+                capital_id = municipios_por_cod_ibge[codigos_ibge_capitais[uf.cod_ibge]]
+                if uf.capital_id != capital_id:
+                    uf.capital_id = capital_id
+                    ufs_alteradas.append(uf)
+
+            UnidadeFederativa.objects.bulk_update(ufs_alteradas, ['capital'])
+            self.uf_ids_alteradas.update(uf.id for uf in ufs_alteradas)
+            self.stdout.write(f"Capitais: {len(ufs_alteradas)} atualizadas, "
+                              f"{len(linhas) - len(ufs_alteradas)} já atualizadas.")
         except Exception as e:
             print(f"Ocorreu um erro no cadastro das capitais de Unidades Federativas: {repr(e)}")
             raise
-
-
-
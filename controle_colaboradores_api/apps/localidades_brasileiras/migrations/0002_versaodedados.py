@@ -0,0 +1,27 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localidades_brasileiras', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDeDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criacao', models.DateTimeField(auto_now_add=True, verbose_name='Criação')),
+                ('modificacao', models.DateTimeField(auto_now=True, verbose_name='Modificação')),
+                ('arquivo', models.CharField(max_length=200, unique=True, verbose_name='Arquivo')),
+                ('hash_do_conteudo', models.CharField(max_length=64, verbose_name='Hash SHA-256 do conteúdo')),
+            ],
+            options={
+                'verbose_name': 'Versão de dados',
+                'verbose_name_plural': 'Versões de dados',
+            },
+        ),
+    ]
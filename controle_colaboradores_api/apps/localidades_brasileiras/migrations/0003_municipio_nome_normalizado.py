@@ -0,0 +1,35 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:26
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar_para_busca(texto):
+    # Cópia da função de models: a migration não deve depender do código atual do app
+    sem_acentos = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acentos.lower().split())
+
+
+def preencher_nomes_normalizados(apps, schema_editor):
+    Municipio = apps.get_model('localidades_brasileiras', 'Municipio')
+    municipios = list(Municipio.objects.only('id', 'nome'))
+    for municipio in municipios:
+        municipio.nome_normalizado = normalizar_para_busca(municipio.nome)
+    Municipio.objects.bulk_update(municipios, ['nome_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localidades_brasileiras', '0002_versaodedados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='municipio',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200, verbose_name='Nome normalizado'),
+        ),
+        migrations.RunPython(preencher_nomes_normalizados, migrations.RunPython.noop),
+    ]
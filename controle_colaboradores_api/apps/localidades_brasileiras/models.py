@@ -1,6 +1,14 @@
+import unicodedata
+
 from django.db import models
 
 
+def normalizar_para_busca(texto):
+    """Remove acentos, converte para minúsculas e unifica os espaços: 'São  José' -> 'sao jose'."""
+    sem_acentos = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acentos.lower().split())
+
+
 class Base(models.Model):
     criacao = models.DateTimeField('Criação', auto_now_add=True)
     modificacao = models.DateTimeField('Modificação', auto_now=True)
@@ -35,9 +43,32 @@ class Municipio(Base):
     fuso_horario = models.CharField('Fuso horário', max_length=50)
     cod_siafi = models.CharField('Código do SIAFI', max_length=20)
 
+    # Nome sem acentos e em minúsculas, indexado para a busca por prefixo
+    nome_normalizado = models.CharField('Nome normalizado', max_length=200, db_index=True, editable=False, default='')
+
     class Meta:
         verbose_name = 'Município'
         verbose_name_plural = 'Municípios'
 
     def __str__(self):
         return self.nome
+
+    def save(self, *args, **kwargs):
+        self.nome_normalizado = normalizar_para_busca(self.nome)
+        super().save(*args, **kwargs)
+
+
+class VersaoDeDados(Base):
+    """
+    Hash do conteúdo de cada arquivo de dados já carregado no banco, permitindo
+    que o comando cadastrar_localidades_brasileiras ignore arquivos inalterados.
+    """
+    arquivo = models.CharField('Arquivo', max_length=200, unique=True)
+    hash_do_conteudo = models.CharField('Hash SHA-256 do conteúdo', max_length=64)
+
+    class Meta:
+        verbose_name = 'Versão de dados'
+        verbose_name_plural = 'Versões de dados'
+
+    def __str__(self):
+        return f'{self.arquivo} - {self.hash_do_conteudo}'
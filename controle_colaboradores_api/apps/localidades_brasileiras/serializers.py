@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from controle_colaboradores_api.serializers_mixins import CamposSelecionaveisMixin
+
 from .models import UnidadeFederativa, Municipio
 
 
@@ -21,12 +23,14 @@ class UnidadeFederativaSerializer(serializers.ModelSerializer):
         ]
 
 
-class MunicipioSerializer(serializers.ModelSerializer):
+class MunicipioSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
+    campos_expansiveis = ('uf',)
 
     def to_representation(self, instance):
         request = self.context['request']
         data = super().to_representation(instance)
-        data['uf'] = UnidadeFederativaSerializer(instance.uf,
+        if 'uf' in data:
+            data['uf'] = UnidadeFederativaSerializer(instance.uf,
                                                  context={'request': request}).data
         return data
 
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .cache import invalidar_versao_dos_dados
+from .models import UnidadeFederativa, Municipio
+
+# Enviado, com os argumentos uf_ids e municipio_ids, pelo comando cadastrar_localidades_brasileiras,
+# cujos bulk_create e bulk_update não disparam post_save
+localidades_atualizadas_em_lote = Signal()
+
+
+@receiver([post_save, post_delete], sender=UnidadeFederativa)
+@receiver([post_save, post_delete], sender=Municipio)
+def invalidar_cache_das_localidades(sender, **kwargs):
+    # Somente após o commit: antes dele, outra requisição poderia guardar em cache os dados antigos
+    transaction.on_commit(invalidar_versao_dos_dados)
@@ -24,3 +24,10 @@ class TestMunicipio:
 
     def test_str(self, municipio):
         assert str(municipio) == "Município X"
+
+    def test_save_nome_normalizado(self, municipio):
+        assert municipio.nome_normalizado == "municipio x"
+        municipio.nome = "  São   João d'Aliança "
+        municipio.save()
+        municipio.refresh_from_db()
+        assert municipio.nome_normalizado == "sao joao d'alianca"
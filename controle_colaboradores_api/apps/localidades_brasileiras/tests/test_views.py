@@ -1,3 +1,4 @@
+import gzip
 import json
 
 import pytest
@@ -35,3 +36,113 @@ class TestMunicipioViewSet:
         )
         assert response.status_code == 200
         assert json.loads(response.content)['nome'] == "Nova Metrópole"
+
+    def test_retrieve_campos_selecionados(self, db, api_client):
+        municipio = baker.make('Municipio', nome="Nova Metrópole")
+        endpoint_url = reverse('municipio-detail', args=[municipio.id])
+
+        response = api_client.get(endpoint_url)
+        assert json.loads(response.content)['uf']['id'] == municipio.uf.id
+
+        response = api_client.get(endpoint_url, {'fields': 'id,nome,uf', 'expand': ''})
+        assert json.loads(response.content) == {'id': municipio.id, 'nome': "Nova Metrópole"}
+
+    def test_list_cache(self, db, api_client, django_assert_num_queries, django_capture_on_commit_callbacks):
+        baker.make('Municipio', _quantity=3)
+        endpoint_url = reverse('municipio-list')
+
+        response = api_client.get(endpoint_url)
+        etag = response['ETag']
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'public, max-age=3600'
+
+        # Respostas seguintes, condicionais ou não, não consultam o banco
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert len(json.loads(response.content)['results']) == 3
+
+        # Alterações nos dados geram nova versão, após o commit
+        with django_capture_on_commit_callbacks() as callbacks:
+            baker.make('Municipio', nome="Bela Cidade")
+        response = api_client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        for callback in callbacks:
+            callback()
+        response = api_client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert json.loads(response.content)['results'][3]['nome'] == "Bela Cidade"
+
+    def test_retrieve_cache(self, db, api_client, django_assert_num_queries):
+        municipio = baker.make('Municipio', nome="Nova Metrópole")
+        endpoint_url = reverse('municipio-detail', args=[municipio.id])
+
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
+        response = api_client.get(reverse('municipio-detail', args=[municipio.id + 1]))
+        assert response.status_code == 404
+
+    def test_catalogo(self, db, api_client, django_assert_num_queries):
+        uf = baker.make('UnidadeFederativa', sigla="AL", nome="Alagoas")
+        maceio = baker.make('Municipio', nome="Maceió", uf=uf, ddd=82)
+        arapiraca = baker.make('Municipio', nome="Arapiraca", uf=uf, ddd=82)
+        endpoint_url = reverse('municipio-catalogo')
+
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert json.loads(response.content) == {
+            'unidades_federativas': {'ids': [uf.id], 'siglas': ["AL"], 'nomes': ["Alagoas"]},
+            'municipios': {
+                'ids': [maceio.id, arapiraca.id],
+                'nomes': ["Maceió", "Arapiraca"],
+                'uf_ids': [uf.id, uf.id],
+                'ddds': [82, 82]
+            }
+        }
+
+        # Conteúdo pré-computado, servido comprimido e sem consultar o banco
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.content))['municipios']['nomes'] == ["Maceió", "Arapiraca"]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url,
+                                      HTTP_ACCEPT_ENCODING='gzip',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
+    def test_list_busca(self, db, api_client):
+        alagoas = baker.make('UnidadeFederativa', sigla="AL")
+        santa_catarina = baker.make('UnidadeFederativa', sigla="SC")
+        baker.make('Municipio', nome="São José da Laje", uf=alagoas, ddd=82)
+        baker.make('Municipio', nome="São José", uf=santa_catarina, ddd=48)
+        baker.make('Municipio', nome="São Paulo", uf=santa_catarina, ddd=11)
+        baker.make('Municipio', nome="Maceió", uf=alagoas, ddd=82)
+        endpoint_url = reverse('municipio-list')
+
+        def nomes(parametros):
+            response = api_client.get(endpoint_url, parametros)
+            assert response.status_code == 200
+            return [m['nome'] for m in json.loads(response.content)['results']]
+
+        assert nomes({'busca': 'sao jo'}) == ["São José", "São José da Laje"]
+        assert nomes({'busca': 'SÃO  JOSÉ'}) == ["São José", "São José da Laje"]
+        assert nomes({'busca': 'sao jo', 'uf': 'al'}) == ["São José da Laje"]
+        assert nomes({'busca': 'sao jo', 'uf': santa_catarina.id}) == ["São José"]
+        assert nomes({'ddd': 82}) == ["São José da Laje", "Maceió"]
+        assert nomes({'busca': 'maceio'}) == ["Maceió"]
+        assert nomes({'busca': 'jose'}) == []
+
+        response = api_client.get(endpoint_url, {'ddd': 'abc'})
+        assert response.status_code == 400
@@ -1,3 +1,9 @@
+from django.core.cache import cache
+from model_bakery import baker
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from controle_colaboradores_api.apps.localidades_brasileiras.models import UnidadeFederativa, Municipio, VersaoDeDados
 import controle_colaboradores_api.apps.localidades_brasileiras.management.commands.cadastrar_localidades_brasileiras\
     as localidades_brasileiras
 
@@ -13,3 +19,60 @@ class TestCommand:
         assert spy_municipios.call_count == 1
         assert spy_relacao.call_count == 1
 
+    def test_handle_quantidade_de_queries(self, db, django_assert_max_num_queries):
+        # Antes, eram executadas mais de 11 mil queries (uma ou mais por linha dos CSVs)
+        with django_assert_max_num_queries(100):
+            localidades_brasileiras.Command().handle()
+        assert UnidadeFederativa.objects.count() == 27
+        assert Municipio.objects.count() == 5570
+        assert UnidadeFederativa.objects.get(sigla='AL').capital.nome == "Maceió"
+
+        # Nova execução, forçando a comparação de todos os registros
+        with django_assert_max_num_queries(25):
+            localidades_brasileiras.Command().handle(forcar=True)
+
+    def test_handle_arquivos_inalterados(self, db, mocker, django_assert_num_queries):
+        localidades_brasileiras.Command().handle()
+        assert VersaoDeDados.objects.count() == 2
+        spy_ufs = mocker.spy(localidades_brasileiras.Command, '_cadastrar_unidades_federativas')
+        spy_municipios = mocker.spy(localidades_brasileiras.Command, '_cadastrar_municipios')
+
+        # Somente a consulta às versões já carregadas
+        with django_assert_num_queries(1):
+            assert localidades_brasileiras.Command().handle() == "Fim da execução bem sucedida."
+        assert spy_ufs.call_count == 0
+        assert spy_municipios.call_count == 0
+
+        # Apenas o arquivo alterado é sincronizado
+        VersaoDeDados.objects.filter(arquivo='municipios.csv').update(hash_do_conteudo='desatualizado')
+        localidades_brasileiras.Command().handle()
+        assert spy_ufs.call_count == 0
+        assert spy_municipios.call_count == 1
+
+    def test_handle_atualiza_registros_existentes(self, db):
+        localidades_brasileiras.Command().handle()
+        Municipio.objects.filter(nome="Maceió").update(nome="Nome Desatualizado", ddd=99)
+
+        localidades_brasileiras.Command().handle(forcar=True)
+        assert Municipio.objects.filter(nome="Nome Desatualizado").exists() is False
+        assert Municipio.objects.get(nome="Maceió").ddd == 82
+
+    def test_handle_invalida_respostas_em_cache(self, db, settings, django_capture_on_commit_callbacks):
+        settings.CACHE_DE_RESPOSTAS_TIMEOUT = 60
+        cache.clear()
+        localidades_brasileiras.Command().handle()
+        Municipio.objects.filter(nome="Maceió").update(nome="Nome Desatualizado")
+        endereco = baker.make('Endereco', municipio=Municipio.objects.get(nome="Nome Desatualizado"))
+        api_client = APIClient()
+        api_client.force_authenticate(user=baker.make('CustomUsuario', groups=[baker.make('auth.Group',
+                                                                                          name="Administradores")]))
+        endpoint_url = reverse('endereco-detail', args=[endereco.id])
+        assert api_client.get(endpoint_url)['X-Cache'] == 'MISS'
+        assert api_client.get(endpoint_url)['X-Cache'] == 'HIT'
+
+        # bulk_update não dispara os signals que invalidam as respostas em cache
+        with django_capture_on_commit_callbacks(execute=True):
+            localidades_brasileiras.Command().handle(forcar=True)
+        response = api_client.get(endpoint_url)
+        assert response['X-Cache'] == 'MISS'
+        assert "Maceió" in response.content.decode()
@@ -1,20 +1,145 @@
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import parse_etags
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from rest_access_policy import AccessViewSetMixin
 
-from .models import Municipio
+from .cache import obter_versao_dos_dados
+from .models import UnidadeFederativa, Municipio, normalizar_para_busca
 from .serializers import MunicipioSerializer
 from .views_access_policies import MunicipioAccessPolicy
 
 
-class MunicipioViewSet(AccessViewSetMixin, ReadOnlyModelViewSet):
+class RespostaCondicionalEmCacheMixin:
+    """
+    Para dados de referência, que raramente mudam: gera ETags a partir da versão dos
+    dados, responde 304 a requisições condicionais e mantém em cache as respostas
+    já serializadas, de modo que a maioria das requisições não consulta o banco.
+    """
+
+    def responder_com_cache(self, handler, request, *args, **kwargs):
+        identificador = f'{obter_versao_dos_dados()}:{request.accepted_media_type}:{request.build_absolute_uri()}'
+        etag = f'"{hashlib.sha256(identificador.encode()).hexdigest()}"'
+        cabecalhos = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={settings.LOCALIDADES_CACHE_TIMEOUT}'
+        }
+
+        etags_do_cliente = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags_do_cliente or '*' in etags_do_cliente:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+
+        chave = f'localidades_brasileiras:resposta:{etag}'
+        dados = cache.get(chave)
+        if dados is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            dados = response.data
+            cache.set(chave, dados, settings.LOCALIDADES_CACHE_TIMEOUT)
+        return Response(dados, headers=cabecalhos)
+
+
+class MunicipioViewSet(RespostaCondicionalEmCacheMixin, AccessViewSetMixin, ReadOnlyModelViewSet):
     """
     Municipio ViewSet description:
 
-    list: Listar municípios.
+    list: Listar municípios. Opcionalmente, buscar pelo início do nome, sem distinção de acentos
+     e maiúsculas (busca), e filtrar pela UF, informando id ou sigla (uf), e pelo DDD (ddd).
     retrieve: Consultar município.
+    catalogo: Listar todos os municípios, sem paginação, em formato compacto por colunas:
+     listas paralelas de ids, nomes, ids das UFs e DDDs, com as UFs informadas uma única vez.
     """
     access_policy = MunicipioAccessPolicy
     serializer_class = MunicipioSerializer
 
     def get_queryset(self):
-        return Municipio.objects.all().order_by("id")
+        queryset = Municipio.objects.order_by("id")
+        if 'uf' in self.serializer_class.campos_selecionados(self.request):
+            queryset = queryset.select_related('uf')
+        if self.action == 'list':
+            queryset = self._filtrar(queryset, self.request.query_params)
+        return queryset
+
+    @staticmethod
+    def _filtrar(queryset, parametros):
+        if parametros.get('busca', '').strip():
+            queryset = queryset.filter(
+                nome_normalizado__startswith=normalizar_para_busca(parametros['busca'])
+            ).order_by('nome_normalizado', 'id')
+        if parametros.get('uf'):
+            if parametros['uf'].isdigit():
+                queryset = queryset.filter(uf_id=parametros['uf'])
+            else:
+                queryset = queryset.filter(uf__sigla=parametros['uf'].upper())
+        if parametros.get('ddd'):
+            if not parametros['ddd'].isdigit():
+                raise ValidationError({'ddd': 'DDD inválido. Informe somente números.'})
+            queryset = queryset.filter(ddd=parametros['ddd'])
+        return queryset
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('busca', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('uf', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('ddd', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False)
+    ])
+    def list(self, request, *args, **kwargs):
+        return self.responder_com_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_com_cache(super().retrieve, request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def catalogo(self, request):
+        versao = obter_versao_dos_dados()
+        comprimir = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = f'"catalogo-{versao}{"-gzip" if comprimir else ""}"'
+        cabecalhos = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={settings.LOCALIDADES_CACHE_TIMEOUT}',
+            'Vary': 'Accept-Encoding'
+        }
+
+        etags_do_cliente = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags_do_cliente or '*' in etags_do_cliente:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+
+        chave = f'localidades_brasileiras:catalogo:{versao}'
+        catalogo = cache.get(chave)
+        if catalogo is None:
+            conteudo = self._gerar_catalogo()
+            catalogo = (conteudo, gzip.compress(conteudo))
+            cache.set(chave, catalogo, settings.LOCALIDADES_CACHE_TIMEOUT)
+
+        if comprimir:
+            response = HttpResponse(catalogo[1], content_type='application/json; charset=utf-8')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(catalogo[0], content_type='application/json; charset=utf-8')
+        for cabecalho, valor in cabecalhos.items():
+            response[cabecalho] = valor
+        return response
+
+    @staticmethod
+    def _gerar_catalogo():
+        ufs = list(UnidadeFederativa.objects.order_by('id').values_list('id', 'sigla', 'nome'))
+        municipios = list(Municipio.objects.order_by('id').values_list('id', 'nome', 'uf_id', 'ddd'))
+        colunas_ufs = list(zip(*ufs)) or [(), (), ()]
+        colunas_municipios = list(zip(*municipios)) or [(), (), (), ()]
+        catalogo = {
+            'unidades_federativas': dict(zip(('ids', 'siglas', 'nomes'), map(list, colunas_ufs))),
+            'municipios': dict(zip(('ids', 'nomes', 'uf_ids', 'ddds'), map(list, colunas_municipios)))
+        }
+        return json.dumps(catalogo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
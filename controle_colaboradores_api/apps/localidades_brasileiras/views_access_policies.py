@@ -4,7 +4,7 @@ from rest_access_policy import AccessPolicy
 class MunicipioAccessPolicy(AccessPolicy):
     statements = [
         {
-            "action": ["list", "retrieve"],
+            "action": ["list", "retrieve", "catalogo"],
             "principal": ["*"],
             "effect": "allow"
         }
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PerfisConfig(AppConfig):
     name = 'controle_colaboradores_api.apps.perfis'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,148 @@
+import json
+import threading
+import weakref
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Perfil, DocumentoDePerfil
+from .serializers import PerfilSerializer
+
+TAMANHO_DO_LOTE = 200
+
+# Máximo de documentos reconstruídos logo após o commit, ainda dentro da requisição. Os demais
+# (alterações em cascata, como renomear um departamento raiz) ficam sem documento, servidos pela
+# serialização na hora, até a execução de reconstruir_documentos_de_perfis.
+MAXIMO_DA_RECONSTRUCAO_IMEDIATA = 1000
+
+# Os documentos são gravados com este marcador no lugar do endereço do servidor,
+# que é substituído pelo endereço da requisição ao servi-los.
+MARCADOR_DO_SERVIDOR = '{servidor}'
+
+_local = threading.local()
+
+
+class _RequisicaoInterna:
+    """
+    Faz as vezes da requisição na geração dos documentos, fora de uma requisição HTTP:
+    as URLs dos hyperlinks são geradas relativas ao MARCADOR_DO_SERVIDOR.
+    """
+    versioning_scheme = None
+    GET = {}
+
+    def build_absolute_uri(self, location):
+        return f'{MARCADOR_DO_SERVIDOR}{location}'
+
+
+def reconstruir_documentos(perfil_ids):
+    """Gera novamente, em lotes, os documentos dos perfis informados."""
+    perfil_ids = sorted(set(perfil_ids))
+    for inicio in range(0, len(perfil_ids), TAMANHO_DO_LOTE):
+        lote = perfil_ids[inicio:inicio + TAMANHO_DO_LOTE]
+        perfis = PerfilSerializer.otimizar_queryset(Perfil.objects.filter(id__in=lote).order_by('id'))
+        dados = PerfilSerializer(perfis, many=True, context={'request': _RequisicaoInterna()}).data
+        try:
+            with transaction.atomic():
+                DocumentoDePerfil.objects.filter(perfil_id__in=lote).delete()
+                DocumentoDePerfil.objects.bulk_create([
+                    DocumentoDePerfil(perfil_id=dados_do_perfil['id'],
+                                      conteudo=json.dumps(dados_do_perfil, cls=JSONEncoder, ensure_ascii=False))
+                    for dados_do_perfil in dados
+                ])
+        except IntegrityError:
+            # Outra transação reconstruiu algum destes documentos ao mesmo tempo, possivelmente a
+            # partir de dados anteriores: os documentos do lote são descartados, como desatualizados
+            DocumentoDePerfil.objects.filter(perfil_id__in=lote).delete()
+
+
+class _Reconstrucao:
+    """Reconstrução agendada para o commit, que reúne os perfis marcados na mesma transação."""
+
+    def __init__(self):
+        self.perfil_ids = set()
+        self.consultas = {}
+        self.executada = False
+
+    def __call__(self):
+        self.executada = True
+        perfil_ids = set(self.perfil_ids)
+        for consulta in self.consultas.values():
+            perfil_ids.update(consulta.values_list('id', flat=True))
+        # Os demais permanecem sem documento (vide MAXIMO_DA_RECONSTRUCAO_IMEDIATA)
+        reconstruir_documentos(sorted(perfil_ids)[:MAXIMO_DA_RECONSTRUCAO_IMEDIATA])
+
+
+def _obter_reconstrucao_agendada():
+    # Reaproveita somente a reconstrução agendada no mesmo nível de savepoint, que é
+    # descartada junto com as alterações em caso de rollback (blocos atomic sem savepoint
+    # não têm id). As agendadas são mantidas por referências fracas: a única referência forte
+    # é a da fila de on_commit, de modo que uma reconstrução executada, ou descartada por um
+    # rollback, deixa de ser encontrada.
+    conexao = transaction.get_connection()
+    agendadas = _local.__dict__.setdefault('reconstrucoes_agendadas', weakref.WeakValueDictionary())
+    chave = (conexao.alias, tuple(sid for sid in conexao.savepoint_ids if sid is not None))
+    reconstrucao = agendadas.get(chave)
+    if reconstrucao is None or reconstrucao.executada:
+        reconstrucao = _Reconstrucao()
+        agendadas[chave] = reconstrucao
+        transaction.on_commit(reconstrucao)
+    return reconstrucao
+
+
+def marcar_desatualizados(perfis):
+    """
+    Descarta os documentos dos perfis, para que não sejam servidos desatualizados, e
+    agenda sua reconstrução para depois do commit. Aceita ids ou uma queryset de perfis;
+    a queryset só é avaliada na reconstrução, portanto deve selecionar os mesmos perfis
+    antes e depois da alteração (caso contrário, informe os ids).
+    """
+    if not transaction.get_connection().in_atomic_block:
+        # Fora de uma transação, a reconstrução ocorre ao fim deste bloco
+        with transaction.atomic():
+            marcar_desatualizados(perfis)
+        return
+
+    reconstrucao = _obter_reconstrucao_agendada()
+    if isinstance(perfis, QuerySet):
+        consulta = str(perfis.query)
+        if consulta not in reconstrucao.consultas:
+            DocumentoDePerfil.objects.filter(perfil__in=perfis).delete()
+            reconstrucao.consultas[consulta] = perfis
+        return
+
+    perfil_ids = set(perfis) - {None} - reconstrucao.perfil_ids
+    if perfil_ids:
+        DocumentoDePerfil.objects.filter(perfil_id__in=perfil_ids).delete()
+        reconstrucao.perfil_ids.update(perfil_ids)
+
+
+def representar_perfis(perfis, view):
+    """
+    Representações dos perfis, na mesma ordem, a partir dos documentos pré-calculados,
+    com os campos selecionados na requisição (vide CamposSelecionaveisMixin).
+    Perfis ainda sem documento são serializados na hora.
+    """
+    request = view.request
+    campos = PerfilSerializer.campos_selecionados(request)
+    perfil_ids = [perfil.id for perfil in perfis]
+    servidor = f'"{request.build_absolute_uri("/")}'
+    representacoes = {
+        perfil_id: json.loads(conteudo.replace(f'"{MARCADOR_DO_SERVIDOR}/', servidor))
+        for perfil_id, conteudo in DocumentoDePerfil.objects.filter(
+            perfil_id__in=perfil_ids
+        ).values_list('perfil_id', 'conteudo')
+    }
+
+    faltantes = [perfil_id for perfil_id in perfil_ids if perfil_id not in representacoes]
+    if faltantes:
+        perfis_faltantes = list(PerfilSerializer.otimizar_queryset(
+            Perfil.objects.filter(id__in=faltantes).order_by('id'), campos
+        ))
+        dados = PerfilSerializer(perfis_faltantes, many=True, context={'request': request, 'view': view}).data
+        representacoes.update(zip([perfil.id for perfil in perfis_faltantes], dados))
+
+    return [
+        {campo: valor for campo, valor in representacoes[perfil_id].items() if campo in campos}
+        for perfil_id in perfil_ids if perfil_id in representacoes
+    ]
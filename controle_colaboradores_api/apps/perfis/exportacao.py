@@ -0,0 +1,137 @@
+import csv
+import json
+from collections import namedtuple
+
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Perfil, Endereco
+
+TAMANHO_DO_LOTE = 500
+
+_Coluna = namedtuple('_Coluna', ['valor', 'relacoes'])
+
+
+def _endereco_principal(atributo):
+    def valor(perfil):
+        enderecos = perfil.enderecos_principais
+        return atributo(enderecos[0]) if enderecos else None
+    return _Coluna(valor, ('enderecos',))
+
+
+def _campo(nome):
+    return _Coluna(lambda perfil: getattr(perfil, nome), ())
+
+
+# Colunas da exportação, na ordem em que são exportadas: nome -> (valor no perfil, relações consultadas)
+COLUNAS = {
+    'id': _campo('id'),
+    'email': _Coluna(lambda perfil: perfil.usuario.email, ('usuario',)),
+    'nome': _campo('nome'),
+    'sobrenome': _campo('sobrenome'),
+    'cpf': _campo('cpf'),
+    'ativo': _campo('ativo'),
+    'contrato_identificador': _campo('contrato_identificador'),
+    'data_admissao': _campo('data_admissao'),
+    'data_demissao': _campo('data_demissao'),
+    'dados_bancarios_banco': _campo('dados_bancarios_banco'),
+    'dados_bancarios_agencia': _campo('dados_bancarios_agencia'),
+    'dados_bancarios_conta': _campo('dados_bancarios_conta'),
+    'cargos': _Coluna(lambda perfil: [str(cargo) for cargo in perfil.cargos.all()], ('cargos',)),
+    'departamentos': _Coluna(lambda perfil: [departamento.nome for departamento in perfil.departamentos.all()],
+                             ('departamentos',)),
+    'endereco_logradouro': _endereco_principal(lambda endereco: endereco.logradouro),
+    'endereco_numero': _endereco_principal(lambda endereco: endereco.numero),
+    'endereco_complemento': _endereco_principal(lambda endereco: endereco.complemento),
+    'endereco_bairro': _endereco_principal(lambda endereco: endereco.bairro),
+    'endereco_municipio': _endereco_principal(lambda endereco: endereco.municipio.nome),
+    'endereco_uf': _endereco_principal(lambda endereco: endereco.municipio.uf.sigla),
+    'endereco_cep': _endereco_principal(lambda endereco: endereco.cep),
+    'modificacao': _campo('modificacao')
+}
+
+
+class _Eco:
+    """Arquivo que apenas devolve o que lhe é escrito, para que csv.writer gere as linhas uma a uma."""
+
+    def write(self, valor):
+        return valor
+
+
+class ExportacaoDePerfis:
+    """
+    Exportação de perfis em CSV ou NDJSON (um objeto JSON por linha), com os cargos, os
+    departamentos e o endereço principal achatados em colunas. As linhas são geradas sob
+    demanda, para uma StreamingHttpResponse: os ids dos perfis são percorridos por um cursor
+    no servidor do banco (iterator) e os perfis, com as relações das colunas selecionadas,
+    são carregados em lotes de TAMANHO_DO_LOTE. Assim, a memória utilizada não cresce com
+    a quantidade de perfis.
+
+    A exportação é um relatório para leitura, e não a entrada da importação: os cargos e os
+    departamentos são exportados pelos nomes e o endereço principal pelo nome do município e
+    pela sigla da UF, enquanto ImportacaoDePerfis espera os ids de cargos, departamentos e
+    municipios_onde_trabalha (e os nomes dos grupos, que não são exportados).
+    """
+    formatos = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson; charset=utf-8'
+    }
+
+    def __init__(self, queryset, formato, colunas=None):
+        self.queryset = queryset
+        self.formato = formato
+        self.colunas = [coluna for coluna in COLUNAS if colunas is None or coluna in colunas]
+
+    @property
+    def content_type(self):
+        return self.formatos[self.formato]
+
+    def _relacoes(self):
+        return {relacao for coluna in self.colunas for relacao in COLUNAS[coluna].relacoes}
+
+    def _carregar_lote(self, perfil_ids):
+        relacoes = self._relacoes()
+        perfis = Perfil.objects.filter(id__in=perfil_ids)
+        if 'usuario' in relacoes:
+            perfis = perfis.select_related('usuario')
+        if 'cargos' in relacoes:
+            perfis = perfis.prefetch_related('cargos')
+        if 'departamentos' in relacoes:
+            perfis = perfis.prefetch_related('departamentos')
+        if 'enderecos' in relacoes:
+            perfis = perfis.prefetch_related(Prefetch(
+                'enderecos',
+                queryset=Endereco.objects.filter(is_principal=True).select_related('municipio__uf'),
+                to_attr='enderecos_principais'
+            ))
+        # Na ordem do queryset exportado
+        perfis = {perfil.id: perfil for perfil in perfis}
+        return [perfis[perfil_id] for perfil_id in perfil_ids if perfil_id in perfis]
+
+    def _perfis(self):
+        lote = []
+        for perfil_id in self.queryset.values_list('id', flat=True).iterator(chunk_size=TAMANHO_DO_LOTE):
+            lote.append(perfil_id)
+            if len(lote) == TAMANHO_DO_LOTE:
+                yield from self._carregar_lote(lote)
+                lote = []
+        if lote:
+            yield from self._carregar_lote(lote)
+
+    def _valores(self, perfil):
+        return {coluna: COLUNAS[coluna].valor(perfil) for coluna in self.colunas}
+
+    def linhas(self):
+        if self.formato == 'csv':
+            escritor = csv.writer(_Eco())
+            yield escritor.writerow(self.colunas)
+            for perfil in self._perfis():
+                # Vários valores separados por ';', o separador também lido pela importação
+                # (que, porém, espera ids, e não os nomes exportados)
+                yield escritor.writerow([
+                    ';'.join(valor) if isinstance(valor, list) else ('' if valor is None else valor)
+                    for valor in self._valores(perfil).values()
+                ])
+        else:
+            for perfil in self._perfis():
+                yield json.dumps(self._valores(perfil), cls=JSONEncoder, ensure_ascii=False) + '\n'
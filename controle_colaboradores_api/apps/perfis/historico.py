@@ -0,0 +1,147 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Historico, Perfil
+
+# Não registrados: o id e a criação não mudam, a modificação e o seu usuário são as colunas
+# data e usuario do próprio registro, e o caminho e o nível do departamento são derivados.
+CAMPOS_NAO_REGISTRADOS = {'id', 'criacao', 'modificacao', 'usuario_modificacao', 'caminho', 'nivel'}
+
+_local = threading.local()
+
+
+def campos_registrados(model):
+    return [campo for campo in model._meta.concrete_fields if campo.name not in CAMPOS_NAO_REGISTRADOS]
+
+
+def relacoes_registradas(model):
+    return [campo.name for campo in model._meta.many_to_many] if model is Perfil else []
+
+
+def valores(instance):
+    """Valores dos campos registrados do objeto, como gravados no banco (as relações, por id)."""
+    return {campo.name: campo.to_python(campo.value_from_object(instance))
+            for campo in campos_registrados(type(instance))}
+
+
+def valores_no_banco(model, pk):
+    campos = campos_registrados(model)
+    linha = model.objects.filter(pk=pk).values_list(*[campo.attname for campo in campos]).first()
+    if linha is None:
+        return None
+    return {campo.name: campo.to_python(valor) for campo, valor in zip(campos, linha)}
+
+
+def diferencas(anteriores, atuais):
+    return {campo: valor for campo, valor in atuais.items() if anteriores.get(campo) != valor}
+
+
+def _aplicar_na_relacao(ids, alteracao):
+    if not isinstance(alteracao, dict):
+        # Lista completa dos ids
+        return alteracao
+    if ids is None:
+        return alteracao
+    adicionados, removidos = set(alteracao['adicionados']), set(alteracao['removidos'])
+    if isinstance(ids, dict):
+        # Combinando as operações de dois registros de um mesmo lote
+        return {'adicionados': sorted((set(ids['adicionados']) - removidos) | adicionados),
+                'removidos': sorted((set(ids['removidos']) - adicionados) | removidos)}
+    return sorted((set(ids) - removidos) | adicionados)
+
+
+def aplicar(estado, alteracoes):
+    """
+    Aplica ao estado as alterações de um registro: os campos recebem os novos valores, e as
+    relações, uma lista completa de ids ou os ids 'adicionados' e 'removidos'.
+    """
+    for campo, valor in alteracoes.items():
+        if isinstance(valor, dict):
+            estado[campo] = _aplicar_na_relacao(estado.get(campo), valor)
+        else:
+            estado[campo] = valor
+    return estado
+
+
+class _Lote:
+    """Registros de histórico de um bloco historico_em_lote(), um por objeto, gravados ao fim do bloco."""
+
+    def __init__(self):
+        self.registros = {}
+
+    def adicionar(self, registro):
+        chave = (registro.tipo, registro.objeto_id)
+        anterior = self.registros.get(chave)
+        if anterior is None:
+            self.registros[chave] = registro
+            return
+        aplicar(anterior.alteracoes, registro.alteracoes)
+        anterior.usuario_id = registro.usuario_id or anterior.usuario_id
+        if registro.operacao == Historico.EXCLUSAO:
+            anterior.operacao, anterior.alteracoes = Historico.EXCLUSAO, {}
+
+    def gravar(self):
+        Historico.objects.bulk_create(self.registros.values())
+
+
+@contextmanager
+def historico_em_lote():
+    """
+    Reúne os registros de histórico gerados no bloco, combinando os de um mesmo objeto, e os
+    grava com um único INSERT ao seu fim, na mesma transação das alterações.
+    """
+    # Sem savepoint: um erro no bloco desfaz toda a transação, com as alterações que registraria
+    with transaction.atomic(savepoint=False):
+        lote = _Lote()
+        lotes = _local.__dict__.setdefault('lotes', [])
+        lotes.append(lote)
+        try:
+            yield lote
+        finally:
+            lotes.pop()
+        lote.gravar()
+
+
+def registrar(model, objeto_id, operacao, alteracoes, usuario_id=None):
+    if operacao == Historico.ALTERACAO and not alteracoes:
+        return
+    registro = Historico(tipo=model._meta.model_name, objeto_id=objeto_id, operacao=operacao,
+                         alteracoes=alteracoes, usuario_id=usuario_id, data=timezone.now())
+    lotes = getattr(_local, 'lotes', None)
+    if lotes:
+        lotes[-1].adicionar(registro)
+    else:
+        registro.save()
+
+
+def registrar_em_lote(model, alteracoes_por_objeto, operacao, usuario_id=None):
+    """Grava com um único INSERT os registros de alterações feitas sem signals (update, bulk_create)."""
+    agora = timezone.now()
+    Historico.objects.bulk_create([
+        Historico(tipo=model._meta.model_name, objeto_id=objeto_id, operacao=operacao,
+                  alteracoes=alteracoes, usuario_id=usuario_id, data=agora)
+        for objeto_id, alteracoes in alteracoes_por_objeto.items()
+    ])
+
+
+def estado_em(model, objeto_id, em):
+    """
+    Estado do objeto no momento informado, reconstruído a partir dos seus registros de
+    histórico até então (consultados pelo índice de tipo, objeto e data), ou None se o
+    objeto ainda não existia ou já havia sido excluído.
+    """
+    estado = None
+    for operacao, alteracoes, usuario_id, data in Historico.objects.filter(
+        tipo=model._meta.model_name, objeto_id=objeto_id, data__lte=em
+    ).order_by('data', 'id').values_list('operacao', 'alteracoes', 'usuario_id', 'data'):
+        if operacao == Historico.EXCLUSAO:
+            estado = None
+            continue
+        if operacao == Historico.CRIACAO or estado is None:
+            estado = {'id': objeto_id, **{relacao: [] for relacao in relacoes_registradas(model)}}
+        aplicar(estado, alteracoes)
+        estado.update(usuario_modificacao=usuario_id, modificacao=data)
+    return estado
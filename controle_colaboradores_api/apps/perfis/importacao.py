@@ -0,0 +1,274 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.parsers import BaseParser
+
+from controle_colaboradores_api.cache_de_respostas import invalidar_respostas
+from controle_colaboradores_api.apps.usuarios.models import CustomUsuario
+from controle_colaboradores_api.apps.localidades_brasileiras.models import Municipio
+
+from . import historico
+from .documentos import marcar_desatualizados
+from .models import Perfil, Cargo, Departamento, Historico
+from .serializers import PerfilSerializer
+
+TAMANHO_DO_LOTE = 1000
+
+CAMPOS_DO_PERFIL = [
+    'nome',
+    'sobrenome',
+    'cpf',
+    'contrato_identificador',
+    'data_admissao',
+    'data_demissao',
+    'dados_bancarios_banco',
+    'dados_bancarios_agencia',
+    'dados_bancarios_conta'
+]
+
+# Campos com vários valores: listas no JSON e valores separados por ';' no CSV
+CAMPOS_COM_VARIOS_VALORES = ['groups', 'cargos', 'departamentos', 'municipios_onde_trabalha']
+
+# Relações do perfil informadas por id: campo -> model
+RELACOES_DO_PERFIL = {
+    'cargos': Cargo,
+    'departamentos': Departamento,
+    'municipios_onde_trabalha': Municipio
+}
+
+
+_RegistroValido = namedtuple('_RegistroValido', ['email', 'senha', 'grupo_ids', 'perfil', 'relacoes'])
+
+
+class CSVParser(BaseParser):
+    """Recebe o corpo da requisição em CSV como texto, para ser lido por ler_csv."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+def ler_csv(conteudo):
+    """Registros de um CSV com cabeçalho, no formato aceito por ImportacaoDePerfis."""
+    registros = []
+    for registro in csv.DictReader(io.StringIO(conteudo)):
+        for campo in CAMPOS_COM_VARIOS_VALORES:
+            if campo in registro:
+                registro[campo] = [valor.strip() for valor in (registro[campo] or '').split(';') if valor.strip()]
+        registros.append(registro)
+    return registros
+
+
+def ler_arquivo(caminho):
+    """Registros de um arquivo .csv ou .json."""
+    with open(caminho, encoding='utf-8-sig') as arquivo:
+        if str(caminho).lower().endswith('.csv'):
+            return ler_csv(arquivo.read())
+        return json.load(arquivo)
+
+
+def _mensagens(erro):
+    if isinstance(erro, ValidationError):
+        return erro.messages
+    return [str(detalhe) for detalhe in erro.detail]
+
+
+class ImportacaoDePerfis:
+    """
+    Importação em lote de usuários e seus perfis. Cada registro tem os campos do perfil
+    (CAMPOS_DO_PERFIL), 'email', 'password' (opcional; sem ela o usuário deverá solicitar
+    o reset da senha), os nomes dos grupos em 'groups' e os ids de cargos, departamentos
+    e municipios_onde_trabalha.
+
+    Todos os registros são validados com as consultas feitas de uma só vez e, somente se
+    não houver erros, são gravados com bulk_create. Os hashes das senhas são gerados
+    em paralelo, antes de abrir a transação.
+    """
+
+    def __init__(self, registros, usuario_modificacao):
+        self.registros = registros
+        self.usuario_modificacao = usuario_modificacao
+        self.erros = []
+        self._validos = []
+
+    def validar(self):
+        """Valida todos os registros; os erros ficam em self.erros, por linha (a partir de 1)."""
+        self.erros, self._validos = [], []
+        if not isinstance(self.registros, list) or not all(isinstance(r, dict) for r in self.registros):
+            self.erros.append({'linha': None, 'erros': {'registros': ["Informe uma lista de registros."]}})
+            return False
+        if not self.registros:
+            self.erros.append({'linha': None, 'erros': {'registros': ["Nenhum registro informado."]}})
+            return False
+
+        emails = [CustomUsuario.objects.normalize_email(str(r.get('email') or '').strip()) for r in self.registros]
+        cpfs = [str(r.get('cpf') or '').strip() for r in self.registros]
+        emails_existentes = set()
+        for email, username in CustomUsuario.objects.filter(
+            Q(email__in=emails) | Q(username__in=emails)
+        ).values_list('email', 'username'):
+            emails_existentes.update((email, username))
+        cpfs_existentes = set(Perfil.objects.filter(cpf__in=cpfs).values_list('cpf', flat=True))
+        grupos = dict(Group.objects.values_list('name', 'id'))
+        ids_existentes = {
+            campo: set(model.objects.filter(
+                id__in=self._ids_informados(campo)
+            ).values_list('id', flat=True))
+            for campo, model in RELACOES_DO_PERFIL.items()
+        }
+
+        emails_vistos, cpfs_vistos = set(), set()
+        for linha, (registro, email, cpf) in enumerate(zip(self.registros, emails, cpfs), start=1):
+            erros = {}
+
+            try:
+                validate_email(email)
+                if email in emails_existentes:
+                    raise ValidationError("Já existe um usuário com este e-mail.")
+                if email in emails_vistos:
+                    raise ValidationError("E-mail repetido na importação.")
+            except ValidationError as e:
+                erros['email'] = _mensagens(e)
+            emails_vistos.add(email)
+
+            senha = registro.get('password') or None
+            if senha is not None:
+                try:
+                    validate_password(senha)
+                except ValidationError as e:
+                    erros['password'] = _mensagens(e)
+
+            try:
+                PerfilSerializer.validate_cpf(cpf)
+                if cpf in cpfs_existentes:
+                    raise ValidationError("Já existe um perfil com este CPF.")
+                if cpf in cpfs_vistos:
+                    raise ValidationError("CPF repetido na importação.")
+            except (ValidationError, serializers.ValidationError) as e:
+                erros['cpf'] = _mensagens(e)
+            cpfs_vistos.add(cpf)
+
+            nomes_dos_grupos = self._lista(registro, 'groups')
+            grupos_inexistentes = [nome for nome in nomes_dos_grupos if nome not in grupos]
+            if grupos_inexistentes:
+                erros['groups'] = [f"Grupo inexistente: {nome}." for nome in grupos_inexistentes]
+
+            relacoes = {}
+            for campo in RELACOES_DO_PERFIL:
+                ids, invalidos = self._converter_ids(self._lista(registro, campo))
+                invalidos += [str(i) for i in ids if i not in ids_existentes[campo]]
+                if invalidos:
+                    erros[campo] = [f"Id inválido ou inexistente: {valor}." for valor in invalidos]
+                relacoes[campo] = ids
+
+            dados_do_perfil = {campo: registro.get(campo) for campo in CAMPOS_DO_PERFIL}
+            dados_do_perfil['cpf'] = cpf
+            for campo, valor in dados_do_perfil.items():
+                if valor is None or valor == '':
+                    dados_do_perfil[campo] = None if campo.startswith('data_') else ''
+            perfil = Perfil(**dados_do_perfil)
+            # A data de demissão pode ser nula, como na API, embora não possa ser vazia no model
+            nao_validados = ['cpf', 'usuario', 'usuario_modificacao']
+            if perfil.data_demissao is None:
+                nao_validados.append('data_demissao')
+            try:
+                perfil.clean_fields(exclude=nao_validados)
+            except ValidationError as e:
+                for campo, mensagens in e.message_dict.items():
+                    erros.setdefault(campo, []).extend(mensagens)
+
+            if erros:
+                self.erros.append({'linha': linha, 'erros': erros})
+            else:
+                grupo_ids = [grupos[nome] for nome in nomes_dos_grupos]
+                self._validos.append(_RegistroValido(email, senha, grupo_ids, perfil, relacoes))
+        return not self.erros
+
+    def _lista(self, registro, campo):
+        valor = registro.get(campo) or []
+        return valor if isinstance(valor, list) else [valor]
+
+    @staticmethod
+    def _converter_ids(valores):
+        ids, invalidos = [], []
+        for valor in valores:
+            try:
+                ids.append(int(valor))
+            except (TypeError, ValueError):
+                invalidos.append(str(valor))
+        return ids, invalidos
+
+    def _ids_informados(self, campo):
+        ids = set()
+        for registro in self.registros:
+            ids.update(self._converter_ids(self._lista(registro, campo))[0])
+        return ids
+
+    def importar(self):
+        """Grava os registros validados e retorna os ids dos perfis criados, na ordem dos registros."""
+        assert not self.erros and self._validos, "Chame validar() e verifique os erros antes de importar."
+
+        with ThreadPoolExecutor(max_workers=settings.IMPORTACAO_DE_PERFIS_THREADS) as executor:
+            hashes = list(executor.map(make_password, [registro.senha for registro in self._validos]))
+
+        with transaction.atomic():
+            CustomUsuario.objects.bulk_create([
+                CustomUsuario(email=registro.email, username=registro.email, password=hash_da_senha,
+                              first_name=registro.perfil.nome, last_name=registro.perfil.sobrenome)
+                for registro, hash_da_senha in zip(self._validos, hashes)
+            ], batch_size=TAMANHO_DO_LOTE)
+            # Os ids gerados são consultados, pois nem todos os bancos os retornam no bulk_create
+            usuario_ids = dict(CustomUsuario.objects.filter(
+                email__in=[registro.email for registro in self._validos]
+            ).values_list('email', 'id'))
+
+            GrupoDoUsuario = CustomUsuario.groups.through
+            GrupoDoUsuario.objects.bulk_create([
+                GrupoDoUsuario(customusuario_id=usuario_ids[registro.email], group_id=grupo_id)
+                for registro in self._validos
+                for grupo_id in dict.fromkeys(registro.grupo_ids)
+            ], batch_size=TAMANHO_DO_LOTE)
+
+            for registro in self._validos:
+                registro.perfil.usuario_id = usuario_ids[registro.email]
+                registro.perfil.usuario_modificacao = self.usuario_modificacao
+            Perfil.objects.bulk_create([registro.perfil for registro in self._validos], batch_size=TAMANHO_DO_LOTE)
+            perfil_ids = dict(Perfil.objects.filter(
+                usuario_id__in=usuario_ids.values()
+            ).values_list('usuario_id', 'id'))
+            perfil_ids = {email: perfil_ids[usuario_id] for email, usuario_id in usuario_ids.items()}
+
+            for campo, model in RELACOES_DO_PERFIL.items():
+                Relacao = getattr(Perfil, campo).through
+                coluna = f'{model._meta.model_name}_id'
+                Relacao.objects.bulk_create([
+                    Relacao(perfil_id=perfil_ids[registro.email], **{coluna: relacionado_id})
+                    for registro in self._validos
+                    for relacionado_id in dict.fromkeys(registro.relacoes[campo])
+                ], batch_size=TAMANHO_DO_LOTE)
+
+            # bulk_create não dispara os signals que mantêm os documentos dos perfis, o cache das respostas
+            # e o histórico
+            marcar_desatualizados(perfil_ids.values())
+            for model in (CustomUsuario, Perfil):
+                invalidar_respostas(model)
+            historico.registrar_em_lote(Perfil, {
+                perfil_ids[registro.email]: dict(historico.valores(registro.perfil), **{
+                    campo: sorted(set(ids)) for campo, ids in registro.relacoes.items()
+                })
+                for registro in self._validos
+            }, Historico.CRIACAO, self.usuario_modificacao.id)
+
+        return [perfil_ids[registro.email] for registro in self._validos]
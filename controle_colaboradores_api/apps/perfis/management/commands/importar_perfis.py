@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from controle_colaboradores_api.apps.usuarios.models import CustomUsuario
+from controle_colaboradores_api.apps.perfis.importacao import ImportacaoDePerfis, ler_arquivo
+
+
+class Command(BaseCommand):
+    help = "Importa em lote usuários e seus perfis a partir de um arquivo CSV ou JSON, " \
+           "no mesmo formato aceito pelo endpoint perfis/importar/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do arquivo .csv ou .json.")
+        parser.add_argument('--usuario-modificacao',
+                            required=True,
+                            help="E-mail do usuário registrado como responsável pela criação dos perfis.")
+
+    def handle(self, *args, **options):
+        try:
+            usuario_modificacao = CustomUsuario.objects.get(email=options['usuario_modificacao'])
+        except CustomUsuario.DoesNotExist:
+            raise CommandError("Usuário responsável não encontrado.")
+
+        importacao = ImportacaoDePerfis(ler_arquivo(options['arquivo']), usuario_modificacao)
+        if not importacao.validar():
+            for erro in importacao.erros:
+                for campo, mensagens in erro['erros'].items():
+                    self.stderr.write(f"Linha {erro['linha']} - {campo}: {' '.join(mensagens)}")
+            raise CommandError(f"{len(importacao.erros)} registros inválidos. Nenhum perfil foi importado.")
+
+        perfil_ids = importacao.importar()
+        self.stdout.write(self.style.SUCCESS(f"-- {len(perfil_ids)} perfis importados com sucesso."))
+        return "Fim da execução bem sucedida."
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from controle_colaboradores_api.apps.perfis.documentos import reconstruir_documentos
+from controle_colaboradores_api.apps.perfis.models import Perfil, DocumentoDePerfil
+
+
+class Command(BaseCommand):
+    help = "Gera os documentos pré-calculados dos perfis que ainda não os têm " \
+           "ou, com --todos, de todos os perfis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos',
+                            action='store_true',
+                            help="Reconstrói também os documentos já existentes.")
+
+    def handle(self, *args, **options):
+        perfis = Perfil.objects.all()
+        if not options.get('todos'):
+            perfis = perfis.exclude(id__in=DocumentoDePerfil.objects.values('perfil_id'))
+        perfil_ids = list(perfis.values_list('id', flat=True))
+        reconstruir_documentos(perfil_ids)
+        self.stdout.write(self.style.SUCCESS(f"-- {len(perfil_ids)} documentos de perfis reconstruídos."))
+        return "Fim da execução bem sucedida."
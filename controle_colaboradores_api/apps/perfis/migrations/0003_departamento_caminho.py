@@ -0,0 +1,41 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+def preencher_caminhos(apps, schema_editor):
+    Departamento = apps.get_model('perfis', 'Departamento')
+    departamentos = list(Departamento.objects.all())
+    subordinados = {}
+    for departamento in departamentos:
+        subordinados.setdefault(departamento.departamento_superior_id, []).append(departamento)
+
+    pendentes = [(departamento, '/', 0) for departamento in subordinados.get(None, [])]
+    while pendentes:
+        departamento, caminho_superior, nivel = pendentes.pop()
+        departamento.caminho = f'{caminho_superior}{departamento.id}/'
+        departamento.nivel = nivel
+        pendentes.extend((subordinado, departamento.caminho, nivel + 1)
+                         for subordinado in subordinados.get(departamento.id, []))
+    Departamento.objects.bulk_update(departamentos, ['caminho', 'nivel'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departamento',
+            name='caminho',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Caminho na hierarquia'),
+        ),
+        migrations.AddField(
+            model_name='departamento',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nível na hierarquia'),
+        ),
+        migrations.RunPython(preencher_caminhos, migrations.RunPython.noop),
+    ]
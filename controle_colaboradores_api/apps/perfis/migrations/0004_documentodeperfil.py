@@ -0,0 +1,26 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0003_departamento_caminho'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoDePerfil',
+            fields=[
+                ('perfil', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='documento', serialize=False, to='perfis.perfil')),
+                ('conteudo', models.TextField(verbose_name='Conteúdo (JSON)')),
+                ('modificacao', models.DateTimeField(auto_now=True, verbose_name='Modificação')),
+            ],
+            options={
+                'verbose_name': 'Documento de perfil',
+                'verbose_name_plural': 'Documentos de perfis',
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0004_documentodeperfil'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cargo',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.AlterField(
+            model_name='departamento',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.AlterField(
+            model_name='endereco',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.AlterField(
+            model_name='outroemail',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.AlterField(
+            model_name='perfil',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.AlterField(
+            model_name='telefone',
+            name='modificacao',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modificação'),
+        ),
+        migrations.CreateModel(
+            name='Exclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('objeto_id', models.PositiveIntegerField(verbose_name='Id do objeto excluído')),
+                ('exclusao', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Exclusão')),
+                ('perfil', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='perfis.perfil', verbose_name='Perfil do objeto excluído')),
+            ],
+            options={
+                'verbose_name': 'Exclusão',
+                'verbose_name_plural': 'Exclusões',
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:02
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+CAMPOS_NAO_REGISTRADOS = {'id', 'criacao', 'modificacao', 'usuario_modificacao', 'caminho', 'nivel'}
+TAMANHO_DO_LOTE = 1000
+
+
+def registrar_estados_atuais(apps, schema_editor):
+    # Os objetos existentes passam a ter no histórico a sua criação com os valores atuais
+    Historico = apps.get_model('perfis', 'Historico')
+    for nome_do_model in ('Perfil', 'Cargo', 'Departamento'):
+        model = apps.get_model('perfis', nome_do_model)
+        campos = [campo for campo in model._meta.concrete_fields if campo.name not in CAMPOS_NAO_REGISTRADOS]
+        relacoes = model._meta.many_to_many if nome_do_model == 'Perfil' else []
+        ids_relacionados = {}
+        for relacao in relacoes:
+            for objeto_id, relacionado_id in relacao.remote_field.through.objects.values_list(
+                relacao.m2m_field_name(), relacao.m2m_reverse_field_name()
+            ):
+                ids_relacionados.setdefault((relacao.name, objeto_id), []).append(relacionado_id)
+        registros = []
+        for objeto in model.objects.iterator(chunk_size=TAMANHO_DO_LOTE):
+            alteracoes = {campo.name: campo.value_from_object(objeto) for campo in campos}
+            for relacao in relacoes:
+                alteracoes[relacao.name] = sorted(ids_relacionados.get((relacao.name, objeto.id), []))
+            registros.append(Historico(tipo=model._meta.model_name, objeto_id=objeto.id, operacao='criacao',
+                                       alteracoes=alteracoes, usuario_id=objeto.usuario_modificacao_id,
+                                       data=objeto.modificacao))
+        Historico.objects.bulk_create(registros, batch_size=TAMANHO_DO_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('perfis', '0005_exclusao_e_indices_de_modificacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Historico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('objeto_id', models.PositiveIntegerField(verbose_name='Id do objeto')),
+                ('operacao', models.CharField(choices=[('criacao', 'Criação'), ('alteracao', 'Alteração'), ('exclusao', 'Exclusão')], max_length=10, verbose_name='Operação')),
+                ('alteracoes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Alterações')),
+                ('data', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário da modificação')),
+            ],
+            options={
+                'verbose_name': 'Histórico',
+                'verbose_name_plural': 'Históricos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historico',
+            index=models.Index(fields=['tipo', 'objeto_id', 'data'], name='historico_objeto_data_idx'),
+        ),
+        migrations.RunPython(registrar_estados_atuais, migrations.RunPython.noop),
+    ]
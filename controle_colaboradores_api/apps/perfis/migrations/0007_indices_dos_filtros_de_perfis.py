@@ -0,0 +1,46 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+# Índices das tabelas das relações do perfil que começam pelo relacionado, para os filtros por
+# cargo, departamento e município: as chaves únicas existentes começam pelo perfil.
+INDICES_DAS_RELACOES = [
+    ('perfis_perfil_cargos_cargo_perfil_idx', 'perfis_perfil_cargos', 'cargo_id'),
+    ('perfis_perfil_departamentos_departamento_perfil_idx', 'perfis_perfil_departamentos', 'departamento_id'),
+    ('perfis_perfil_municipios_municipio_perfil_idx', 'perfis_perfil_municipios_onde_trabalha', 'municipio_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0006_historico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['nome', 'id'], name='perfil_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['sobrenome', 'id'], name='perfil_sobrenome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome', 'id'], name='perfil_ativos_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['data_admissao'], name='perfil_data_admissao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['data_demissao'], name='perfil_data_demissao_idx'),
+        ),
+        migrations.RunSQL(
+            [f'CREATE INDEX {nome} ON {tabela} ({coluna}, perfil_id)'
+             for nome, tabela, coluna in INDICES_DAS_RELACOES],
+            reverse_sql=[f'DROP INDEX {nome}' for nome, _, _ in INDICES_DAS_RELACOES]
+        ),
+    ]
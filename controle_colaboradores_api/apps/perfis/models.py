@@ -1,12 +1,17 @@
 from django.db import models, transaction
-from django.db.models import Q
+from django.utils import timezone
+from django.db.models import Q, F, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 
 
 class Base(models.Model):
     criacao = models.DateTimeField('Criação', auto_now_add=True)
-    modificacao = models.DateTimeField('Modificação', auto_now=True)
+    # Indexado para as consultas incrementais (?modificado_desde=)
+    modificacao = models.DateTimeField('Modificação', auto_now=True, db_index=True)
 
     class Meta:
         abstract = True
@@ -50,6 +55,15 @@ class Perfil(BaseParaModelsImportantes):
     class Meta:
         verbose_name = 'Perfil'
         verbose_name_plural = 'Perfis'
+        # Para os filtros e as ordenações da listagem. Os filtros por cargo, departamento e município
+        # usam os índices das tabelas das relações que começam pelo relacionado (migração 0007).
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='perfil_nome_idx'),
+            models.Index(fields=['sobrenome', 'id'], name='perfil_sobrenome_idx'),
+            models.Index(fields=['nome', 'id'], condition=Q(ativo=True), name='perfil_ativos_nome_idx'),
+            models.Index(fields=['data_admissao'], name='perfil_data_admissao_idx'),
+            models.Index(fields=['data_demissao'], name='perfil_data_demissao_idx')
+        ]
 
     def __str__(self):
         return f'{self.usuario.email} - {self.nome} {self.sobrenome}'
@@ -154,9 +168,125 @@ class Departamento(BaseParaModelsImportantes):
                                               related_name="departamentos_subordinados",
                                               on_delete=models.RESTRICT)
 
+    # Caminho materializado da hierarquia, no formato '/id_raiz/.../id_do_departamento/',
+    # mantido no save() para consultar subárvores com um único filtro indexado.
+    caminho = models.CharField('Caminho na hierarquia', max_length=255, db_index=True, editable=False, default='')
+    nivel = models.PositiveSmallIntegerField('Nível na hierarquia', default=0, editable=False)
+
     class Meta:
         verbose_name = 'Departamento'
         verbose_name_plural = 'Departamentos'
 
     def __str__(self):
         return f'{self.nome}'
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            superior = None
+            if self.departamento_superior_id:
+                superior = Departamento.objects.values('caminho', 'nivel').get(id=self.departamento_superior_id)
+                if self.id and f'/{self.id}/' in superior['caminho']:
+                    raise ValidationError("O departamento superior não pode ser o próprio "
+                                          "departamento ou um de seus subordinados.")
+            super().save(*args, **kwargs)
+            self._atualizar_caminho(superior)
+
+    def _atualizar_caminho(self, superior):
+        caminho_anterior, nivel_anterior = self.caminho, self.nivel
+        if superior:
+            caminho, nivel = f"{superior['caminho']}{self.id}/", superior['nivel'] + 1
+        else:
+            caminho, nivel = f'/{self.id}/', 0
+        if caminho == caminho_anterior:
+            return
+
+        Departamento.objects.filter(id=self.id).update(caminho=caminho, nivel=nivel)
+        if caminho_anterior:
+            # Reposiciona toda a subárvore do departamento com um único UPDATE
+            Departamento.objects.filter(
+                caminho__startswith=caminho_anterior
+            ).exclude(id=self.id).update(
+                caminho=Concat(Value(caminho), Substr('caminho', len(caminho_anterior) + 1),
+                               output_field=models.CharField()),
+                nivel=F('nivel') + (nivel - nivel_anterior)
+            )
+        self.caminho, self.nivel = caminho, nivel
+
+
+class DocumentoDePerfil(models.Model):
+    """
+    Representação completa do perfil, igual à de PerfilSerializer, pré-calculada e
+    servida diretamente nas consultas de perfis. É descartada e reconstruída sempre
+    que algum dos dados que a compõem é alterado (vide documentos.py e signals.py).
+    """
+    perfil = models.OneToOneField(Perfil, primary_key=True, related_name="documento", on_delete=models.CASCADE)
+    conteudo = models.TextField('Conteúdo (JSON)')
+    modificacao = models.DateTimeField('Modificação', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Documento de perfil'
+        verbose_name_plural = 'Documentos de perfis'
+
+    def __str__(self):
+        return f'Documento do perfil {self.perfil_id}'
+
+
+class Exclusao(models.Model):
+    """
+    Registro da exclusão de um dado para contato, para que os sistemas que acompanham as
+    alterações incrementalmente (?modificado_desde=) também apliquem as exclusões.
+    O perfil é mantido sem constraint, pois o registro sobrevive à exclusão do perfil.
+    """
+    tipo = models.CharField('Tipo', max_length=50)
+    objeto_id = models.PositiveIntegerField('Id do objeto excluído')
+    perfil = models.ForeignKey(Perfil,
+                               verbose_name="Perfil do objeto excluído",
+                               related_name="+",
+                               on_delete=models.DO_NOTHING,
+                               db_constraint=False,
+                               null=True)
+    exclusao = models.DateTimeField('Exclusão', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Exclusão'
+        verbose_name_plural = 'Exclusões'
+
+    def __str__(self):
+        return f'{self.tipo} {self.objeto_id} excluído em {self.exclusao}'
+
+
+class Historico(models.Model):
+    """
+    Registro, somente acrescentado, de uma criação, alteração ou exclusão de Perfil, Cargo ou
+    Departamento, com os valores dos campos alterados (vide historico.py). Os estados
+    passados de um objeto são reconstruídos a partir dos seus registros até a data desejada.
+    """
+    CRIACAO = 'criacao'
+    ALTERACAO = 'alteracao'
+    EXCLUSAO = 'exclusao'
+    OPERACOES = [
+        (CRIACAO, 'Criação'),
+        (ALTERACAO, 'Alteração'),
+        (EXCLUSAO, 'Exclusão')
+    ]
+
+    tipo = models.CharField('Tipo', max_length=50)
+    objeto_id = models.PositiveIntegerField('Id do objeto')
+    operacao = models.CharField('Operação', max_length=10, choices=OPERACOES)
+    alteracoes = models.JSONField('Alterações', encoder=DjangoJSONEncoder, default=dict)
+    usuario = models.ForeignKey(get_user_model(),
+                                verbose_name="Usuário da modificação",
+                                related_name="+",
+                                on_delete=models.SET_NULL,
+                                null=True)
+    data = models.DateTimeField('Data', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Histórico'
+        verbose_name_plural = 'Históricos'
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id', 'data'], name='historico_objeto_data_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.get_operacao_display()} de {self.tipo} {self.objeto_id} em {self.data}'
@@ -1,9 +1,12 @@
 import re
 
+from django.db.models import ExpressionWrapper, F, Func, Prefetch, Value
 from pycpfcnpj import cpf
 from rest_framework import serializers
 
+from controle_colaboradores_api.serializers_mixins import CamposSelecionaveisMixin
 from controle_colaboradores_api.apps.usuarios.serializers import CustomUsuarioSerializer
+from controle_colaboradores_api.apps.localidades_brasileiras.models import Municipio
 from controle_colaboradores_api.apps.localidades_brasileiras.serializers import MunicipioSerializer
 
 from .models import (
@@ -12,7 +15,9 @@ from .models import (
     Telefone,
     OutroEmail,
     Cargo,
-    Departamento)
+    Departamento,
+    Exclusao,
+    Historico)
 
 
 class EnderecoSerializer(serializers.HyperlinkedModelSerializer):
@@ -161,13 +166,74 @@ class CargoMudarAtivacaoSerializer(serializers.ModelSerializer):
         ]
 
 
-class DepartamentoSerializer(serializers.HyperlinkedModelSerializer):
+class CargoReajusteSerializer(serializers.Serializer):
+    """
+    Reajuste dos salários dos cargos que atendem aos filtros (ids, classe, nome e ativo),
+    por percentual ou por valor fixo. Sem filtros, reajusta todos os cargos somente com todos.
+    Com simular, somente projeta o reajuste.
+    """
+    filtros = ('ids', 'classe', 'nome', 'ativo')
+
+    percentual = serializers.DecimalField(max_digits=7, decimal_places=2, required=False)
+    valor = serializers.DecimalField(max_digits=20, decimal_places=2, required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    classe = serializers.CharField(required=False)
+    nome = serializers.CharField(required=False)
+    ativo = serializers.BooleanField(required=False)
+    todos = serializers.BooleanField(default=False)
+    simular = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if ('percentual' in data) == ('valor' in data):
+            raise serializers.ValidationError("Informe o percentual ou o valor do reajuste, e não ambos.")
+        if not data['todos'] and not any(filtro in data for filtro in self.filtros):
+            raise serializers.ValidationError(
+                "Informe ao menos um filtro (ids, classe, nome ou ativo) ou todos para reajustar todos os cargos."
+            )
+        return data
+
+    def filtrar(self, queryset):
+        filtros = {
+            'id__in': self.validated_data.get('ids'),
+            'classe__iexact': self.validated_data.get('classe'),
+            'nome__iexact': self.validated_data.get('nome'),
+            'ativo': self.validated_data.get('ativo')
+        }
+        return queryset.filter(**{filtro: valor for filtro, valor in filtros.items() if valor is not None})
+
+    def novo_salario(self, campo='salario'):
+        """Expressão do salário reajustado, calculada pelo banco a partir do campo informado."""
+        salario = Cargo._meta.get_field('salario')
+        if 'valor' in self.validated_data:
+            return ExpressionWrapper(F(campo) + self.validated_data['valor'], output_field=salario)
+        fator = 1 + self.validated_data['percentual'] / 100
+        return Func(F(campo) * fator, Value(2), function='ROUND', output_field=salario)
+
+
+class DepartamentoSerializer(CamposSelecionaveisMixin, serializers.HyperlinkedModelSerializer):
+    campos_expansiveis = ('departamento_superior',)
+
+    @staticmethod
+    def obter_departamentos_por_id(request):
+        """
+        Mapa id -> Departamento com toda a hierarquia, carregado em uma única query
+        e reaproveitado por todos os serializers da mesma requisição.
+        """
+        if not hasattr(request, '_departamentos_por_id'):
+            request._departamentos_por_id = {d.id: d for d in Departamento.objects.all()}
+        return request._departamentos_por_id
 
     def to_representation(self, instance):
         request = self.context['request']
         data = super().to_representation(instance)
-        if data['departamento_superior']:
-            data['departamento_superior'] = DepartamentoSerializer(instance.departamento_superior,
+        if data.get('departamento_superior'):
+            departamentos_por_id = self.obter_departamentos_por_id(request)
+            if instance.departamento_superior_id in departamentos_por_id:
+                departamento_superior = departamentos_por_id[instance.departamento_superior_id]
+            else:
+                # Departamento criado após a carga do mapa ainda não consta nele
+                departamento_superior = instance.departamento_superior
+            data['departamento_superior'] = DepartamentoSerializer(departamento_superior,
                                                                    context={'request': request}).data
         return data
 
@@ -175,6 +241,9 @@ class DepartamentoSerializer(serializers.HyperlinkedModelSerializer):
         if value and self.instance and self.instance == value:
             raise serializers.ValidationError("O departamento superior não pode "
                                               "ser o próprio departamento.")
+        if value and self.instance and value.caminho.startswith(self.instance.caminho):
+            raise serializers.ValidationError("O departamento superior não pode "
+                                              "ser um departamento subordinado.")
         return value
 
     def validate(self, data):
@@ -238,9 +307,23 @@ class DepartamentoMudarAtivacaoSerializer(serializers.ModelSerializer):
         ]
 
 
-class PerfilSerializer(serializers.HyperlinkedModelSerializer):
-
-    def validate_cpf(self, value):
+class PerfilSerializer(CamposSelecionaveisMixin, serializers.HyperlinkedModelSerializer):
+    # Relações expandidas em to_representation: campo -> (serializer, many)
+    serializers_aninhados = {
+        'usuario': (CustomUsuarioSerializer, False),
+        'cargos': (CargoSerializer, True),
+        'departamentos': (DepartamentoSerializer, True),
+        'diretor_em': (DepartamentoSerializer, True),
+        'diretor_substituto_em': (DepartamentoSerializer, True),
+        'municipios_onde_trabalha': (MunicipioSerializer, True),
+        'enderecos': (EnderecoSerializer, True),
+        'telefones': (TelefoneSerializer, True),
+        'outros_emails': (OutroEmailSerializer, True)
+    }
+    campos_expansiveis = tuple(serializers_aninhados)
+
+    @staticmethod
+    def validate_cpf(value):
         cpf_pattern = re.compile(r"^\d{3}\.\d{3}\.\d{3}-\d{2}$")
         if not cpf_pattern.match(value):
             raise serializers.ValidationError("CPF no formato incorreto. Informe no formato: 000.000.000-00")
@@ -248,35 +331,45 @@ class PerfilSerializer(serializers.HyperlinkedModelSerializer):
             raise serializers.ValidationError("CPF inválido.")
         return value
 
+    @staticmethod
+    def otimizar_queryset(queryset, campos=None):
+        """
+        Carrega antecipadamente tudo o que é percorrido em to_representation,
+        de modo que a serialização de uma página de perfis execute um número
+        fixo de queries, independentemente da quantidade de perfis.
+        Se informados os campos selecionados, somente as relações entre eles são carregadas.
+        """
+        departamentos = Departamento.objects.order_by('id')
+        prefetches = {
+            'usuario': ['usuario__groups'],
+            'cargos': ['cargos'],
+            'departamentos': [Prefetch('departamentos', queryset=departamentos)],
+            'diretor_em': [Prefetch('diretor_em', queryset=departamentos)],
+            'diretor_substituto_em': [Prefetch('diretor_substituto_em', queryset=departamentos)],
+            'municipios_onde_trabalha': [
+                Prefetch('municipios_onde_trabalha', queryset=Municipio.objects.select_related('uf'))
+            ],
+            'enderecos': [Prefetch('enderecos', queryset=Endereco.objects.select_related('municipio__uf'))],
+            'telefones': ['telefones'],
+            'outros_emails': ['outros_emails']
+        }
+        return queryset.select_related(
+            'usuario'
+        ).prefetch_related(
+            *[prefetch for campo, lookups in prefetches.items()
+              if campos is None or campo in campos
+              for prefetch in lookups]
+        )
+
     def to_representation(self, instance):
         request = self.context['request']
         data = super().to_representation(instance)
-        data['usuario'] = CustomUsuarioSerializer(instance.usuario,
-                                                  context={'request': request}).data
-        data['cargos'] = CargoSerializer(instance.cargos.all(),
-                                         many=True,
-                                         context={'request': self.context['request']}).data
-        data['departamentos'] = DepartamentoSerializer(instance.departamentos.all(),
-                                                       many=True,
-                                                       context={'request': request}).data
-        data['diretor_em'] = DepartamentoSerializer(instance.diretor_em.all(),
-                                                    many=True,
-                                                    context={'request': request}).data
-        data['diretor_substituto_em'] = DepartamentoSerializer(instance.diretor_substituto_em.all(),
-                                                               many=True,
-                                                               context={'request': request}).data
-        data['municipios_onde_trabalha'] = MunicipioSerializer(instance.municipios_onde_trabalha.all(),
-                                                               many=True,
-                                                               context={'request': request}).data
-        data['enderecos'] = EnderecoSerializer(instance.enderecos.all(),
-                                               many=True,
+        for campo, (serializer_class, many) in self.serializers_aninhados.items():
+            if campo in data:
+                relacionado = getattr(instance, campo)
+                data[campo] = serializer_class(relacionado.all() if many else relacionado,
+                                               many=many,
                                                context={'request': request}).data
-        data['telefones'] = TelefoneSerializer(instance.telefones.all(),
-                                               many=True,
-                                               context={'request': request}).data
-        data['outros_emails'] = OutroEmailSerializer(instance.outros_emails.all(),
-                                                     many=True,
-                                                     context={'request': request}).data
         return data
 
     class Meta:
@@ -326,3 +419,84 @@ class PerfilSerializer(serializers.HyperlinkedModelSerializer):
             'telefones': {"required": False},
             'outros_emails': {"required": False}
         }
+
+
+class PerfilFiltroSerializer(serializers.Serializer):
+    """
+    Filtros da listagem e da exportação de perfis, informados na query string. Os filtros
+    pelas relações são subconsultas às tabelas das relações, pelos índices que começam pelo
+    cargo, departamento ou município, sem repetir perfis. As ordenações são as da view
+    (atributo ordenacoes, o mesmo da paginação por cursor).
+    """
+    ativo = serializers.BooleanField(required=False)
+    cargo = serializers.IntegerField(required=False)
+    departamento = serializers.IntegerField(required=False)
+    municipio_onde_trabalha = serializers.IntegerField(required=False)
+    uf = serializers.CharField(required=False)
+    data_admissao_desde = serializers.DateField(required=False)
+    data_admissao_ate = serializers.DateField(required=False)
+    data_demissao_desde = serializers.DateField(required=False)
+    data_demissao_ate = serializers.DateField(required=False)
+    ordenacao = serializers.ChoiceField(choices=[], required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['ordenacao'].choices = [*self.context['view'].ordenacoes]
+
+    def validate_uf(self, value):
+        # Em maiúsculas, para consultar pelo índice único da sigla
+        return value.upper()
+
+    def filtrar(self, queryset):
+        dados = self.validated_data
+        filtros = {
+            'ativo': dados.get('ativo'),
+            'data_admissao__gte': dados.get('data_admissao_desde'),
+            'data_admissao__lte': dados.get('data_admissao_ate'),
+            'data_demissao__gte': dados.get('data_demissao_desde'),
+            'data_demissao__lte': dados.get('data_demissao_ate')
+        }
+        queryset = queryset.filter(**{filtro: valor for filtro, valor in filtros.items() if valor is not None})
+
+        relacoes = {
+            'cargo': (Perfil.cargos.through, 'cargo_id'),
+            'departamento': (Perfil.departamentos.through, 'departamento_id'),
+            'municipio_onde_trabalha': (Perfil.municipios_onde_trabalha.through, 'municipio_id'),
+            'uf': (Perfil.municipios_onde_trabalha.through, 'municipio__uf__sigla')
+        }
+        for parametro, (Relacao, filtro) in relacoes.items():
+            if parametro in dados:
+                perfil_ids = Relacao.objects.filter(**{filtro: dados[parametro]}).values('perfil_id')
+                queryset = queryset.filter(id__in=perfil_ids)
+
+        if 'ordenacao' in dados:
+            queryset = queryset.order_by(*self.context['view'].ordenacoes[dados['ordenacao']])
+        return queryset
+
+
+class ExclusaoSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Exclusao
+        fields = [
+            'id',
+            'tipo',
+            'objeto_id',
+            'perfil',
+            'exclusao'
+        ]
+        read_only_fields = fields
+
+
+class HistoricoSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Historico
+        fields = [
+            'id',
+            'operacao',
+            'alteracoes',
+            'usuario',
+            'data'
+        ]
+        read_only_fields = fields
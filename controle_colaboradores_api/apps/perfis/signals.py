@@ -0,0 +1,254 @@
+from django.contrib.auth.models import Group
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from controle_colaboradores_api.cache_de_respostas import invalidar_respostas
+from controle_colaboradores_api.apps.usuarios.models import CustomUsuario
+from controle_colaboradores_api.apps.localidades_brasileiras.models import UnidadeFederativa, Municipio
+from controle_colaboradores_api.apps.localidades_brasileiras.signals import localidades_atualizadas_em_lote
+
+from . import historico
+from .documentos import marcar_desatualizados
+from .models import Perfil, Endereco, Telefone, OutroEmail, Cargo, Departamento, Exclusao, Historico
+
+# Mantêm os documentos dos perfis (DocumentoDePerfil) em dia com todos os dados que os compõem.
+
+
+@receiver(post_save, sender=Perfil)
+def perfil_alterado(sender, instance, **kwargs):
+    marcar_desatualizados([instance.id])
+
+
+@receiver(m2m_changed, sender=Perfil.cargos.through)
+@receiver(m2m_changed, sender=Perfil.departamentos.through)
+@receiver(m2m_changed, sender=Perfil.municipios_onde_trabalha.through)
+def relacoes_do_perfil_alteradas(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # perfil.cargos.add/remove/set/clear
+        if action == 'post_clear' or (action in ('post_add', 'post_remove') and pk_set):
+            marcar_desatualizados([instance.id])
+    elif action in ('post_add', 'post_remove'):
+        # cargo.perfis.add/remove
+        marcar_desatualizados(pk_set)
+    elif action == 'pre_clear':
+        marcar_desatualizados(list(instance.perfis.values_list('id', flat=True)))
+
+
+@receiver(pre_save, sender=Endereco)
+@receiver(pre_save, sender=Telefone)
+@receiver(pre_save, sender=OutroEmail)
+def dado_para_contato_sera_alterado(sender, instance, **kwargs):
+    # O dado para contato pode estar mudando de perfil
+    if instance.pk:
+        marcar_desatualizados(list(sender.objects.filter(pk=instance.pk).values_list('perfil_id', flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Endereco)
+@receiver([post_save, post_delete], sender=Telefone)
+@receiver([post_save, post_delete], sender=OutroEmail)
+def dado_para_contato_alterado(sender, instance, **kwargs):
+    marcar_desatualizados([instance.perfil_id])
+
+
+@receiver(post_save, sender=Cargo)
+def cargo_alterado(sender, instance, created, **kwargs):
+    if not created:
+        marcar_desatualizados(Perfil.objects.filter(cargos=instance))
+
+
+@receiver(pre_delete, sender=Cargo)
+def cargo_sera_excluido(sender, instance, **kwargs):
+    marcar_desatualizados(list(instance.perfis.values_list('id', flat=True)))
+
+
+def _perfis_relacionados_a_subarvore(departamento):
+    """Perfis lotados, diretores ou substitutos no departamento ou em seus subordinados,
+    cujas representações incluem o departamento e seus superiores."""
+    if departamento.caminho:
+        subarvore = Departamento.objects.filter(caminho__startswith=departamento.caminho)
+    else:
+        subarvore = Departamento.objects.filter(id=departamento.id)
+    return list(Perfil.objects.filter(
+        Q(departamentos__in=subarvore) | Q(diretor_em__in=subarvore) | Q(diretor_substituto_em__in=subarvore)
+    ).distinct().values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Departamento)
+@receiver(pre_delete, sender=Departamento)
+def departamento_sera_alterado(sender, instance, **kwargs):
+    # Antes da alteração, para incluir os antigos diretores
+    if instance.pk:
+        marcar_desatualizados(_perfis_relacionados_a_subarvore(instance))
+
+
+@receiver(post_save, sender=Departamento)
+def departamento_alterado(sender, instance, **kwargs):
+    marcar_desatualizados([instance.diretor_id, instance.diretor_substituto_id])
+
+
+@receiver(post_save, sender=Municipio)
+def municipio_alterado(sender, instance, created, **kwargs):
+    if not created:
+        marcar_desatualizados(Perfil.objects.filter(
+            Q(municipios_onde_trabalha=instance) | Q(enderecos__municipio=instance)
+        ).distinct())
+
+
+@receiver(post_save, sender=UnidadeFederativa)
+def unidade_federativa_alterada(sender, instance, created, **kwargs):
+    if not created:
+        marcar_desatualizados(Perfil.objects.filter(
+            Q(municipios_onde_trabalha__uf=instance) | Q(enderecos__municipio__uf=instance)
+        ).distinct())
+
+
+@receiver(localidades_atualizadas_em_lote)
+def localidades_atualizadas(sender, uf_ids, municipio_ids, **kwargs):
+    marcar_desatualizados(list(Perfil.objects.filter(
+        Q(municipios_onde_trabalha__in=municipio_ids) | Q(enderecos__municipio__in=municipio_ids)
+        | Q(municipios_onde_trabalha__uf__in=uf_ids) | Q(enderecos__municipio__uf__in=uf_ids)
+    ).distinct().values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=CustomUsuario)
+def usuario_alterado(sender, instance, created, **kwargs):
+    if not created:
+        marcar_desatualizados(Perfil.objects.filter(usuario_id=instance.id))
+
+
+@receiver(m2m_changed, sender=CustomUsuario.groups.through)
+def grupos_do_usuario_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # usuario.groups.add/remove/set/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            marcar_desatualizados(Perfil.objects.filter(usuario_id=instance.id))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        # group.user_set.add/remove
+        marcar_desatualizados(Perfil.objects.filter(usuario_id__in=pk_set))
+    elif action == 'pre_clear':
+        marcar_desatualizados(list(Perfil.objects.filter(usuario__groups=instance).values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=Group)
+def grupo_alterado(sender, instance, created, **kwargs):
+    if not created:
+        marcar_desatualizados(Perfil.objects.filter(usuario__groups=instance))
+
+
+@receiver(pre_delete, sender=Group)
+def grupo_sera_excluido(sender, instance, **kwargs):
+    marcar_desatualizados(list(Perfil.objects.filter(usuario__groups=instance).values_list('id', flat=True)))
+
+
+# Mantêm o acompanhamento incremental das alterações (?modificado_desde=): os dados para contato
+# compõem o perfil, cuja modificação passa a refletir a deles, e as suas exclusões são registradas.
+
+def _modificar_perfis(perfis):
+    # update() não altera os demais campos do perfil nem dispara os seus signals
+    perfis.update(modificacao=timezone.now())
+
+
+@receiver(pre_save, sender=Endereco)
+@receiver(pre_save, sender=Telefone)
+@receiver(pre_save, sender=OutroEmail)
+def perfil_do_dado_para_contato_sera_modificado(sender, instance, **kwargs):
+    # O perfil anterior, caso o dado para contato esteja mudando de perfil
+    if instance.pk:
+        _modificar_perfis(Perfil.objects.filter(id__in=sender.objects.filter(pk=instance.pk).exclude(
+            perfil_id=instance.perfil_id
+        ).values('perfil_id')))
+
+
+@receiver([post_save, post_delete], sender=Endereco)
+@receiver([post_save, post_delete], sender=Telefone)
+@receiver([post_save, post_delete], sender=OutroEmail)
+def perfil_do_dado_para_contato_modificado(sender, instance, **kwargs):
+    _modificar_perfis(Perfil.objects.filter(id=instance.perfil_id))
+
+
+@receiver(post_delete, sender=Endereco)
+@receiver(post_delete, sender=Telefone)
+@receiver(post_delete, sender=OutroEmail)
+def registrar_exclusao(sender, instance, **kwargs):
+    Exclusao.objects.create(tipo=sender._meta.model_name, objeto_id=instance.pk, perfil_id=instance.perfil_id)
+
+
+# Registram o histórico de Perfil, Cargo e Departamento (vide historico.py).
+
+@receiver(pre_save, sender=Perfil)
+@receiver(pre_save, sender=Cargo)
+@receiver(pre_save, sender=Departamento)
+def objeto_com_historico_sera_salvo(sender, instance, **kwargs):
+    instance._valores_anteriores = None if instance._state.adding else historico.valores_no_banco(sender, instance.pk)
+
+
+@receiver(post_save, sender=Perfil)
+@receiver(post_save, sender=Cargo)
+@receiver(post_save, sender=Departamento)
+def registrar_salvamento(sender, instance, created, **kwargs):
+    anteriores = getattr(instance, '_valores_anteriores', None)
+    if created or anteriores is None:
+        historico.registrar(sender, instance.pk, Historico.CRIACAO, historico.valores(instance),
+                            instance.usuario_modificacao_id)
+    else:
+        historico.registrar(sender, instance.pk, Historico.ALTERACAO,
+                            historico.diferencas(anteriores, historico.valores(instance)),
+                            instance.usuario_modificacao_id)
+
+
+@receiver(post_delete, sender=Perfil)
+@receiver(post_delete, sender=Cargo)
+@receiver(post_delete, sender=Departamento)
+def registrar_exclusao_no_historico(sender, instance, **kwargs):
+    historico.registrar(sender, instance.pk, Historico.EXCLUSAO, {})
+
+
+def _ids_na_relacao(action, ids):
+    if action == 'post_add':
+        return {'adicionados': sorted(ids), 'removidos': []}
+    return {'adicionados': [], 'removidos': sorted(ids)}
+
+
+@receiver(m2m_changed, sender=Perfil.cargos.through)
+@receiver(m2m_changed, sender=Perfil.departamentos.through)
+@receiver(m2m_changed, sender=Perfil.municipios_onde_trabalha.through)
+def registrar_relacoes_do_perfil(sender, instance, action, reverse, pk_set, **kwargs):
+    campo = next(relacao.name for relacao in Perfil._meta.many_to_many if relacao.remote_field.through is sender)
+    if not reverse:
+        # perfil.cargos.add/remove/set/clear
+        if action == 'post_clear':
+            historico.registrar(Perfil, instance.pk, Historico.ALTERACAO, {campo: []},
+                                instance.usuario_modificacao_id)
+        elif action in ('post_add', 'post_remove') and pk_set:
+            historico.registrar(Perfil, instance.pk, Historico.ALTERACAO, {campo: _ids_na_relacao(action, pk_set)},
+                                instance.usuario_modificacao_id)
+    elif action in ('post_add', 'post_remove', 'pre_clear'):
+        # cargo.perfis.add/remove/clear
+        perfil_ids = pk_set if action != 'pre_clear' else instance.perfis.values_list('id', flat=True)
+        for perfil_id in perfil_ids:
+            historico.registrar(Perfil, perfil_id, Historico.ALTERACAO, {campo: _ids_na_relacao(action, [instance.pk])})
+
+
+# Invalidam as respostas em cache das viewsets (vide RespostaEmCacheMixin) que dependem dos models.
+
+@receiver([post_save, post_delete], sender=Perfil)
+@receiver([post_save, post_delete], sender=Cargo)
+@receiver([post_save, post_delete], sender=Departamento)
+@receiver([post_save, post_delete], sender=Endereco)
+@receiver([post_save, post_delete], sender=Telefone)
+@receiver([post_save, post_delete], sender=OutroEmail)
+@receiver([post_save, post_delete], sender=Municipio)
+@receiver([post_save, post_delete], sender=UnidadeFederativa)
+def invalidar_respostas_do_model(sender, **kwargs):
+    invalidar_respostas(sender)
+
+
+@receiver(m2m_changed, sender=Perfil.cargos.through)
+@receiver(m2m_changed, sender=Perfil.departamentos.through)
+@receiver(m2m_changed, sender=Perfil.municipios_onde_trabalha.through)
+def invalidar_respostas_das_relacoes_do_perfil(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_respostas(type(instance))
+        invalidar_respostas(model)
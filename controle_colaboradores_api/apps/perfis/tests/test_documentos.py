@@ -0,0 +1,188 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from model_bakery import baker
+from pycpfcnpj import gen
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from controle_colaboradores_api.apps.localidades_brasileiras.models import Municipio
+from controle_colaboradores_api.apps.perfis.documentos import marcar_desatualizados, reconstruir_documentos
+from controle_colaboradores_api.apps.perfis.models import Perfil, DocumentoDePerfil
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def grupo_administradores(db):
+    return baker.make('auth.Group', name="Administradores")
+
+
+@pytest.fixture
+def administrador(grupo_administradores):
+    return baker.make('CustomUsuario', email="admin@email.com", groups=[grupo_administradores])
+
+
+@pytest.fixture
+def alterar(django_capture_on_commit_callbacks):
+    """Executa a alteração em sua própria transação, com os callbacks de commit."""
+    def alterar(funcao, *args, **kwargs):
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            return funcao(*args, **kwargs)
+    return alterar
+
+
+@pytest.fixture
+def perfil(db, alterar):
+    def criar():
+        perfil = baker.make('Perfil',
+                            cpf=gen.cpf_with_punctuation(),
+                            nome="Fulano",
+                            cargos=[baker.make('Cargo', nome="Analista")],
+                            municipios_onde_trabalha=[baker.make('Municipio', nome="Maceió")])
+        superior = baker.make('Departamento', nome="Diretoria", diretor=perfil)
+        perfil.departamentos.add(baker.make('Departamento',
+                                            nome="Setor",
+                                            diretor=perfil,
+                                            departamento_superior=superior))
+        baker.make('Telefone', perfil=perfil, numero="(82) 99999-9999")
+        return perfil
+    return alterar(criar)
+
+
+def obter_documento(perfil):
+    return json.loads(DocumentoDePerfil.objects.get(perfil=perfil).conteudo)
+
+
+class TestDocumentoDePerfil:
+
+    def test_servido_igual_a_serializacao(self, api_client, administrador, perfil):
+        endpoint_url = reverse('perfil-detail', args=[perfil.id])
+        api_client.force_authenticate(user=administrador)
+
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        servido = json.loads(response.content)
+        assert servido['url'] == f'http://testserver{endpoint_url}'
+
+        DocumentoDePerfil.objects.all().delete()
+        response = api_client.get(endpoint_url)
+        assert json.loads(response.content) == servido
+
+        response = api_client.get(reverse('perfil-list'), {'fields': 'id,nome,cargos', 'expand': 'cargos'})
+        assert json.loads(response.content)['results'] == [
+            {'id': perfil.id, 'nome': "Fulano", 'cargos': servido['cargos']}
+        ]
+
+    def test_reconstrucao_em_cascata(self, alterar, perfil):
+        assert obter_documento(perfil)['cargos'][0]['nome'] == "Analista"
+
+        cargo = perfil.cargos.get()
+        cargo.nome = "Analista Sênior"
+        alterar(cargo.save)
+        assert obter_documento(perfil)['cargos'][0]['nome'] == "Analista Sênior"
+
+        municipio = perfil.municipios_onde_trabalha.get()
+        municipio.nome = "Maceió - AL"
+        alterar(municipio.save)
+        assert obter_documento(perfil)['municipios_onde_trabalha'][0]['nome'] == "Maceió - AL"
+
+        superior = perfil.departamentos.get().departamento_superior
+        novo_superior = baker.make('Departamento', nome="Presidência", diretor=perfil)
+        superior.departamento_superior = novo_superior
+        alterar(superior.save)
+        setor = obter_documento(perfil)['departamentos'][0]
+        assert setor['departamento_superior']['departamento_superior']['nome'] == "Presidência"
+
+        grupo = baker.make('auth.Group', name="Colaboradores")
+        alterar(perfil.usuario.groups.add, grupo)
+        grupo.name = "Colaboradores CLT"
+        alterar(grupo.save)
+        assert obter_documento(perfil)['usuario']['groups'][0]['name'] == "Colaboradores CLT"
+
+    def test_dado_para_contato_movido_para_outro_perfil(self, alterar, perfil):
+        outro_perfil = alterar(baker.make, 'Perfil', cpf=gen.cpf_with_punctuation())
+        telefone = perfil.telefones.get()
+        telefone.perfil = outro_perfil
+        alterar(telefone.save)
+        assert obter_documento(perfil)['telefones'] == []
+        assert obter_documento(outro_perfil)['telefones'][0]['numero'] == "(82) 99999-9999"
+
+    def test_rollback(self, django_capture_on_commit_callbacks, perfil):
+        documento = DocumentoDePerfil.objects.get(perfil=perfil)
+        with django_capture_on_commit_callbacks(execute=True) as callbacks, transaction.atomic():
+            try:
+                with transaction.atomic():
+                    perfil.nome = "Ciclano"
+                    perfil.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        assert callbacks == []
+        assert DocumentoDePerfil.objects.get(perfil=perfil).conteudo == documento.conteudo
+
+    def test_reconstrucao_descartada_com_a_transacao(self, transactional_db):
+        perfil = baker.make('Perfil', cpf=gen.cpf_with_punctuation(), nome="Fulano")
+        try:
+            with transaction.atomic():
+                marcar_desatualizados([perfil.id])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # Uma nova transação, no mesmo nível, agenda a sua própria reconstrução
+        with transaction.atomic():
+            Perfil.objects.filter(id=perfil.id).update(nome="Beltrano")
+            marcar_desatualizados([perfil.id])
+        assert obter_documento(perfil)['nome'] == "Beltrano"
+
+    def test_localidade_atualizada_pelo_comando(self, alterar, api_client, administrador):
+        alterar(call_command, 'cadastrar_localidades_brasileiras', stdout=StringIO())
+        maceio = Municipio.objects.get(nome="Maceió", uf__sigla='AL')
+        perfil = alterar(baker.make, 'Perfil', cpf=gen.cpf_with_punctuation(), municipios_onde_trabalha=[maceio])
+        alterar(baker.make, 'Endereco', perfil=perfil, municipio=maceio)
+        Municipio.objects.filter(id=maceio.id).update(nome="Nome Desatualizado")
+        reconstruir_documentos([perfil.id])
+        assert obter_documento(perfil)['municipios_onde_trabalha'][0]['nome'] == "Nome Desatualizado"
+
+        # O comando atualiza os municípios com bulk_update, sem post_save
+        alterar(call_command, 'cadastrar_localidades_brasileiras', forcar=True, stdout=StringIO())
+        api_client.force_authenticate(user=administrador)
+        servido = json.loads(api_client.get(reverse('perfil-detail', args=[perfil.id])).content)
+        assert servido['municipios_onde_trabalha'][0]['nome'] == "Maceió"
+        assert obter_documento(perfil)['municipios_onde_trabalha'][0]['nome'] == "Maceió"
+        assert "Nome Desatualizado" not in json.dumps(servido)
+
+    def test_reconstrucao_concorrente(self, alterar, monkeypatch, perfil):
+        bulk_create = DocumentoDePerfil.objects.bulk_create
+
+        def bulk_create_apos_outra_transacao(documentos, *args, **kwargs):
+            # Outra transação grava o documento entre a exclusão e a inclusão
+            DocumentoDePerfil.objects.create(perfil_id=documentos[0].perfil_id, conteudo='{}')
+            return bulk_create(documentos, *args, **kwargs)
+
+        monkeypatch.setattr(DocumentoDePerfil.objects, 'bulk_create', bulk_create_apos_outra_transacao)
+        perfil.nome = "Ciclano"
+        alterar(perfil.save)
+        # Sem erro na requisição, e o documento, possivelmente desatualizado, é descartado
+        assert not DocumentoDePerfil.objects.filter(perfil=perfil).exists()
+
+    def test_reconstrucao_imediata_limitada(self, alterar, monkeypatch, perfil):
+        monkeypatch.setattr('controle_colaboradores_api.apps.perfis.documentos.MAXIMO_DA_RECONSTRUCAO_IMEDIATA', 1)
+        outro_perfil = alterar(baker.make, 'Perfil', cpf=gen.cpf_with_punctuation())
+        alterar(marcar_desatualizados, [perfil.id, outro_perfil.id])
+        assert obter_documento(perfil)['nome'] == "Fulano"
+        assert not DocumentoDePerfil.objects.filter(perfil=outro_perfil).exists()
+
+        call_command('reconstruir_documentos_de_perfis', stdout=StringIO())
+        assert obter_documento(outro_perfil)['id'] == outro_perfil.id
+
+    def test_comando_reconstruir_documentos_de_perfis(self, perfil):
+        DocumentoDePerfil.objects.all().delete()
+        call_command('reconstruir_documentos_de_perfis')
+        assert obter_documento(perfil)['nome'] == "Fulano"
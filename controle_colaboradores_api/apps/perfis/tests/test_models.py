@@ -1,4 +1,5 @@
 import pytest
+from django.core.exceptions import ValidationError
 from model_bakery import baker
 
 
@@ -101,3 +102,30 @@ class TestDepartamento:
 
     def test_str(self, departamento):
         assert str(departamento) == "Diretoria de TI"
+
+    def test_save_caminho(self, departamento, perfil):
+        subordinado = baker.make('Departamento', diretor=perfil, departamento_superior=departamento)
+        assert departamento.caminho == f"/{departamento.id}/"
+        assert departamento.nivel == 0
+        assert subordinado.caminho == f"/{departamento.id}/{subordinado.id}/"
+        assert subordinado.nivel == 1
+
+    def test_save_mudanca_de_superior(self, departamento, perfil):
+        subordinado = baker.make('Departamento', diretor=perfil, departamento_superior=departamento)
+        neto = baker.make('Departamento', diretor=perfil, departamento_superior=subordinado)
+        novo_superior = baker.make('Departamento', diretor=perfil)
+
+        departamento.departamento_superior = novo_superior
+        departamento.save()
+
+        neto.refresh_from_db()
+        assert departamento.caminho == f"/{novo_superior.id}/{departamento.id}/"
+        assert neto.caminho == f"/{novo_superior.id}/{departamento.id}/{subordinado.id}/{neto.id}/"
+        assert neto.nivel == 3
+
+    def test_save_ciclo(self, departamento, perfil):
+        subordinado = baker.make('Departamento', diretor=perfil, departamento_superior=departamento)
+        departamento.departamento_superior = subordinado
+        with pytest.raises(ValidationError):
+            departamento.save()
+
@@ -3,6 +3,7 @@ from django.contrib.auth.hashers import make_password
 from rest_framework.exceptions import ValidationError as rest_ValidationError
 from model_bakery import baker
 from pycpfcnpj import gen
+from rest_framework.test import APIRequestFactory
 
 from controle_colaboradores_api.apps.perfis.serializers import (
     EnderecoSerializer,
@@ -121,6 +122,28 @@ class TestDepartamentoSerializer:
         serializer.instance.departamento_superior = outro_departamento
         serializer.instance.save()
         assert serializer.validate_departamento_superior(outro_departamento)
+        subordinado = baker.make('Departamento', diretor=outro_perfil, departamento_superior=departamento)
+        with pytest.raises(rest_ValidationError):
+            serializer.validate_departamento_superior(subordinado)
+
+    def test_to_representation_hierarquia(self, db, departamento, perfil, django_assert_num_queries):
+        superior = departamento
+        for nivel in range(8):
+            superior = baker.make('Departamento',
+                                  nome=f"Departamento nível {nivel}",
+                                  diretor=perfil,
+                                  departamento_superior=superior)
+        request = APIRequestFactory().get('/')
+
+        with django_assert_num_queries(1):
+            data = DepartamentoSerializer(superior, context={'request': request}).data
+
+        niveis = 0
+        while data['departamento_superior']:
+            data = data['departamento_superior']
+            niveis += 1
+        assert niveis == 8
+        assert data['nome'] == "Departamento Produtivo"
 
     def test_validate(self, serializer, perfil, outro_perfil):
         with pytest.raises(rest_ValidationError):
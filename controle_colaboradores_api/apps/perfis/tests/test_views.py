@@ -1,15 +1,24 @@
+import csv
+import io
 import json
+from datetime import timedelta
 
 import pytest
 from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from pycpfcnpj import gen
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
 from controle_colaboradores_api.apps.perfis.models import (
-    Perfil, Departamento, Cargo, OutroEmail, Telefone, Endereco
+    Perfil, Departamento, Cargo, OutroEmail, Telefone, Endereco, Exclusao, Historico
 )
+from controle_colaboradores_api.apps.perfis.serializers import PerfilSerializer
+from controle_colaboradores_api.throttling import ThrottleDeUsuarios
 
 
 @pytest.fixture
@@ -113,6 +122,12 @@ def outro_endereco(outro_perfil):
                       logradouro="Rua Dois")
 
 
+@pytest.fixture
+def sem_throttle(settings):
+    # Para os testes que fazem mais requisições a actions caras do que o limite por minuto
+    settings.REST_FRAMEWORK = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+
+
 class TestPerfilViewSet:
 
     def test_list(self,
@@ -144,6 +159,432 @@ class TestPerfilViewSet:
         assert len(results) == 1
         assert results[0]['nome'] == "Fulano"
 
+    def test_list_modificado_desde(self,
+                                   db,
+                                   api_client,
+                                   usuario,
+                                   perfil,
+                                   outro_perfil,
+                                   grupo_administradores):
+        endpoint_url = reverse('perfil-list')
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=usuario)
+        agora = timezone.now()
+        Perfil.objects.filter(id=perfil.id).update(modificacao=agora - timedelta(days=2))
+        modificado_desde = (agora - timedelta(days=1)).isoformat()
+
+        # Somente os perfis modificados a partir do momento informado
+        response = api_client.get(endpoint_url, {'modificado_desde': modificado_desde})
+        assert response.status_code == 200
+        assert [r['id'] for r in json.loads(response.content)['results']] == [outro_perfil.id]
+
+        # A alteração de um dado para contato também modifica o perfil
+        baker.make('Telefone', perfil=perfil)
+        response = api_client.get(endpoint_url, {'modificado_desde': modificado_desde})
+        assert [r['id'] for r in json.loads(response.content)['results']] == [perfil.id, outro_perfil.id]
+
+        # Com data e hora inválidas
+        response = api_client.get(endpoint_url, {'modificado_desde': 'ontem'})
+        assert response.status_code == 400
+        assert 'modificado_desde' in json.loads(response.content)
+
+    def test_list_filtros(self,
+                          db,
+                          api_client,
+                          usuario,
+                          perfil,
+                          outro_perfil,
+                          grupo_administradores,
+                          sem_throttle):
+        endpoint_url = reverse('perfil-list')
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=usuario)
+        cargo, departamento = baker.make('Cargo'), baker.make('Departamento', diretor=perfil)
+        municipio = baker.make('Municipio', uf__sigla='PE')
+        Perfil.objects.filter(id=perfil.id).update(nome='Zuleica', data_admissao='2020-01-10')
+        Perfil.objects.filter(id=outro_perfil.id).update(nome='Ana', data_admissao='2021-06-01',
+                                                         data_demissao='2022-03-01', ativo=False)
+        perfil.cargos.add(cargo)
+        perfil.departamentos.add(departamento)
+        perfil.municipios_onde_trabalha.add(municipio)
+        outro_perfil.cargos.add(cargo)
+        inativo = baker.make('Perfil', cpf=gen.cpf_with_punctuation(), ativo=False,
+                             data_admissao='2019-01-01', data_demissao='2019-12-31')
+        inativo.departamentos.add(departamento)
+
+        def ids(parametros):
+            response = api_client.get(endpoint_url, parametros)
+            assert response.status_code == 200
+            return [p['id'] for p in json.loads(response.content)['results']]
+
+        assert ids({'ativo': 'true'}) == [perfil.id]
+        assert ids({'ativo': 'false'}) == [outro_perfil.id, inativo.id]
+        assert ids({'cargo': cargo.id}) == [perfil.id, outro_perfil.id]
+        assert ids({'departamento': departamento.id}) == [perfil.id, inativo.id]
+        # Ativos de um departamento
+        assert ids({'departamento': departamento.id, 'ativo': 'true'}) == [perfil.id]
+        assert ids({'municipio_onde_trabalha': municipio.id}) == [perfil.id]
+        with CaptureQueriesContext(connection) as queries:
+            assert ids({'uf': 'pe'}) == [perfil.id]
+        # Pela sigla em maiúsculas, sem UPPER(), que impediria o uso do índice
+        assert not any('UPPER(' in query['sql'] for query in queries)
+        assert ids({'data_admissao_desde': '2021-01-01'}) == [outro_perfil.id]
+        assert ids({'data_admissao_ate': '2021-01-01'}) == [perfil.id, inativo.id]
+        assert ids({'data_demissao_desde': '2022-01-01', 'data_demissao_ate': '2022-12-31'}) == [outro_perfil.id]
+        assert ids({'cargo': cargo.id, 'ordenacao': 'nome'}) == [outro_perfil.id, perfil.id]
+
+        # Na exportação
+        response = api_client.get(reverse('perfil-exportar'), {'cargo': cargo.id, 'ordenacao': 'nome',
+                                                               'fields': 'id'})
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content).decode().split() == ['id', str(outro_perfil.id), str(perfil.id)]
+
+        # Com filtros inválidos
+        response = api_client.get(endpoint_url, {'cargo': 'x', 'data_admissao_desde': 'ontem', 'ordenacao': 'cpf'})
+        assert response.status_code == 400
+        assert set(json.loads(response.content)) == {'cargo', 'data_admissao_desde', 'ordenacao'}
+
+        # Uma única consulta dos perfis, com os filtros das relações em subconsultas
+        with CaptureQueriesContext(connection) as queries:
+            ids({'departamento': departamento.id, 'ativo': 'true'})
+        consultas_filtradas = [query['sql'] for query in queries
+                               if 'IN (SELECT U0."perfil_id" FROM "perfis_perfil_departamentos"' in query['sql']]
+        assert len(consultas_filtradas) == 2  # COUNT(*) da paginação e a página
+        assert all('"perfis_perfil"."ativo"' in sql for sql in consultas_filtradas)
+
+    def test_historico(self,
+                       db,
+                       api_client,
+                       usuario,
+                       perfil,
+                       grupo_administradores,
+                       grupo_colaboradores,
+                       departamento):
+        endpoint_url = reverse('perfil-historico', args=[perfil.id])
+        endpoint_url_perfil = reverse('perfil-detail', args=[perfil.id])
+        outro_departamento = baker.make('Departamento', diretor=perfil)
+
+        # Por Usuário autenticado do grupo Colaboradores, mesmo do próprio perfil
+        api_client.force_authenticate(user=usuario)
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 403
+
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        # - cada atualização gera um único registro, com os campos e as relações alterados
+        for departamento_atual, sobrenome in ((departamento, 'dos Santos'), (outro_departamento, 'dos Santos')):
+            response = api_client.patch(endpoint_url_perfil, data={
+                'sobrenome': sobrenome,
+                'departamentos': [reverse('departamento-detail', args=[departamento_atual.id])]
+            }, format='json')
+            assert response.status_code == 200
+        registros = Historico.objects.filter(tipo='perfil', objeto_id=perfil.id).order_by('id')
+        assert [(r.operacao, r.alteracoes) for r in registros][1:] == [
+            ('alteracao', {'sobrenome': 'dos Santos', 'departamentos': {'adicionados': [departamento.id],
+                                                                        'removidos': []}}),
+            ('alteracao', {'departamentos': {'adicionados': [outro_departamento.id],
+                                             'removidos': [departamento.id]}})
+        ]
+        assert registros[1].usuario_id == usuario.id
+
+        for mes, registro in enumerate(registros, start=1):
+            registro.data = timezone.make_aware(timezone.datetime(2021, mes, 1, 12))
+            registro.save()
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert [r['operacao'] for r in json.loads(response.content)['results']] == ['criacao', 'alteracao', 'alteracao']
+
+        # - o perfil em cada momento
+        def estado_em(em):
+            return json.loads(api_client.get(endpoint_url, {'em': em}).content)['estado']
+
+        assert estado_em('2021-01-15')['sobrenome'] == 'de Tal'
+        assert estado_em('2021-01-15')['departamentos'] == []
+        assert estado_em('2021-02-01')['sobrenome'] == 'dos Santos'  # até o fim do dia
+        assert estado_em('2021-02-01')['departamentos'] == [departamento.id]
+        assert estado_em('2021-03-01T11:00:00')['departamentos'] == [departamento.id]
+        assert estado_em('2021-03-01T13:00:00')['departamentos'] == [outro_departamento.id]
+        assert api_client.get(endpoint_url, {'em': '2020-12-31'}).status_code == 404
+        assert api_client.get(endpoint_url, {'em': 'ontem'}).status_code == 400
+
+    def test_exportar(self,
+                      db,
+                      api_client,
+                      usuario,
+                      perfil,
+                      outro_perfil,
+                      grupo_administradores,
+                      grupo_colaboradores,
+                      cargo,
+                      departamento,
+                      endereco,
+                      sem_throttle):
+        endpoint_url = reverse('perfil-exportar')
+        perfil.cargos.add(cargo)
+        perfil.departamentos.add(departamento)
+        baker.make('Endereco', perfil=perfil, is_principal=False)
+
+        def exportar(parametros):
+            response = api_client.get(endpoint_url, parametros)
+            assert response.status_code == 200
+            return response, b''.join(response.streaming_content).decode()
+
+        # Por Anônimo
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 401
+
+        # Por Usuário autenticado
+        api_client.force_authenticate(user=usuario)
+        # do grupo Colaboradores
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 403
+
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        # - em CSV, com as relações achatadas
+        response, conteudo = exportar({})
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        linhas = list(csv.DictReader(io.StringIO(conteudo)))
+        assert [(linha['id'], linha['email']) for linha in linhas] == [
+            (str(perfil.id), "usuario@email.com"), (str(outro_perfil.id), "outrousuario@email.com")
+        ]
+        assert linhas[0]['cargos'] == "Desenvolvedor Python - Classe A"
+        assert linhas[0]['departamentos'] == "Departamento Produtivo"
+        assert linhas[0]['endereco_logradouro'] == "Rua Um"
+        assert linhas[0]['endereco_uf'] == endereco.municipio.uf.sigla
+        assert (linhas[1]['cargos'], linhas[1]['endereco_logradouro']) == ('', '')
+        # - em NDJSON, somente com as colunas selecionadas
+        response, conteudo = exportar({'formato': 'ndjson', 'fields': 'id,cargos,endereco_cep,inexistente'})
+        assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+        assert [json.loads(linha) for linha in conteudo.splitlines()] == [
+            {'id': perfil.id, 'cargos': ["Desenvolvedor Python - Classe A"], 'endereco_cep': endereco.cep},
+            {'id': outro_perfil.id, 'cargos': [], 'endereco_cep': None}
+        ]
+        # - com formato ou colunas inválidos
+        assert api_client.get(endpoint_url, {'formato': 'xml'}).status_code == 400
+        assert api_client.get(endpoint_url, {'fields': 'inexistente'}).status_code == 400
+
+    def test_exportar_em_lotes(self,
+                               db,
+                               api_client,
+                               usuario,
+                               perfil,
+                               grupo_administradores,
+                               monkeypatch,
+                               django_assert_num_queries):
+        monkeypatch.setattr('controle_colaboradores_api.apps.perfis.exportacao.TAMANHO_DO_LOTE', 2)
+        for _ in range(4):
+            baker.make('Perfil', cpf=gen.cpf_with_punctuation(), cargos=[baker.make('Cargo')])
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+
+        # Grupos do usuário e ids dos perfis, e, para cada lote de 2 perfis, os perfis com os
+        # usuários e os seus cargos, departamentos e endereços principais
+        with django_assert_num_queries(2 + 3 * 4):
+            response = api_client.get(reverse('perfil-exportar'), {'formato': 'ndjson'})
+            linhas = b''.join(response.streaming_content).decode().splitlines()
+        assert len(linhas) == 5
+        assert all(len(json.loads(linha)['cargos']) == 1 for linha in linhas[1:])
+
+    def test_list_quantidade_de_queries_constante(self,
+                                                 db,
+                                                 api_client,
+                                                 usuario,
+                                                 perfil,
+                                                 grupo_administradores):
+        endpoint_url = reverse('perfil-list')
+        usuario.groups.set([grupo_administradores.id])
+
+        def autenticar():
+            # Nova instância do usuário a cada requisição, para que grupos
+            # carregados em requisições anteriores não distorçam a contagem
+            api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+
+        def criar_perfil_completo():
+            novo_perfil = baker.make('Perfil',
+                                     cpf=gen.cpf_with_punctuation(),
+                                     usuario__groups=[grupo_administradores],
+                                     cargos=baker.make('Cargo', _quantity=2),
+                                     municipios_onde_trabalha=baker.make('Municipio', _quantity=2))
+            superior = baker.make('Departamento', diretor=novo_perfil)
+            novo_perfil.departamentos.add(baker.make('Departamento',
+                                                     diretor=novo_perfil,
+                                                     diretor_substituto=novo_perfil,
+                                                     departamento_superior=superior))
+            baker.make('Endereco', perfil=novo_perfil, _quantity=2)
+            baker.make('Telefone', perfil=novo_perfil, _quantity=2)
+            baker.make('OutroEmail', perfil=novo_perfil, _quantity=2)
+
+        criar_perfil_completo()
+        autenticar()
+        with CaptureQueriesContext(connection) as queries_com_poucos_perfis:
+            response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert len(json.loads(response.content)['results']) == 2
+
+        for _ in range(7):
+            criar_perfil_completo()
+        autenticar()
+        with CaptureQueriesContext(connection) as queries_com_pagina_cheia:
+            response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert len(json.loads(response.content)['results']) == 9
+
+        assert len(queries_com_pagina_cheia) == len(queries_com_poucos_perfis)
+
+    def test_list_paginacao_por_cursor(self,
+                                       db,
+                                       api_client,
+                                       usuario,
+                                       perfil,
+                                       grupo_administradores):
+        endpoint_url = reverse('perfil-list')
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=usuario)
+        perfis = [perfil] + [baker.make('Perfil', cpf=gen.cpf_with_punctuation()) for _ in range(6)]
+
+        # Percorre todos os perfis, página a página, sem OFFSET e sem COUNT(*)
+        ids, url, parametros = [], endpoint_url, {'cursor': '', 'page_size': 3}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.get(url, parametros)
+            assert response.status_code == 200
+            assert not any('COUNT(' in query['sql'].upper() or 'OFFSET' in query['sql'].upper()
+                           for query in queries)
+            conteudo = json.loads(response.content)
+            assert 'count' not in conteudo
+            assert len(conteudo['results']) <= 3
+            ids += [p['id'] for p in conteudo['results']]
+            url, parametros = conteudo['next'], None
+        assert ids == sorted(p.id for p in perfis)
+
+        # Ordenação por (modificacao, id)
+        perfil.save()
+        response = api_client.get(endpoint_url, {'cursor': '', 'ordenacao': 'modificacao', 'page_size': 100})
+        assert response.status_code == 200
+        assert json.loads(response.content)['results'][-1]['id'] == perfil.id
+
+        # Ordenação por (nome, id)
+        Perfil.objects.exclude(id=perfil.id).update(nome='Ana')
+        Perfil.objects.filter(id=perfil.id).update(nome='Zuleica')
+        response = api_client.get(endpoint_url, {'cursor': '', 'ordenacao': 'nome', 'page_size': 100})
+        assert response.status_code == 200
+        assert json.loads(response.content)['results'][-1]['id'] == perfil.id
+
+        response = api_client.get(endpoint_url, {'cursor': '', 'ordenacao': 'cpf'})
+        assert response.status_code == 400
+
+        # Ordenações declaradas somente na view de perfis
+        response = api_client.get(reverse('cargo-list'), {'cursor': '', 'ordenacao': 'nome'})
+        assert response.status_code == 400
+
+        # Tamanho da página ajustável também na paginação por número de página
+        response = api_client.get(endpoint_url, {'page': 2, 'page_size': 2})
+        assert response.status_code == 200
+        assert json.loads(response.content)['count'] == 7
+        assert [p['id'] for p in json.loads(response.content)['results']] == [perfis[2].id, perfis[3].id]
+
+    def test_throttle_ponderado(self,
+                                db,
+                                api_client,
+                                usuario,
+                                outro_usuario,
+                                perfil,
+                                grupo_administradores,
+                                settings,
+                                monkeypatch):
+        settings.REST_FRAMEWORK = dict(settings.REST_FRAMEWORK,
+                                       DEFAULT_THROTTLE_RATES={'anon': '10/minute', 'user': '10/minute'})
+        # No meio de uma janela fixa de tempo, para que o teste não passe de uma janela para a seguinte
+        monkeypatch.setattr(ThrottleDeUsuarios, 'timer', lambda self: 1000 * 60 + 30)
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=usuario)
+
+        # A listagem de perfis custa 5 requisições e a consulta de um perfil, 1
+        assert api_client.get(reverse('perfil-list')).status_code == 200
+        for _ in range(5):
+            assert api_client.get(reverse('perfil-detail', args=[perfil.id])).status_code == 200
+        response = api_client.get(reverse('perfil-list'))
+        assert response.status_code == 429
+        assert 0 < int(response['Retry-After']) <= 60
+        assert api_client.get(reverse('perfil-detail', args=[perfil.id])).status_code == 429
+
+        # O limite é de cada usuário
+        outro_usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=outro_usuario)
+        assert api_client.get(reverse('perfil-list')).status_code == 200
+
+    def test_list_campos_selecionados(self,
+                                      db,
+                                      api_client,
+                                      usuario,
+                                      perfil,
+                                      grupo_administradores):
+        endpoint_url = reverse('perfil-list')
+        usuario.groups.set([grupo_administradores.id])
+        perfil.cargos.set(baker.make('Cargo', _quantity=2))
+        baker.make('Endereco', perfil=perfil)
+        baker.make('Telefone', perfil=perfil)
+
+        def listar(parametros):
+            # Nova instância do usuário a cada requisição, para que grupos
+            # carregados em requisições anteriores não distorçam a contagem
+            api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.get(endpoint_url, parametros)
+            assert response.status_code == 200
+            return json.loads(response.content)['results'][0], len(queries)
+
+        completo, queries_completo = listar({})
+        assert len(completo['cargos']) == 2
+        assert completo['telefones'][0]['numero']
+
+        # Somente os campos solicitados, sem consultar as relações
+        resultado, queries_campos = listar({'fields': 'id,nome,cpf'})
+        assert resultado == {'id': perfil.id, 'nome': perfil.nome, 'cpf': perfil.cpf}
+        assert queries_campos == queries_completo - len(PerfilSerializer.campos_expansiveis)
+
+        # Somente as relações expandidas
+        resultado, queries_expand = listar({'expand': 'cargos,enderecos'})
+        assert resultado['cargos'] == completo['cargos']
+        assert resultado['enderecos'] == completo['enderecos']
+        assert resultado['nome'] == perfil.nome
+        assert not {'usuario', 'departamentos', 'telefones', 'outros_emails'} & resultado.keys()
+        assert queries_expand == queries_campos + 2
+
+        resultado, _ = listar({'fields': 'id,cargos,telefones', 'expand': 'cargos'})
+        assert resultado == {'id': perfil.id, 'cargos': completo['cargos']}
+
+    def test_quantidade_de_queries_do_objeto_consultado_pelo_is_owner(self,
+                                                                       db,
+                                                                       api_client,
+                                                                       usuario,
+                                                                       perfil,
+                                                                       grupo_colaboradores,
+                                                                       django_assert_num_queries,
+                                                                       django_capture_on_commit_callbacks):
+        # O perfil obtido pela condition is_owner é reaproveitado pela action
+        endpoint_url = reverse('perfil-detail', args=[perfil.id])
+        # Cada alteração em sua própria transação, executando os callbacks de commit
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            usuario.groups.set([grupo_colaboradores.id])
+
+        # Servido a partir do documento pré-calculado
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        with django_assert_num_queries(3):
+            response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            # Inclui a consulta dos valores anteriores e o registro no histórico
+            with django_assert_num_queries(35):
+                response = api_client.patch(endpoint_url, data={'sobrenome': 'dos Santos'}, format='json')
+        assert response.status_code == 200
+
     def test_retrieve(self,
                       db,
                       api_client,
@@ -398,6 +839,94 @@ class TestPerfilViewSet:
         assert json.loads(response.content)['sobrenome'] == 'Oliveira'
 
 
+    def test_importar(self,
+                      db,
+                      api_client,
+                      usuario,
+                      grupo_administradores,
+                      grupo_colaboradores,
+                      django_assert_max_num_queries):
+        endpoint_url = reverse('perfil-importar')
+        cargo = baker.make('Cargo')
+        departamento = baker.make('Departamento', diretor=baker.make('Perfil', cpf=gen.cpf_with_punctuation()))
+        municipio = baker.make('Municipio')
+
+        def registro(numero):
+            return {
+                'email': f'colaborador{numero}@email.com',
+                'password': 'SenhaSegura123' if numero % 2 else '',
+                'groups': ['Colaboradores'],
+                'nome': f'Colaborador {numero}',
+                'sobrenome': 'Importado',
+                'cpf': gen.cpf_with_punctuation(),
+                'contrato_identificador': f'C-{numero}',
+                'data_admissao': '2021-10-01',
+                'cargos': [cargo.id],
+                'departamentos': [departamento.id],
+                'municipios_onde_trabalha': [municipio.id]
+            }
+
+        # Por Anônimo
+        response = api_client.post(endpoint_url, data=[registro(0)], format='json')
+        assert response.status_code == 401
+
+        # Por Usuário autenticado do grupo Colaboradores
+        api_client.force_authenticate(user=usuario)
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.post(endpoint_url, data=[registro(0)], format='json')
+        assert response.status_code == 403
+
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        # - com registros inválidos, nada é importado
+        invalidos = [registro(1), registro(2), registro(3)]
+        invalidos[0]['cpf'] = '123.456.789-00'
+        invalidos[1]['email'] = invalidos[2]['email']
+        invalidos[2]['cargos'] = [cargo.id, 0]
+        invalidos[2]['data_admissao'] = '01/10/2021'
+        response = api_client.post(endpoint_url, data=invalidos, format='json')
+        assert response.status_code == 400
+        erros = {erro['linha']: erro['erros'] for erro in json.loads(response.content)['erros']}
+        assert set(erros) == {1, 3}
+        assert set(erros[1]) == {'cpf'}
+        assert set(erros[3]) == {'email', 'cargos', 'data_admissao'}
+        assert not Perfil.objects.filter(sobrenome='Importado').exists()
+
+        # - em JSON, com quantidade de queries independente da quantidade de registros
+        registros = [registro(numero) for numero in range(1, 31)]
+        with django_assert_max_num_queries(25):
+            response = api_client.post(endpoint_url, data=registros, format='json')
+        assert response.status_code == 201
+        perfil_ids = json.loads(response.content)['perfis']
+        assert len(perfil_ids) == 30
+        importado = Perfil.objects.get(id=perfil_ids[0])
+        assert importado.cpf == registros[0]['cpf']
+        assert importado.usuario.email == 'colaborador1@email.com'
+        assert importado.usuario.first_name == 'Colaborador 1'
+        assert importado.usuario.check_password('SenhaSegura123')
+        assert not Perfil.objects.get(id=perfil_ids[1]).usuario.has_usable_password()
+        assert list(importado.usuario.groups.all()) == [grupo_colaboradores]
+        assert list(importado.cargos.all()) == [cargo]
+        assert list(importado.departamentos.all()) == [departamento]
+        assert list(importado.municipios_onde_trabalha.all()) == [municipio]
+        assert importado.usuario_modificacao == usuario
+
+        # - em CSV
+        csv = ("email,password,groups,nome,sobrenome,cpf,contrato_identificador,data_admissao,cargos\n"
+               f"csv@email.com,,Colaboradores;Administradores,Fulano,Csv,{gen.cpf_with_punctuation()},"
+               f"C-99,2021-10-01,{cargo.id}\n")
+        response = api_client.post(endpoint_url, data=csv, content_type='text/csv')
+        assert response.status_code == 201
+        importado = Perfil.objects.get(id=json.loads(response.content)['perfis'][0])
+        assert importado.usuario.groups.count() == 2
+        assert list(importado.cargos.all()) == [cargo]
+
+        # - registros repetidos
+        response = api_client.post(endpoint_url, data=csv, content_type='text/csv')
+        assert response.status_code == 400
+        assert set(json.loads(response.content)['erros'][0]['erros']) == {'email', 'cpf'}
+
+
 class TestEnderecoViewSet:
 
     def test_list(self,
@@ -603,6 +1132,28 @@ class TestEnderecoViewSet:
         assert response.status_code == 204
 
 
+    def test_quantidade_de_queries_do_objeto_consultado_pelo_is_owner(self,
+                                                                       db,
+                                                                       api_client,
+                                                                       usuario,
+                                                                       endereco,
+                                                                       grupo_colaboradores,
+                                                                       django_assert_num_queries):
+        endpoint_url = reverse('endereco-detail', args=[endereco.id])
+        usuario.groups.set([grupo_colaboradores.id])
+
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        with django_assert_num_queries(2):
+            response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        # Inclui a modificação do perfil e o registro da exclusão
+        with django_assert_num_queries(5):
+            response = api_client.delete(endpoint_url)
+        assert response.status_code == 204
+
+
 class TestTelefoneViewSet:
 
     def test_list(self,
@@ -1229,6 +1780,174 @@ class TestCargoViewSet:
         cargo.refresh_from_db()
         assert cargo.ativo is False
 
+    def test_reajustar(self,
+                       db,
+                       api_client,
+                       usuario,
+                       perfil,
+                       outro_perfil,
+                       grupo_administradores,
+                       grupo_colaboradores,
+                       cargo,
+                       django_assert_num_queries):
+        endpoint_url = reverse('cargo-reajustar')
+        outro_cargo = baker.make('Cargo', nome='Desenvolvedor Go', classe='Classe A', salario='10000.00')
+        cargo_de_outra_classe = baker.make('Cargo', classe='Classe B', salario='5000.00')
+        perfil.cargos.add(cargo, outro_cargo)
+        outro_perfil.cargos.add(cargo)
+        baker.make('Perfil', cpf='222', ativo=False, cargos=[outro_cargo])
+
+        # Por Anônimo
+        response = api_client.post(endpoint_url, {'percentual': '10', 'classe': 'Classe A'}, format='json')
+        assert response.status_code == 401
+
+        # Por Usuário autenticado
+        api_client.force_authenticate(user=usuario)
+        # do grupo Colaboradores
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.post(endpoint_url, {'percentual': '10', 'classe': 'Classe A'}, format='json')
+        assert response.status_code == 403
+
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        # - sem percentual nem valor, ou com ambos
+        response = api_client.post(endpoint_url, {'classe': 'Classe A'}, format='json')
+        assert response.status_code == 400
+        response = api_client.post(endpoint_url, {'percentual': '10', 'valor': '100'}, format='json')
+        assert response.status_code == 400
+        # - sem filtros nem todos: não reajusta todos os cargos por omissão
+        response = api_client.post(endpoint_url, {'percentual': '10'}, format='json')
+        assert response.status_code == 400
+        response = api_client.post(endpoint_url, {'percentual': '10', 'todos': False}, format='json')
+        assert response.status_code == 400
+        # - com todos: simula o reajuste de todos os cargos
+        response = api_client.post(endpoint_url, {'percentual': '10', 'todos': True, 'simular': True},
+                                   format='json')
+        assert response.status_code == 200
+        assert len(json.loads(response.content)['cargos']) == 3
+        # - deixando salários menores ou iguais a zero
+        response = api_client.post(endpoint_url, {'valor': '-5000', 'ids': [cargo_de_outra_classe.id]},
+                                   format='json')
+        assert response.status_code == 400
+        assert json.loads(response.content)['cargos'] == [cargo_de_outra_classe.id]
+        # - simulando: a folha considera os perfis ativos de cada cargo
+        response = api_client.post(endpoint_url, {'percentual': '10', 'classe': 'classe a', 'simular': True},
+                                   format='json')
+        assert response.status_code == 200
+        simulacao = json.loads(response.content)
+        assert simulacao['variacao_da_folha'] == '3700.16'  # 2 x 1350.08 + 1000.00
+        assert [(c['id'], c['novo_salario']) for c in simulacao['cargos']] == [
+            (cargo.id, '14850.88'), (outro_cargo.id, '11000.00')
+        ]
+        cargo.refresh_from_db()
+        assert str(cargo.salario) == '13500.80'
+        # - reajustando
+        usuario = type(usuario).objects.get(id=usuario.id)
+        api_client.force_authenticate(user=usuario)
+        with django_assert_num_queries(9):
+            response = api_client.post(endpoint_url, {'valor': '-500.80', 'ids': [cargo.id]}, format='json')
+        assert response.status_code == 200
+        resultado = json.loads(response.content)
+        assert resultado['variacao_da_folha'] == '-1001.60'
+        assert [(c['id'], c['salario']) for c in resultado['cargos']] == [(cargo.id, '13000.00')]
+        cargo.refresh_from_db()
+        outro_cargo.refresh_from_db()
+        assert str(cargo.salario) == '13000.00'
+        assert cargo.usuario_modificacao == usuario
+        assert str(outro_cargo.salario) == '10000.00'
+
+    def test_historico(self,
+                       db,
+                       api_client,
+                       usuario,
+                       perfil,
+                       grupo_administradores,
+                       grupo_colaboradores,
+                       django_assert_num_queries):
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=usuario)
+        response = api_client.post(reverse('cargo-list'),
+                                   {'nome': 'Analista', 'classe': 'Classe C', 'salario': '1000.00'},
+                                   format='json')
+        cargo_id = json.loads(response.content)['id']
+        endpoint_url = reverse('cargo-historico', args=[cargo_id])
+        api_client.patch(reverse('cargo-detail', args=[cargo_id]), {'salario': '1100.00'}, format='json')
+        api_client.post(reverse('cargo-reajustar'), {'valor': '100', 'ids': [cargo_id]}, format='json')
+
+        registros = Historico.objects.filter(tipo='cargo', objeto_id=cargo_id).order_by('id')
+        for mes, registro in enumerate(registros, start=1):
+            registro.data = timezone.make_aware(timezone.datetime(2021, mes, 1, 12))
+            registro.save()
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert [(r['operacao'], r['alteracoes'].get('salario'), r['usuario'])
+                for r in json.loads(response.content)['results']] == [
+            ('criacao', '1000.00', usuario.id),
+            ('alteracao', '1100.00', usuario.id),
+            ('alteracao', '1200.00', usuario.id)
+        ]
+
+        # O estado em um momento é reconstruído com uma única consulta ao histórico
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        with django_assert_num_queries(3):
+            response = api_client.get(endpoint_url, {'em': '2021-02-15'})
+        estado = json.loads(response.content)['estado']
+        assert (estado['nome'], estado['salario'], estado['ativo']) == ('Analista', '1100.00', True)
+        assert json.loads(api_client.get(endpoint_url, {'em': '2021-03-02'}).content)['estado']['salario'] == '1200.00'
+
+        # Por Usuário autenticado do grupo Colaboradores
+        usuario.groups.set([grupo_colaboradores.id])
+        perfil.cargos.add(cargo_id)
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 403
+
+    def test_cache_de_respostas(self,
+                                db,
+                                settings,
+                                api_client,
+                                usuario,
+                                outro_usuario,
+                                perfil,
+                                outro_perfil,
+                                grupo_administradores,
+                                grupo_colaboradores,
+                                cargo,
+                                django_assert_num_queries,
+                                django_capture_on_commit_callbacks):
+        settings.CACHE_DE_RESPOSTAS_TIMEOUT = 60
+        caches['default'].clear()
+        endpoint_url = reverse('cargo-list')
+        usuario.groups.set([grupo_administradores.id])
+        outro_usuario.groups.set([grupo_colaboradores.id])
+
+        # A primeira resposta é gerada e guardada; a segunda vem do cache, sem consultar os cargos
+        usuario = type(usuario).objects.get(id=usuario.id)
+        api_client.force_authenticate(user=usuario)
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert response['X-Cache'] == "MISS"
+        with django_assert_num_queries(0):
+            response = api_client.get(endpoint_url)
+        assert response['X-Cache'] == "HIT"
+        assert json.loads(response.content)['results'][0]['nome'] == "Desenvolvedor Python"
+
+        # Colaboradores não recebem a resposta dos administradores
+        api_client.force_authenticate(user=outro_usuario)
+        response = api_client.get(endpoint_url)
+        assert response['X-Cache'] == "MISS"
+        assert json.loads(response.content)['results'] == []
+
+        # Alterar um cargo invalida as respostas após o commit
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                cargo.nome = "Desenvolvedor Django"
+                cargo.save()
+        api_client.force_authenticate(user=usuario)
+        response = api_client.get(endpoint_url)
+        assert response['X-Cache'] == "MISS"
+        assert json.loads(response.content)['results'][0]['nome'] == "Desenvolvedor Django"
+
 
 class TestDepartamentoViewSet:
 
@@ -1519,3 +2238,133 @@ class TestDepartamentoViewSet:
         assert response.status_code == 200
         departamento.refresh_from_db()
         assert departamento.ativo is False
+
+    def test_subordinados(self,
+                          db,
+                          api_client,
+                          usuario,
+                          perfil,
+                          grupo_administradores,
+                          grupo_colaboradores,
+                          departamento):
+        subordinado = baker.make('Departamento', nome='Subordinado', diretor=perfil,
+                                 departamento_superior=departamento)
+        baker.make('Departamento', nome='Neto', diretor=perfil, departamento_superior=subordinado)
+        baker.make('Departamento', nome='Sem Vínculo', diretor=perfil)
+        endpoint_url = reverse('departamento-subordinados', args=[departamento.id])
+
+        # Por Anônimo
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 401
+
+        # Por Usuário autenticado
+        api_client.force_authenticate(user=usuario)
+        # do grupo Colaboradores
+        usuario.groups.set([grupo_colaboradores.id])
+        usuario.perfil.departamentos.add(departamento)
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 403
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        response = api_client.get(endpoint_url)
+        results = json.loads(response.content)['results']
+        assert response.status_code == 200
+        assert [r['nome'] for r in results] == ['Subordinado', 'Neto']
+        # - limitado pela profundidade
+        response = api_client.get(endpoint_url, {'profundidade': 1})
+        results = json.loads(response.content)['results']
+        assert response.status_code == 200
+        assert [r['nome'] for r in results] == ['Subordinado']
+        response = api_client.get(endpoint_url, {'profundidade': 0})
+        assert response.status_code == 400
+
+    def test_perfis(self,
+                    db,
+                    api_client,
+                    usuario,
+                    perfil,
+                    outro_perfil,
+                    grupo_administradores,
+                    grupo_colaboradores,
+                    departamento):
+        subordinado = baker.make('Departamento', nome='Subordinado', diretor=perfil,
+                                 departamento_superior=departamento)
+        perfil.departamentos.add(departamento, subordinado)
+        outro_perfil.departamentos.add(subordinado)
+        baker.make('Perfil', cpf='222', departamentos=[baker.make('Departamento', diretor=perfil)])
+        endpoint_url = reverse('departamento-perfis', args=[departamento.id])
+
+        # Por Anônimo
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 401
+
+        # Por Usuário autenticado
+        api_client.force_authenticate(user=usuario)
+        # do grupo Colaboradores
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 403
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        response = api_client.get(endpoint_url)
+        content = json.loads(response.content)
+        assert response.status_code == 200
+        assert content['count'] == 2
+        assert [r['nome'] for r in content['results']] == ['Fulano', 'Beltrano']
+
+
+class TestExclusaoViewSet:
+
+    def test_list(self,
+                  db,
+                  api_client,
+                  usuario,
+                  perfil,
+                  grupo_administradores,
+                  grupo_colaboradores,
+                  telefone,
+                  outro_telefone,
+                  endereco):
+        endpoint_url = reverse('exclusao-list')
+        ids_excluidos = {'telefone': telefone.id, 'outro_telefone': outro_telefone.id, 'endereco': endereco.id}
+        telefone.delete()
+        outro_telefone.delete()
+        endereco.delete()
+        Exclusao.objects.filter(objeto_id=ids_excluidos['endereco'], tipo='endereco').update(
+            exclusao=timezone.now() - timedelta(days=2)
+        )
+
+        # Por Anônimo
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 401
+
+        # Por Usuário autenticado
+        api_client.force_authenticate(user=usuario)
+        # do grupo Colaboradores: somente as exclusões dos seus dados para contato
+        usuario.groups.set([grupo_colaboradores.id])
+        response = api_client.get(endpoint_url)
+        assert response.status_code == 200
+        assert [(r['tipo'], r['objeto_id'], r['perfil']) for r in json.loads(response.content)['results']] == [
+            ('telefone', ids_excluidos['telefone'], perfil.id),
+            ('endereco', ids_excluidos['endereco'], perfil.id)
+        ]
+
+        # do grupo Administradores
+        usuario.groups.set([grupo_administradores.id])
+        api_client.force_authenticate(user=type(usuario).objects.get(id=usuario.id))
+        response = api_client.get(endpoint_url)
+        assert len(json.loads(response.content)['results']) == 3
+        # - por tipo
+        response = api_client.get(endpoint_url, {'tipo': 'telefone'})
+        assert [r['objeto_id'] for r in json.loads(response.content)['results']] == [
+            ids_excluidos['telefone'], ids_excluidos['outro_telefone']
+        ]
+        # - a partir de um momento
+        response = api_client.get(endpoint_url, {'modificado_desde': (timezone.now() - timedelta(days=1)).isoformat()})
+        assert [r['tipo'] for r in json.loads(response.content)['results']] == ['telefone', 'telefone']
+        # - na ordem das exclusões, com a paginação por cursor
+        response = api_client.get(endpoint_url, {'cursor': '', 'ordenacao': 'exclusao'})
+        assert response.status_code == 200
+        assert [r['tipo'] for r in json.loads(response.content)['results']] == ['endereco', 'telefone', 'telefone']
+        response = api_client.get(endpoint_url, {'cursor': '', 'ordenacao': 'modificacao'})
+        assert response.status_code == 400
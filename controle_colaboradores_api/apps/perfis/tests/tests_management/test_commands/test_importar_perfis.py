@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from model_bakery import baker
+from pycpfcnpj import gen
+
+from controle_colaboradores_api.apps.perfis.models import Perfil
+
+
+@pytest.fixture
+def usuario_modificacao(db):
+    return baker.make('CustomUsuario', email="admin@email.com")
+
+
+@pytest.fixture
+def registro(db):
+    baker.make('auth.Group', name="Colaboradores")
+    return {
+        'email': 'colaborador@email.com',
+        'groups': ['Colaboradores'],
+        'nome': 'Colaborador',
+        'sobrenome': 'Importado',
+        'cpf': gen.cpf_with_punctuation(),
+        'contrato_identificador': 'C-1',
+        'data_admissao': '2021-10-01'
+    }
+
+
+class TestCommand:
+
+    def test_handle_json(self, tmp_path, usuario_modificacao, registro):
+        arquivo = tmp_path / 'perfis.json'
+        arquivo.write_text(json.dumps([registro]))
+        call_command('importar_perfis', str(arquivo), usuario_modificacao='admin@email.com')
+        perfil = Perfil.objects.get(cpf=registro['cpf'])
+        assert perfil.usuario.email == 'colaborador@email.com'
+        assert perfil.usuario.groups.get().name == 'Colaboradores'
+
+    def test_handle_csv(self, tmp_path, usuario_modificacao, registro):
+        arquivo = tmp_path / 'perfis.csv'
+        arquivo.write_text(','.join(registro) + '\n' +
+                           ','.join(';'.join(v) if isinstance(v, list) else v for v in registro.values()) + '\n')
+        call_command('importar_perfis', str(arquivo), usuario_modificacao='admin@email.com')
+        assert Perfil.objects.get(cpf=registro['cpf']).usuario_modificacao == usuario_modificacao
+
+    def test_handle_registros_invalidos(self, tmp_path, usuario_modificacao, registro):
+        arquivo = tmp_path / 'perfis.json'
+        arquivo.write_text(json.dumps([registro, dict(registro, cpf='000.000.000-00')]))
+        with pytest.raises(CommandError, match="1 registros inválidos"):
+            call_command('importar_perfis', str(arquivo), usuario_modificacao='admin@email.com')
+        assert not Perfil.objects.exists()
@@ -6,7 +6,8 @@ from .views import (
     TelefoneViewSet,
     OutroEmailViewSet,
     CargoViewSet,
-    DepartamentoViewSet
+    DepartamentoViewSet,
+    ExclusaoViewSet
 )
 
 router = DefaultRouter()
@@ -15,4 +16,5 @@ router.register(r'enderecos', EnderecoViewSet, basename='endereco')
 router.register(r'telefones', TelefoneViewSet, basename='telefone')
 router.register(r'outros-emails', OutroEmailViewSet, basename='outroemail')
 router.register(r'cargos', CargoViewSet, basename='cargo')
-router.register(r'departamentos', DepartamentoViewSet, basename='departamento')
\ No newline at end of file
+router.register(r'departamentos', DepartamentoViewSet, basename='departamento')
+router.register(r'exclusoes', ExclusaoViewSet, basename='exclusao')
\ No newline at end of file
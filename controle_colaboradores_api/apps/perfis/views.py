@@ -1,16 +1,34 @@
-from rest_framework import mixins, status
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import mixins, serializers, status
+from rest_framework.parsers import JSONParser
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_access_policy import AccessViewSetMixin
 
+from controle_colaboradores_api.cache_de_respostas import RespostaEmCacheMixin, invalidar_respostas
+from controle_colaboradores_api.pagination import PaginacaoPorCursor
+from controle_colaboradores_api.views_mixins import ObjetoEmCacheMixin, FiltroModificadoDesdeMixin
+from controle_colaboradores_api.apps.localidades_brasileiras.models import UnidadeFederativa, Municipio
+
+from . import historico
+from .documentos import marcar_desatualizados, representar_perfis
+from .exportacao import ExportacaoDePerfis
+from .importacao import CSVParser, ImportacaoDePerfis, ler_csv
 from .models import (
     Perfil,
     Endereco,
     Telefone,
     OutroEmail,
     Cargo,
-    Departamento
+    Departamento,
+    Exclusao,
+    Historico
 )
 from .serializers import (
     PerfilSerializer,
@@ -19,18 +37,26 @@ from .serializers import (
     OutroEmailSerializer,
     CargoSerializer,
     CargoMudarAtivacaoSerializer,
+    CargoReajusteSerializer,
     DepartamentoSerializer,
-    DepartamentoMudarAtivacaoSerializer
+    DepartamentoMudarAtivacaoSerializer,
+    ExclusaoSerializer,
+    PerfilFiltroSerializer
 )
 from .views_access_policies import (
     PerfilAccessPolicy,
     DadosParaContatoAccessPolicy,
     CargoAccessPolicy,
-    DepartamentoAccessPolicy
+    DepartamentoAccessPolicy,
+    ExclusaoAccessPolicy
 )
+from .views_mixins import HistoricoMixin
 
 
-class PerfilViewSet(AccessViewSetMixin,
+class PerfilViewSet(ObjetoEmCacheMixin,
+                    FiltroModificadoDesdeMixin,
+                    HistoricoMixin,
+                    AccessViewSetMixin,
                     mixins.CreateModelMixin,
                     mixins.RetrieveModelMixin,
                     mixins.UpdateModelMixin,
@@ -43,26 +69,114 @@ class PerfilViewSet(AccessViewSetMixin,
     retrieve: Consultar perfil.
     update: Atualizar perfil.
     partial_update: Atualizar parcialmente um perfil.
-    list: Listar perfis.
+    list: Listar perfis. Com modificado_desde, somente os modificados a partir da data e hora informada
+     (inclusive as alterações dos seus dados para contato). Filtros: ativo, cargo, departamento,
+     municipio_onde_trabalha e uf (ids ou sigla), data_admissao_desde, data_admissao_ate,
+     data_demissao_desde e data_demissao_ate. Com ordenacao, ordena por id, nome, sobrenome ou modificacao.
+    importar: Criar em lote usuários e seus perfis, a partir de uma lista de registros em JSON ou
+     de um CSV (Content-Type: text/csv, com os vários valores de um campo separados por ';').
+     Cada registro tem os campos do perfil, email, password (opcional), os nomes dos grupos (groups)
+     e os ids de cargos, departamentos e municipios_onde_trabalha. Se algum registro for inválido,
+     nenhum é importado e os erros são informados por linha.
+    historico: Listar o histórico de alterações do perfil ou, com em (data ou data e hora),
+     consultar o perfil como estava naquele momento.
+    exportar: Exportar todos os perfis, sem paginação, em CSV (padrão) ou NDJSON (formato=ndjson), com
+     os cargos, os departamentos e o endereço principal em colunas. Com fields, somente as colunas
+     informadas, separadas por vírgula. Aceita os mesmos filtros e ordenação da listagem. Os cargos
+     e departamentos são exportados pelos nomes, e não pelos ids que a importação espera.
     """
     access_policy = PerfilAccessPolicy
     serializer_class = PerfilSerializer
+    custos_de_throttle = {'list': 5, 'importar': 10, 'exportar': 20}
+    # Ordenações da listagem e da paginação por cursor, pelos índices de Perfil.Meta
+    ordenacoes = dict(PaginacaoPorCursor.ordenacoes, nome=('nome', 'id'), sobrenome=('sobrenome', 'id'))
     model = Perfil
 
     def get_queryset(self):
-        return self.model.objects.all().order_by('id')
+        queryset = self.model.objects.all().order_by('id')
+        if self.action in ('list', 'retrieve', 'historico', 'exportar'):
+            # Representados a partir dos documentos pré-calculados, do histórico ou da exportação
+            return queryset
+        return self.serializer_class.otimizar_queryset(
+            queryset,
+            self.serializer_class.campos_selecionados(self.request)
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'exportar'):
+            return queryset
+        # dict(): um BooleanField ausente de um QueryDict seria considerado False
+        filtro = PerfilFiltroSerializer(data=self.request.query_params.dict(), context={'view': self})
+        filtro.is_valid(raise_exception=True)
+        return filtro.filtrar(queryset)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(representar_perfis(page, self))
+        return Response(representar_perfis(list(queryset), self))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(representar_perfis([self.get_object()], self)[0])
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, CSVParser])
+    def importar(self, request):
+        registros = ler_csv(request.data) if isinstance(request.data, str) else request.data
+        importacao = ImportacaoDePerfis(registros, usuario_modificacao=request.user)
+        if not importacao.validar():
+            return Response({'erros': importacao.erros},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            perfil_ids = importacao.importar()
+        except IntegrityError:
+            # Usuário ou perfil cadastrado por outra requisição durante a importação
+            return Response({'status': 'Conflito com dados cadastrados durante a importação. '
+                                       'Tente novamente.'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'status': f'{len(perfil_ids)} perfis importados.', 'perfis': perfil_ids},
+                        status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(method='get', manual_parameters=[
+        openapi.Parameter('formato', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=[*ExportacaoDePerfis.formatos], required=False),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False)
+    ])
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in ExportacaoDePerfis.formatos:
+            return Response({'status': f"Formato inválido. Opções: {', '.join(ExportacaoDePerfis.formatos)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        colunas = None
+        if 'fields' in request.query_params:
+            colunas = {coluna.strip() for coluna in request.query_params['fields'].split(',')}
+        exportacao = ExportacaoDePerfis(self.filter_queryset(self.get_queryset()), formato, colunas)
+        if not exportacao.colunas:
+            return Response({'status': 'Nenhuma coluna válida informada em fields.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(exportacao.linhas(), content_type=exportacao.content_type)
+        response['Content-Disposition'] = f'attachment; filename="perfis.{formato}"'
+        return response
 
     def perform_create(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     def perform_update(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     # Não há actions para Ativar e Desativar porque a manipulação
     # da ativação do perfil é feita pelas Views do app 'usuarios'
 
 
-class EnderecoViewSet(AccessViewSetMixin,
+class EnderecoViewSet(RespostaEmCacheMixin,
+                      ObjetoEmCacheMixin,
+                      FiltroModificadoDesdeMixin,
+                      AccessViewSetMixin,
                       mixins.CreateModelMixin,
                       mixins.RetrieveModelMixin,
                       mixins.DestroyModelMixin,
@@ -74,19 +188,23 @@ class EnderecoViewSet(AccessViewSetMixin,
     create: Criar endereço.
     retrieve: Consultar endereço.
     destroy: Deletar endereço.
-    list: Listar endereços.
+    list: Listar endereços. Com modificado_desde, somente os modificados a partir da data e hora informada.
     """
     access_policy = DadosParaContatoAccessPolicy
     serializer_class = EnderecoSerializer
+    models_do_cache = (Endereco, Perfil, Municipio, UnidadeFederativa)
     model = Endereco
 
     def get_queryset(self):
         return self.access_policy.scope_queryset(
-            self.request, self.model.objects.all().order_by('id')
+            self.request, self.model.objects.select_related('perfil', 'municipio__uf').order_by('id')
         )
 
 
-class TelefoneViewSet(AccessViewSetMixin,
+class TelefoneViewSet(RespostaEmCacheMixin,
+                      ObjetoEmCacheMixin,
+                      FiltroModificadoDesdeMixin,
+                      AccessViewSetMixin,
                       mixins.CreateModelMixin,
                       mixins.RetrieveModelMixin,
                       mixins.DestroyModelMixin,
@@ -98,19 +216,23 @@ class TelefoneViewSet(AccessViewSetMixin,
     create: Criar telefone.
     retrieve: Consultar telefone.
     destroy: Deletar telefone.
-    list: Listar telefones.
+    list: Listar telefones. Com modificado_desde, somente os modificados a partir da data e hora informada.
     """
     access_policy = DadosParaContatoAccessPolicy
     serializer_class = TelefoneSerializer
+    models_do_cache = (Telefone, Perfil)
     model = Telefone
 
     def get_queryset(self):
         return self.access_policy.scope_queryset(
-            self.request, self.model.objects.all().order_by('id')
+            self.request, self.model.objects.select_related('perfil').order_by('id')
         )
 
 
-class OutroEmailViewSet(AccessViewSetMixin,
+class OutroEmailViewSet(RespostaEmCacheMixin,
+                        ObjetoEmCacheMixin,
+                        FiltroModificadoDesdeMixin,
+                        AccessViewSetMixin,
                         mixins.CreateModelMixin,
                         mixins.RetrieveModelMixin,
                         mixins.DestroyModelMixin,
@@ -122,19 +244,24 @@ class OutroEmailViewSet(AccessViewSetMixin,
     create: Criar outro e-mail.
     retrieve: Consultar outro e-mail.
     destroy: Deletar outro e-mail.
-    list: Listar outros e-mails.
+    list: Listar outros e-mails. Com modificado_desde, somente os modificados a partir da data e hora
+     informada.
     """
     access_policy = DadosParaContatoAccessPolicy
     serializer_class = OutroEmailSerializer
+    models_do_cache = (OutroEmail, Perfil)
     model = OutroEmail
 
     def get_queryset(self):
         return self.access_policy.scope_queryset(
-            self.request, self.model.objects.all().order_by('id')
+            self.request, self.model.objects.select_related('perfil').order_by('id')
         )
 
 
-class CargoViewSet(AccessViewSetMixin,
+class CargoViewSet(RespostaEmCacheMixin,
+                   FiltroModificadoDesdeMixin,
+                   HistoricoMixin,
+                   AccessViewSetMixin,
                    mixins.CreateModelMixin,
                    mixins.RetrieveModelMixin,
                    mixins.UpdateModelMixin,
@@ -147,12 +274,20 @@ class CargoViewSet(AccessViewSetMixin,
     retrieve: Consultar cargo.
     update: Atualizar cargo.
     partial_update: Atualizar parcialmente um cargo.
-    list: Listar cargos.
+    list: Listar cargos. Com modificado_desde, somente os modificados a partir da data e hora informada.
     ativar: Ativar cargo.
     desativar: Desativar cargo.
+    reajustar: Reajustar, em uma única operação no banco, os salários dos cargos filtrados
+     por ids, classe, nome e/ou ativo, ou todos eles com todos, por percentual ou por valor fixo.
+     Informa os cargos reajustados e a variação da folha de pagamento dos perfis ativos. Com
+     simular, somente projeta os novos salários e a variação da folha, sem alterá-los.
+    historico: Listar o histórico de alterações do cargo ou, com em (data ou data e hora),
+     consultar o cargo como estava naquele momento.
     """
     access_policy = CargoAccessPolicy
     serializer_class = CargoSerializer
+    custos_de_throttle = {'reajustar': 5}
+    models_do_cache = (Cargo, Perfil)
     model = Cargo
 
     def get_queryset(self):
@@ -161,10 +296,12 @@ class CargoViewSet(AccessViewSetMixin,
         )
 
     def perform_create(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     def perform_update(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     @action(detail=True, methods=['patch'], serializer_class=CargoMudarAtivacaoSerializer)
     def ativar(self, request, pk=None):
@@ -196,8 +333,70 @@ class CargoViewSet(AccessViewSetMixin,
         return Response(serializer.errors,
                         status=status.HTTP_400_BAD_REQUEST)
 
-
-class DepartamentoViewSet(AccessViewSetMixin,
+    @action(detail=False, methods=['post'], serializer_class=CargoReajusteSerializer)
+    def reajustar(self, request):
+        reajuste = self.get_serializer(data=request.data)
+        reajuste.is_valid(raise_exception=True)
+        novo_salario = reajuste.novo_salario()
+        valor_monetario = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+        with transaction.atomic():
+            # Cargos a reajustar, bloqueados até o fim da transação, com os salários projetados
+            projecao = list(reajuste.filtrar(self.get_queryset()).select_for_update().annotate(
+                novo_salario=novo_salario
+            ).values('id', 'nome', 'classe', 'salario', 'novo_salario'))
+            cargo_ids = [cargo['id'] for cargo in projecao]
+
+            # Verificado antes, para informar quais cargos violariam a constraint salario_gt_zero
+            invalidos = [cargo['id'] for cargo in projecao if cargo['novo_salario'] <= 0]
+            if invalidos:
+                return Response({'status': 'O reajuste deixaria salários menores ou iguais a zero.',
+                                 'cargos': invalidos},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            # Salário de cada vínculo de perfil ativo com os cargos, antes e depois do reajuste
+            variacao_da_folha = Perfil.cargos.through.objects.filter(
+                cargo_id__in=cargo_ids, perfil__ativo=True
+            ).aggregate(
+                variacao=Sum(reajuste.novo_salario('cargo__salario') - F('cargo__salario'))
+            )['variacao'] or 0
+
+            if reajuste.validated_data['simular']:
+                return Response({
+                    'status': f'Simulação: {len(cargo_ids)} cargos seriam reajustados.',
+                    'variacao_da_folha': valor_monetario.to_representation(variacao_da_folha),
+                    'cargos': [
+                        dict(cargo,
+                             salario=valor_monetario.to_representation(cargo['salario']),
+                             novo_salario=valor_monetario.to_representation(cargo['novo_salario']))
+                        for cargo in projecao
+                    ]
+                }, status=status.HTTP_200_OK)
+
+            cargos = self.model.objects.filter(id__in=cargo_ids).order_by('id')
+            cargos.update(salario=novo_salario,
+                          usuario_modificacao=request.user,
+                          modificacao=timezone.now())
+            # update() não dispara os signals que mantêm os documentos dos perfis, o cache das respostas
+            # e o histórico
+            marcar_desatualizados(Perfil.objects.filter(cargos__id__in=cargo_ids).distinct())
+            invalidar_respostas(Cargo)
+            historico.registrar_em_lote(Cargo, {
+                cargo['id']: {'salario': valor_monetario.to_representation(cargo['novo_salario'])}
+                for cargo in projecao
+            }, Historico.ALTERACAO, request.user.id)
+
+        return Response({
+            'status': f'{len(cargo_ids)} cargos reajustados.',
+            'variacao_da_folha': valor_monetario.to_representation(variacao_da_folha),
+            'cargos': CargoSerializer(cargos, many=True, context=self.get_serializer_context()).data
+        }, status=status.HTTP_200_OK)
+
+
+class DepartamentoViewSet(RespostaEmCacheMixin,
+                          FiltroModificadoDesdeMixin,
+                          HistoricoMixin,
+                          AccessViewSetMixin,
                           mixins.CreateModelMixin,
                           mixins.RetrieveModelMixin,
                           mixins.UpdateModelMixin,
@@ -210,12 +409,20 @@ class DepartamentoViewSet(AccessViewSetMixin,
     retrieve: Consultar departamento.
     update: Atualizar departamento.
     partial_update: Atualizar parcialmente um departamento.
-    list: Listar departamentos.
+    list: Listar departamentos. Com modificado_desde, somente os modificados a partir da data e hora
+     informada.
     ativar: Ativar departamento.
     desativar: Desativar departamento.
+    subordinados: Listar os departamentos subordinados, direta ou indiretamente, ao departamento.
+     Opcionalmente, limitados à profundidade informada.
+    perfis: Listar os perfis lotados no departamento ou em qualquer de seus subordinados.
+    historico: Listar o histórico de alterações do departamento ou, com em (data ou data e hora),
+     consultar o departamento como estava naquele momento.
     """
     access_policy = DepartamentoAccessPolicy
     serializer_class = DepartamentoSerializer
+    custos_de_throttle = {'perfis': 5}
+    models_do_cache = (Departamento, Perfil)
     model = Departamento
 
     def get_queryset(self):
@@ -224,10 +431,12 @@ class DepartamentoViewSet(AccessViewSetMixin,
         )
 
     def perform_create(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     def perform_update(self, serializer):
-        serializer.save(usuario_modificacao=self.request.user)
+        with historico.historico_em_lote():
+            serializer.save(usuario_modificacao=self.request.user)
 
     @action(detail=True, methods=['patch'], serializer_class=DepartamentoMudarAtivacaoSerializer)
     def ativar(self, request, pk=None):
@@ -258,3 +467,60 @@ class DepartamentoViewSet(AccessViewSetMixin,
                             status=status.HTTP_200_OK)
         return Response(serializer.errors,
                         status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(method='get', manual_parameters=[openapi.Parameter('profundidade',
+                                                            openapi.IN_QUERY,
+                                                            type=openapi.TYPE_INTEGER,
+                                                            required=False)])
+    @action(detail=True, methods=['get'])
+    def subordinados(self, request, pk=None):
+        departamento = self.get_object()
+        subordinados = self.model.objects.filter(caminho__startswith=departamento.caminho,
+                                                 nivel__gt=departamento.nivel)
+        if 'profundidade' in request.query_params:
+            try:
+                profundidade = int(request.query_params['profundidade'])
+                if profundidade < 1:
+                    raise ValueError
+            except ValueError:
+                return Response({'status': 'Profundidade inválida. Informe um número inteiro positivo.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            subordinados = subordinados.filter(nivel__lte=departamento.nivel + profundidade)
+
+        page = self.paginate_queryset(subordinados.order_by('id'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'], serializer_class=PerfilSerializer)
+    def perfis(self, request, pk=None):
+        departamento = self.get_object()
+        perfis = Perfil.objects.filter(
+            departamentos__caminho__startswith=departamento.caminho
+        ).distinct().order_by('id')
+
+        page = self.paginate_queryset(perfis)
+        return self.get_paginated_response(representar_perfis(page, self))
+
+
+class ExclusaoViewSet(FiltroModificadoDesdeMixin,
+                      AccessViewSetMixin,
+                      mixins.ListModelMixin,
+                      GenericViewSet):
+    """
+    Exclusão ViewSet description:
+
+    list: Listar as exclusões de endereços, telefones e outros e-mails, opcionalmente somente
+     as de um tipo (endereco, telefone ou outroemail) e as ocorridas a partir de modificado_desde.
+     Com cursor e ordenacao=exclusao, percorre as exclusões na ordem em que ocorreram.
+    """
+    access_policy = ExclusaoAccessPolicy
+    serializer_class = ExclusaoSerializer
+    campo_de_modificacao = 'exclusao'
+    ordenacoes = {'id': ('id',), 'exclusao': ('exclusao', 'id')}
+    model = Exclusao
+
+    def get_queryset(self):
+        queryset = self.model.objects.all().order_by('id')
+        if 'tipo' in self.request.query_params:
+            queryset = queryset.filter(tipo=self.request.query_params['tipo'])
+        return self.access_policy.scope_queryset(self.request, queryset)
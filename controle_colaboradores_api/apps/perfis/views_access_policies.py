@@ -1,10 +1,11 @@
-from rest_access_policy import AccessPolicy
+from controle_colaboradores_api.apps.usuarios.views_access_policies import BaseAccessPolicy
 
 
-class PerfilAccessPolicy(AccessPolicy):
+class PerfilAccessPolicy(BaseAccessPolicy):
     statements = [
         {
-            "action": ["create", "list", "retrieve", "update", "partial_update"],
+            "action": ["create", "list", "retrieve", "update", "partial_update", "importar", "historico",
+                       "exportar"],
             "principal": ["group:Administradores"],
             "effect": "allow"
         },
@@ -18,10 +19,10 @@ class PerfilAccessPolicy(AccessPolicy):
 
     def is_owner(self, request, view, action) -> bool:
         perfil = view.get_object()
-        return request.user == perfil.usuario
+        return request.user.id == perfil.usuario_id
 
 
-class DadosParaContatoAccessPolicy(AccessPolicy):
+class DadosParaContatoAccessPolicy(BaseAccessPolicy):
     statements = [
         {
             "action": ["create", "list", "retrieve", "update", "partial_update", "destroy"],
@@ -43,17 +44,31 @@ class DadosParaContatoAccessPolicy(AccessPolicy):
 
     def is_owner(self, request, view, action) -> bool:
         obj = view.get_object()
-        perfil = obj.perfil
-        return request.user == perfil.usuario
+        return request.user.id == obj.perfil.usuario_id
 
     @classmethod
     def scope_queryset(cls, request, queryset):
-        if request.user.groups.filter(name='Administradores').exists():
+        if cls.is_administrador(request):
             return queryset
-        return queryset.filter(perfil=request.user.perfil)
+        return queryset.filter(perfil__usuario=request.user)
 
 
-class CargoAccessPolicy(AccessPolicy):
+class ExclusaoAccessPolicy(BaseAccessPolicy):
+    statements = [
+        {
+            "action": ["list"],
+            "principal": ["group:Administradores", "group:Colaboradores"],
+            "effect": "allow"
+        }
+    ]
+
+    @classmethod
+    def scope_queryset(cls, request, queryset):
+        # Colaboradores consultam somente as exclusões dos seus próprios dados para contato
+        return DadosParaContatoAccessPolicy.scope_queryset(request, queryset)
+
+
+class CargoAccessPolicy(BaseAccessPolicy):
     statements = [
         {
             "action": ["*"],
@@ -69,13 +84,13 @@ class CargoAccessPolicy(AccessPolicy):
 
     @classmethod
     def scope_queryset(cls, request, queryset):
-        if request.user.groups.filter(name='Administradores').exists():
+        if cls.is_administrador(request):
             return queryset
         cargos_do_usuario = request.user.perfil.cargos.filter(ativo=True)
         return queryset.filter(id__in=cargos_do_usuario).prefetch_related('perfis')
 
 
-class DepartamentoAccessPolicy(AccessPolicy):
+class DepartamentoAccessPolicy(BaseAccessPolicy):
     statements = [
         {
             "action": ["*"],
@@ -91,7 +106,7 @@ class DepartamentoAccessPolicy(AccessPolicy):
 
     @classmethod
     def scope_queryset(cls, request, queryset):
-        if request.user.groups.filter(name='Administradores').exists():
+        if cls.is_administrador(request):
             return queryset
         departamentos_do_usuario = request.user.perfil.departamentos.filter(ativo=True)
         return queryset.filter(id__in=departamentos_do_usuario).prefetch_related('perfis')
@@ -0,0 +1,40 @@
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from controle_colaboradores_api.views_mixins import obter_data_e_hora
+
+from . import historico
+from .models import Historico
+from .serializers import HistoricoSerializer
+
+
+class HistoricoMixin:
+    """
+    Action historico: lista os registros de histórico do objeto (vide historico.py) ou, com
+    ?em=<data e hora ISO 8601>, o seu estado naquele momento. Requer o atributo model da view.
+    """
+
+    @swagger_auto_schema(method='get', manual_parameters=[openapi.Parameter('em',
+                                                            openapi.IN_QUERY,
+                                                            type=openapi.TYPE_STRING,
+                                                            required=False)])
+    @action(detail=True, methods=['get'], serializer_class=HistoricoSerializer)
+    def historico(self, request, pk=None):
+        objeto = self.get_object()
+        em = obter_data_e_hora(request, 'em', fim_do_dia=True)
+        if em is None:
+            registros = Historico.objects.filter(
+                tipo=self.model._meta.model_name, objeto_id=objeto.pk
+            ).order_by('data', 'id')
+            page = self.paginate_queryset(registros)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        estado = historico.estado_em(self.model, objeto.pk, em)
+        if estado is None:
+            return Response({'status': 'Não há registro do objeto nesta data.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response({'em': em, 'estado': estado}, status=status.HTTP_200_OK)
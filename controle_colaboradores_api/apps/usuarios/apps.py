@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UsuariosConfig(AppConfig):
     name = 'controle_colaboradores_api.apps.usuarios'
+
+    def ready(self):
+        from . import signals  # noqa: F401
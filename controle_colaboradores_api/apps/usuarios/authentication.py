@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import TokenDeAcesso
+
+
+class TokenDeAcessoAuthentication(BaseAuthentication):
+    """
+    Autenticação pelo cabeçalho 'Authorization: Token <token>', com os tokens obtidos em
+    tokens/. O token é procurado pelo seu digest em uma única consulta indexada (ou no cache,
+    vide TOKENS_DE_ACESSO_CACHE_TIMEOUT), sem o custo da verificação da senha a cada requisição.
+    Em request.auth fica o digest do token utilizado.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        cabecalho = get_authorization_header(request).split()
+        if not cabecalho or cabecalho[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(cabecalho) != 2:
+            raise AuthenticationFailed("Cabeçalho de token inválido.")
+        try:
+            token = cabecalho[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Cabeçalho de token inválido.")
+        return self.autenticar_token(token)
+
+    def autenticar_token(self, token):
+        digest = TokenDeAcesso.calcular_digest(token)
+        timeout = settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT
+        usuario_e_expiracao = cache.get(TokenDeAcesso.chave_cache(digest)) if timeout else None
+        if usuario_e_expiracao is None:
+            try:
+                token_de_acesso = TokenDeAcesso.objects.select_related('usuario').get(digest=digest, ativo=True)
+            except TokenDeAcesso.DoesNotExist:
+                raise AuthenticationFailed("Token inválido.")
+            usuario_e_expiracao = (token_de_acesso.usuario, token_de_acesso.expira_em)
+            if timeout:
+                cache.set(TokenDeAcesso.chave_cache(digest), usuario_e_expiracao, timeout)
+
+        usuario, expira_em = usuario_e_expiracao
+        if expira_em <= timezone.now():
+            raise AuthenticationFailed("Token expirado.")
+        if not usuario.is_active:
+            raise AuthenticationFailed("Usuário inativo.")
+        return usuario, digest
+
+    def authenticate_header(self, request):
+        return self.keyword
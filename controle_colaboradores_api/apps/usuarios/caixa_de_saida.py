@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailDeSaida
+
+
+def _reservar_lote(tamanho_do_lote):
+    # Em uma transação curta, reserva os e-mails adiando a próxima tentativa: outros workers
+    # não os pegam durante o envio, e, se este worker parar, voltam a ser enviados depois
+    agora = timezone.now()
+    with transaction.atomic():
+        emails = list(EmailDeSaida.objects.filter(
+            enviado_em__isnull=True,
+            proxima_tentativa__lte=agora,
+            tentativas__lt=settings.CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS
+        ).select_for_update(skip_locked=True).order_by('proxima_tentativa', 'id')[:tamanho_do_lote])
+        if emails:
+            EmailDeSaida.objects.filter(id__in=[email.id for email in emails]).update(
+                proxima_tentativa=agora + timedelta(seconds=settings.CAIXA_DE_SAIDA_PRAZO_DA_RESERVA)
+            )
+    return emails
+
+
+def _espera_ate_a_proxima_tentativa(tentativas):
+    """Espera exponencial: ESPERA, 2 x ESPERA, 4 x ESPERA..., limitada a um dia."""
+    segundos = settings.CAIXA_DE_SAIDA_ESPERA_ENTRE_TENTATIVAS * 2 ** (tentativas - 1)
+    return timedelta(seconds=min(segundos, 24 * 60 * 60))
+
+
+def enviar_emails_pendentes(tamanho_do_lote=None):
+    """
+    Envia um lote de e-mails da caixa de saída por uma única conexão com o servidor de e-mail.
+    Os que falham são reenviados nas próximas execuções, com espera exponencial, até
+    CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS. Retorna as quantidades de enviados e de falhas.
+    """
+    emails = _reservar_lote(tamanho_do_lote or settings.CAIXA_DE_SAIDA_TAMANHO_DO_LOTE)
+    if not emails:
+        return 0, 0
+
+    enviados, falhas = [], []
+    conexao = get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            try:
+                # Reabre a conexão caso a anterior tenha sido encerrada por uma falha
+                conexao.open()
+                EmailMessage(email.assunto, email.mensagem, None, [email.destinatario],
+                             connection=conexao).send()
+                enviados.append(email.id)
+            except Exception as e:
+                conexao.close()
+                email.tentativas += 1
+                email.proxima_tentativa = timezone.now() + _espera_ate_a_proxima_tentativa(email.tentativas)
+                email.ultimo_erro = f'{type(e).__name__}: {e}'
+                falhas.append(email)
+    finally:
+        conexao.close()
+
+    if enviados:
+        # A mensagem enviada não é mais mantida: pode conter links válidos, como o de criação de nova senha
+        EmailDeSaida.objects.filter(id__in=enviados).update(enviado_em=timezone.now(), mensagem='')
+    if falhas:
+        EmailDeSaida.objects.bulk_update(falhas, ['tentativas', 'proxima_tentativa', 'ultimo_erro'])
+    return len(enviados), len(falhas)
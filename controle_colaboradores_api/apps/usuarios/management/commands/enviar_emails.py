@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from controle_colaboradores_api.apps.usuarios.caixa_de_saida import enviar_emails_pendentes
+
+
+class Command(BaseCommand):
+    help = "Envia os e-mails da caixa de saída, em lotes. Com --continuo, permanece em execução " \
+           "como worker, verificando a caixa de saída a cada --intervalo segundos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote',
+                            type=int,
+                            help="Quantidade de e-mails por lote (padrão: CAIXA_DE_SAIDA_TAMANHO_DO_LOTE).")
+        parser.add_argument('--continuo',
+                            action='store_true',
+                            help="Não encerra quando a caixa de saída fica vazia.")
+        parser.add_argument('--intervalo',
+                            type=float,
+                            default=5,
+                            help="Segundos de espera, com a caixa de saída vazia, no modo contínuo.")
+
+    def handle(self, *args, **options):
+        total_de_enviados = total_de_falhas = 0
+        while True:
+            enviados, falhas = enviar_emails_pendentes(options.get('lote'))
+            total_de_enviados += enviados
+            total_de_falhas += falhas
+            if enviados or falhas:
+                self.stdout.write(f"-- Lote: {enviados} e-mails enviados, {falhas} falhas.")
+            elif options.get('continuo'):
+                time.sleep(options.get('intervalo', 5))
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS(f"-- {total_de_enviados} e-mails enviados, {total_de_falhas} falhas."))
+        return "Fim da execução bem sucedida."
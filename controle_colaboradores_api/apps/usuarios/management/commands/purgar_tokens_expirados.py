@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from controle_colaboradores_api.apps.usuarios.models import EmailDeSaida, PasswordResetToken, TokenDeAcesso
+
+
+class Command(BaseCommand):
+    help = "Exclui, em lotes, os tokens de reset de password expirados ou já utilizados, " \
+           "os tokens de acesso expirados ou revogados e, após CAIXA_DE_SAIDA_RETENCAO, " \
+           "os e-mails da caixa de saída enviados ou que esgotaram as tentativas de envio."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote',
+                            type=int,
+                            default=1000,
+                            help="Quantidade de registros excluídos por vez.")
+
+    def handle(self, *args, **options):
+        lote = options.get('lote', 1000)
+        agora = timezone.now()
+        limite_da_retencao = agora - timedelta(seconds=settings.CAIXA_DE_SAIDA_RETENCAO)
+        tokens = Q(expira_em__lte=agora) | Q(ativo=False)
+        emails = Q(enviado_em__lte=limite_da_retencao) | Q(
+            enviado_em__isnull=True,
+            tentativas__gte=settings.CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS,
+            criacao__lte=limite_da_retencao
+        )
+        for model, filtro, descricao in ((PasswordResetToken, tokens, "tokens de reset de password"),
+                                         (TokenDeAcesso, tokens, "tokens de acesso"),
+                                         (EmailDeSaida, emails, "e-mails da caixa de saída")):
+            total = self._purgar(model, filtro, lote)
+            self.stdout.write(self.style.SUCCESS(f"-- {total} {descricao} excluídos."))
+        return "Fim da execução bem sucedida."
+
+    @staticmethod
+    def _purgar(model, filtro, lote):
+        total = 0
+        while True:
+            # Lotes pequenos mantêm curtas as transações e os locks da exclusão
+            ids = list(model.objects.filter(filtro).values_list('id', flat=True)[:lote])
+            if not ids:
+                return total
+            total += model.objects.filter(id__in=ids).delete()[0]
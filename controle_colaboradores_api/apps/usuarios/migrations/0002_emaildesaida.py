@@ -0,0 +1,36 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDeSaida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assunto', models.CharField(max_length=255, verbose_name='Assunto')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('destinatario', models.EmailField(max_length=254, verbose_name='Destinatário')),
+                ('criacao', models.DateTimeField(auto_now_add=True, verbose_name='Criação')),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa de envio')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas de envio')),
+                ('ultimo_erro', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('enviado_em', models.DateTimeField(null=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'E-mail de saída',
+                'verbose_name_plural': 'E-mails de saída',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='emaildesaida',
+            index=models.Index(fields=['enviado_em', 'proxima_tentativa'], name='emaildesaida_pendentes_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:47
+
+from datetime import timedelta
+
+import controle_colaboradores_api.apps.usuarios.models
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_expiracoes(apps, schema_editor):
+    PasswordResetToken = apps.get_model('usuarios', 'PasswordResetToken')
+    PasswordResetToken.objects.update(expira_em=F('criacao') + timedelta(days=1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_emaildesaida'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordresettoken',
+            name='expira_em',
+            field=models.DateTimeField(db_index=True, default=controle_colaboradores_api.apps.usuarios.models.expiracao_do_password_reset_token, verbose_name='Expira em'),
+        ),
+        migrations.RunPython(preencher_expiracoes, migrations.RunPython.noop),
+    ]
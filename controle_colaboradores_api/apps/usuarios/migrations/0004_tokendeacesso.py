@@ -0,0 +1,31 @@
+# Generated by Django 3.2.7 on 2026-10-18 08:49
+
+import controle_colaboradores_api.apps.usuarios.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_passwordresettoken_expira_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenDeAcesso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='Digest')),
+                ('criacao', models.DateTimeField(auto_now_add=True, verbose_name='Criação')),
+                ('expira_em', models.DateTimeField(db_index=True, default=controle_colaboradores_api.apps.usuarios.models.expiracao_do_token_de_acesso, verbose_name='Expira em')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_de_acesso', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token de acesso',
+                'verbose_name_plural': 'Tokens de acesso',
+            },
+        ),
+    ]
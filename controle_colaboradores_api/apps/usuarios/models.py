@@ -1,11 +1,13 @@
 import os
 import binascii
+import hashlib
 import random
+import secrets
 from django.utils import timezone
 from datetime import timedelta
 
 from django.db import models, transaction
-from django.core.mail import send_mail
+from django.core.cache import cache
 from django.conf import settings
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
@@ -56,34 +58,63 @@ class CustomUsuario(AbstractUser):
 
     objects = CustomUsuarioManager()
 
+    @staticmethod
+    def chave_cache_de_grupos(usuario_id):
+        return f'usuarios:grupos:{usuario_id}'
+
+    def obter_nomes_dos_grupos(self):
+        """
+        Nomes dos grupos do usuário, consultados no máximo uma vez por instância (ou seja,
+        uma vez por requisição). Se CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT estiver definido,
+        também ficam em cache entre requisições.
+        """
+        if not hasattr(self, '_nomes_dos_grupos'):
+            timeout = settings.CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT
+            nomes_dos_grupos = cache.get(self.chave_cache_de_grupos(self.id)) if timeout else None
+            if nomes_dos_grupos is None:
+                nomes_dos_grupos = frozenset(self.groups.values_list('name', flat=True))
+                if timeout:
+                    cache.set(self.chave_cache_de_grupos(self.id), nomes_dos_grupos, timeout)
+            self._nomes_dos_grupos = nomes_dos_grupos
+        return self._nomes_dos_grupos
+
+    def limpar_cache_de_grupos(self):
+        self.__dict__.pop('_nomes_dos_grupos', None)
+        if settings.CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT:
+            chave = self.chave_cache_de_grupos(self.id)
+            transaction.on_commit(lambda: cache.delete(chave))
+
+
+def expiracao_do_password_reset_token():
+    return timezone.now() + PasswordResetToken.PRAZO_DE_VALIDADE
+
 
 class PasswordResetToken(models.Model):
+    PRAZO_DE_VALIDADE = timedelta(days=1)
+
     usuario = models.ForeignKey(get_user_model(), related_name="password_reset_tokens", on_delete=models.CASCADE)
     token = models.CharField('Token', unique=True, max_length=64, db_index=True)
     criacao = models.DateTimeField('Criação', auto_now_add=True)
+    # Gravada na criação, para que os tokens pendentes e os expirados sejam consultados pelo banco
+    expira_em = models.DateTimeField('Expira em', default=expiracao_do_password_reset_token, db_index=True)
     ativo = models.BooleanField('Ativo', default=True)
 
     @property
     def expirado(self):
-        prazo_em_dias = 1
-        expiracao = self.criacao + timedelta(days=prazo_em_dias)
-        if timezone.now() > expiracao:
-            return True
-        return False
+        return timezone.now() >= self.expira_em
 
     def gerar_token(self):
         length = random.randint(40, 60)
         return binascii.hexlify(os.urandom(length)).decode()[0:length]
 
     def enviar_token_por_email(self):
-        return send_mail(
-            f'Criar nova senha - {settings.NOME_DO_PROJETO}',
-            f'Olá!\n'
-            f'Conforme o solicitado, segue o link para criar a sua nova senha: \n'
-            f'{settings.URL_FRONTEND_BASE_PARA_ADICIONAR_TOKEN_PARA_EMAIL_DE_CRIAR_NOVA_PASSWORD}{self.token}',
-            None,
-            [self.usuario.email],
-            fail_silently=False,
+        """Coloca o e-mail com o token na caixa de saída, de onde é enviado pelo comando enviar_emails."""
+        return EmailDeSaida.objects.create(
+            assunto=f'Criar nova senha - {settings.NOME_DO_PROJETO}',
+            mensagem=f'Olá!\n'
+                     f'Conforme o solicitado, segue o link para criar a sua nova senha: \n'
+                     f'{settings.URL_FRONTEND_BASE_PARA_ADICIONAR_TOKEN_PARA_EMAIL_DE_CRIAR_NOVA_PASSWORD}{self.token}',
+            destinatario=self.usuario.email
         )
 
     def save(self, *args, **kwargs):
@@ -94,3 +125,80 @@ class PasswordResetToken(models.Model):
                 self.enviar_token_por_email()
         else:
             super().save(*args, **kwargs)
+
+
+def expiracao_do_token_de_acesso():
+    return timezone.now() + timedelta(seconds=settings.TOKENS_DE_ACESSO_VALIDADE)
+
+
+class TokenDeAcesso(models.Model):
+    """
+    Token de acesso à API, obtido com e-mail e senha (vide TokenDeAcessoAuthentication).
+    Somente o digest do token é gravado; o token em si é informado apenas ao criá-lo.
+    """
+    usuario = models.ForeignKey(get_user_model(), related_name="tokens_de_acesso", on_delete=models.CASCADE)
+    digest = models.CharField('Digest', unique=True, max_length=64)
+    criacao = models.DateTimeField('Criação', auto_now_add=True)
+    expira_em = models.DateTimeField('Expira em', default=expiracao_do_token_de_acesso, db_index=True)
+    ativo = models.BooleanField('Ativo', default=True)
+
+    class Meta:
+        verbose_name = 'Token de acesso'
+        verbose_name_plural = 'Tokens de acesso'
+
+    def __str__(self):
+        return f'{self.usuario} - {self.criacao}'
+
+    @staticmethod
+    def calcular_digest(token):
+        # Tokens aleatórios e longos dispensam um hash lento como o das senhas
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def chave_cache(digest):
+        return f'usuarios:tokens:{digest}'
+
+    @classmethod
+    def criar(cls, usuario):
+        """Cria um token de acesso para o usuário e retorna a instância e o token."""
+        token = secrets.token_urlsafe(32)
+        return cls.objects.create(usuario=usuario, digest=cls.calcular_digest(token)), token
+
+    @classmethod
+    def revogar(cls, tokens_de_acesso):
+        """Revoga os tokens da queryset e os remove do cache após o commit. Retorna a quantidade revogada."""
+        digests = list(tokens_de_acesso.filter(ativo=True).values_list('digest', flat=True))
+        revogados = cls.objects.filter(digest__in=digests).update(ativo=False)
+        cls.limpar_cache(digests)
+        return revogados
+
+    @classmethod
+    def limpar_cache(cls, digests):
+        if settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT and digests:
+            chaves = [cls.chave_cache(digest) for digest in digests]
+            transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+class EmailDeSaida(models.Model):
+    """
+    Caixa de saída: e-mails gravados na mesma transação que os originou e enviados
+    depois, fora das requisições, pelo comando enviar_emails.
+    """
+    assunto = models.CharField('Assunto', max_length=255)
+    mensagem = models.TextField('Mensagem')
+    destinatario = models.EmailField('Destinatário')
+    criacao = models.DateTimeField('Criação', auto_now_add=True)
+    proxima_tentativa = models.DateTimeField('Próxima tentativa de envio', default=timezone.now)
+    tentativas = models.PositiveSmallIntegerField('Tentativas de envio', default=0)
+    ultimo_erro = models.TextField('Último erro', blank=True, default='')
+    enviado_em = models.DateTimeField('Enviado em', null=True)
+
+    class Meta:
+        verbose_name = 'E-mail de saída'
+        verbose_name_plural = 'E-mails de saída'
+        indexes = [
+            models.Index(fields=['enviado_em', 'proxima_tentativa'], name='emaildesaida_pendentes_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.assunto} - {self.destinatario}'
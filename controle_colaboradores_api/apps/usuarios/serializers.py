@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import Group
 from django.contrib.auth.password_validation import validate_password
+from django.utils import timezone
 
 from .models import CustomUsuario, PasswordResetToken
 
@@ -214,13 +216,12 @@ class PasswordResetTokenSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        tokens_ativos = PasswordResetToken.objects.filter(usuario=validated_data['usuario'],
-                                                          ativo=True)
-        token_pendente = [t for t in tokens_ativos if not t.expirado]
+        token_pendente = PasswordResetToken.objects.filter(usuario=validated_data['usuario'],
+                                                           ativo=True,
+                                                           expira_em__gt=timezone.now()).first()
         if token_pendente:
-            token = token_pendente[0]
-            token.enviar_token_por_email()
-            return token
+            token_pendente.enviar_token_por_email()
+            return token_pendente
 
         novo_token = PasswordResetToken.objects.create(usuario=validated_data['usuario'])
         return novo_token
@@ -229,3 +230,15 @@ class PasswordResetTokenSerializer(serializers.ModelSerializer):
         instance.ativo = validated_data.get('ativo', instance.ativo)
         instance.save()
         return instance
+
+
+class TokenDeAcessoSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+
+    def validate(self, data):
+        usuario = authenticate(self.context.get('request'), username=data['email'], password=data['password'])
+        if usuario is None:
+            raise serializers.ValidationError({"status": "E-mail ou senha inválidos."})
+        data['usuario'] = usuario
+        return data
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from controle_colaboradores_api.cache_de_respostas import invalidar_respostas
+
+from .models import CustomUsuario, TokenDeAcesso
+
+
+@receiver(m2m_changed, sender=CustomUsuario.groups.through)
+def limpar_cache_de_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # usuario.groups.add/remove/set/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.limpar_cache_de_grupos()
+        return
+
+    # group.user_set.add/remove/clear
+    if not settings.CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT:
+        return
+    if action in ('post_add', 'post_remove'):
+        usuarios_ids = pk_set
+    elif action == 'pre_clear':
+        usuarios_ids = list(instance.user_set.values_list('id', flat=True))
+    else:
+        return
+    chaves = [CustomUsuario.chave_cache_de_grupos(usuario_id) for usuario_id in usuarios_ids]
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+@receiver(post_save, sender=CustomUsuario)
+def limpar_cache_de_tokens_de_acesso(sender, instance, created, **kwargs):
+    # Os tokens em cache guardam o usuário, que pode ter sido desativado
+    if settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT and not created:
+        TokenDeAcesso.limpar_cache(list(instance.tokens_de_acesso.filter(ativo=True).values_list('digest', flat=True)))
+
+
+@receiver([post_save, post_delete], sender=CustomUsuario)
+@receiver([post_save, post_delete], sender=Group)
+def invalidar_respostas_do_model(sender, **kwargs):
+    invalidar_respostas(sender)
+
+
+@receiver(m2m_changed, sender=CustomUsuario.groups.through)
+def invalidar_respostas_dos_grupos_dos_usuarios(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_respostas(CustomUsuario)
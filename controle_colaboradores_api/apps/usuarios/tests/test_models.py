@@ -1,11 +1,10 @@
-from datetime import timedelta
 from django.utils import timezone
 
 import pytest
+from django.core import mail
 from model_bakery import baker
 
-import controle_colaboradores_api.apps.usuarios.models
-from controle_colaboradores_api.apps.usuarios.models import CustomUsuario
+from controle_colaboradores_api.apps.usuarios.models import CustomUsuario, EmailDeSaida
 
 
 @pytest.fixture
@@ -63,34 +62,62 @@ class TestCustomUsuario:
     def test_str(self, usuario):
         assert str(usuario) == "helder.lima@dominio.com.br"
 
+    def test_obter_nomes_dos_grupos(self, usuario, django_assert_num_queries):
+        grupo = baker.make('auth.Group', name="Colaboradores")
+        usuario.groups.set([grupo])
+        with django_assert_num_queries(1):
+            assert usuario.obter_nomes_dos_grupos() == {"Colaboradores"}
+            assert usuario.obter_nomes_dos_grupos() == {"Colaboradores"}
+
+        # Mudar os grupos invalida os nomes já consultados
+        usuario.groups.clear()
+        assert usuario.obter_nomes_dos_grupos() == set()
+
+    def test_obter_nomes_dos_grupos_com_cache_entre_requisicoes(self,
+                                                               usuario,
+                                                               settings,
+                                                               django_assert_num_queries,
+                                                               django_capture_on_commit_callbacks):
+        settings.CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT = 60
+        grupo = baker.make('auth.Group', name="Administradores")
+        with django_capture_on_commit_callbacks(execute=True):
+            usuario.groups.set([grupo])
+        assert usuario.obter_nomes_dos_grupos() == {"Administradores"}
+
+        with django_assert_num_queries(0):
+            assert CustomUsuario(id=usuario.id).obter_nomes_dos_grupos() == {"Administradores"}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            grupo.user_set.remove(usuario)
+        assert CustomUsuario(id=usuario.id).obter_nomes_dos_grupos() == set()
+
 
 class TestPasswordResetToken:
 
     def test_expirado(self, password_reset_token):
         assert password_reset_token.expirado is False
 
-        password_reset_token.criacao -= timedelta(days=1)
+        password_reset_token.expira_em = timezone.now()
         assert password_reset_token.expirado is True
 
     def test_gerar_token(self, password_reset_token):
         token_length = len(password_reset_token.gerar_token())
         assert 40 <= token_length <= 60
 
-    def test_save(self, db, mocker):
-        spy = mocker.spy(controle_colaboradores_api.apps.usuarios.models, 'send_mail')
-
+    def test_save(self, db):
         usuario = baker.make('CustomUsuario',
                              email="fulano@dominio.com.br",
                              perfil__nome="Fulano",
                              perfil__sobrenome="Tal",
                              perfil__cpf="000.000.000-00")
         token_instance = baker.make('PasswordResetToken', usuario=usuario)
-        assert spy.call_count == 1
-        assert spy.spy_return == 1
         assert 40 <= len(token_instance.token) <= 60
+        # O e-mail fica na caixa de saída, sem ser enviado durante a requisição
+        email = EmailDeSaida.objects.get()
+        assert email.destinatario == "fulano@dominio.com.br"
+        assert token_instance.token in email.mensagem
+        assert mail.outbox == []
 
         # Test save quando update
         token_instance.save()
-        assert spy.call_count == 1  # Permanece igual, porque update não chama o method
-
-
+        assert EmailDeSaida.objects.count() == 1  # Permanece igual, porque update não chama o method
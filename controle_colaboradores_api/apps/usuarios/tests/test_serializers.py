@@ -4,6 +4,7 @@ import pytest
 from django.contrib.auth.hashers import make_password
 from rest_framework.exceptions import ValidationError as rest_ValidationError
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from model_bakery import baker
 
 from controle_colaboradores_api.apps.usuarios.serializers import (
@@ -155,7 +156,7 @@ class TestPasswordResetTokenSerializer:
 
         # Token com prazo expirado
         token.ativo = True
-        token.criacao -= timedelta(days=1)
+        token.expira_em = timezone.now() - timedelta(seconds=1)
         token.save()
         with pytest.raises(rest_ValidationError) as e_info:
             serializer.validate({"usuario": token.usuario,
@@ -3,6 +3,8 @@ from datetime import timedelta
 
 import pytest
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
 from model_bakery import baker
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
@@ -75,6 +77,26 @@ class TestCustomUsuarioViewSet:
         assert len(results) == 4
         assert results[0]['email'] == "usuario@email.com"
 
+    def test_list_quantidade_de_queries(self,
+                                        db,
+                                        api_client,
+                                        usuario,
+                                        grupo_administradores,
+                                        grupo_colaboradores,
+                                        django_assert_num_queries):
+        usuario.groups.set([grupo_administradores.id])
+        endpoint_url = reverse('customusuario-list')
+
+        # Grupos do usuário autenticado, contagem, usuários e grupos dos usuários,
+        # independentemente da quantidade de usuários na página
+        for quantidade in (3, 30):
+            baker.make('CustomUsuario', groups=[grupo_colaboradores], _quantity=quantidade)
+            api_client.force_authenticate(user=CustomUsuario.objects.get(id=usuario.id))
+            with django_assert_num_queries(4):
+                response = api_client.get(endpoint_url)
+            assert response.status_code == 200
+            assert all(len(r['groups']) == 1 for r in json.loads(response.content)['results'])
+
     def test_retrieve(self,
                       db,
                       api_client,
@@ -221,7 +243,7 @@ class TestCustomUsuarioViewSet:
         # Com token expirado
         token = baker.make('PasswordResetToken',
                            usuario=usuario)
-        token.criacao -= timedelta(days=1)
+        token.expira_em = timezone.now() - timedelta(seconds=1)
         token.save()
         endpoint_url_com_token_expirado = endpoint_url + "?token=" + token.token
         response = api_client.patch(
@@ -407,6 +429,43 @@ class TestCustomUsuarioViewSet:
         usuario.refresh_from_db()
         assert usuario.is_active is False
 
+    def test_quantidade_de_queries_do_objeto_consultado_pelas_conditions(self,
+                                                                          db,
+                                                                          api_client,
+                                                                          usuario,
+                                                                          outro_usuario,
+                                                                          grupo_administradores,
+                                                                          grupo_colaboradores,
+                                                                          django_assert_num_queries,
+                                                                          django_capture_on_commit_callbacks):
+        # O usuário obtido pelas conditions é reaproveitado pela action
+        def autenticar():
+            api_client.force_authenticate(user=CustomUsuario.objects.get(id=usuario.id))
+
+        def requisitar(metodo, url, quantidade_de_queries, **kwargs):
+            # Cada requisição em sua própria transação, executando os callbacks de commit
+            with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+                autenticar()
+                with django_assert_num_queries(quantidade_de_queries):
+                    response = metodo(url, **kwargs)
+            assert response.status_code == 200
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            usuario.groups.set([grupo_colaboradores.id])
+        requisitar(api_client.get, reverse('customusuario-detail', args=[usuario.id]), 3)
+        requisitar(api_client.patch, reverse('customusuario-mudar-email', args=[usuario.id]), 5,
+                   data={'email': 'novo@email.com', 'password': 'usuario'}, format='json')
+        # Com a revogação dos tokens de acesso, em uma transação
+        requisitar(api_client.patch, reverse('customusuario-mudar-password', args=[usuario.id]), 7,
+                   data={'password': 'usuario', 'nova_senha': 'SenhaNova123'}, format='json')
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            usuario.groups.set([grupo_administradores.id])
+        requisitar(api_client.patch, reverse('customusuario-ativar', args=[outro_usuario.id]), 7)
+        requisitar(api_client.patch, reverse('customusuario-desativar', args=[outro_usuario.id]), 7)
+        requisitar(api_client.patch, reverse('customusuario-mudar-grupo', args=[outro_usuario.id]), 10,
+                   data={'groups': [grupo_colaboradores.id]}, format='json')
+
 
 class TestGroupViewSet:
 
@@ -490,6 +549,27 @@ class TestPasswordResetTokenViewSet:
         assert len(results) == 1
         assert results[0]['usuario']['email'] == "usuario@email.com"
 
+    def test_list_quantidade_de_queries(self,
+                                        db,
+                                        api_client,
+                                        usuario,
+                                        grupo_colaboradores,
+                                        django_assert_num_queries):
+        usuario.is_superuser = True
+        usuario.save()
+        api_client.force_authenticate(user=usuario)
+        endpoint_url = reverse('passwordresettoken-list')
+
+        # Contagem, tokens com os usuários e grupos dos usuários,
+        # independentemente da quantidade de tokens na página
+        for quantidade in (3, 30):
+            for outro_usuario in baker.make('CustomUsuario', groups=[grupo_colaboradores], _quantity=quantidade):
+                baker.make('PasswordResetToken', usuario=outro_usuario)
+            with django_assert_num_queries(3):
+                response = api_client.get(endpoint_url)
+            assert response.status_code == 200
+            assert all(len(r['usuario']['groups']) == 1 for r in json.loads(response.content)['results'])
+
     def test_retrieve(self,
                       db,
                       api_client,
@@ -566,3 +646,134 @@ class TestPasswordResetTokenViewSet:
         assert usuario.password_reset_tokens.count() == 2
         assert usuario.password_reset_tokens.filter(ativo=True).count() == 1
 
+
+
+class TestTokenDeAcessoViewSet:
+
+    @pytest.fixture
+    def obter_token(self, api_client):
+        def obter_token(email="usuario@email.com", password="usuario"):
+            response = api_client.post(reverse('tokendeacesso-list'),
+                                       data={'email': email, 'password': password},
+                                       format='json')
+            return response
+        return obter_token
+
+    def test_create(self, db, api_client, usuario, obter_token):
+        # Com senha incorreta
+        response = obter_token(password="errada")
+        assert response.status_code == 400
+        assert json.loads(response.content)['status'] == ["E-mail ou senha inválidos."]
+
+        # Com e-mail e senha corretos
+        response = obter_token()
+        assert response.status_code == 201
+        token = json.loads(response.content)['token']
+        token_de_acesso = usuario.tokens_de_acesso.get()
+        assert token_de_acesso.digest != token
+        assert token_de_acesso.expira_em > timezone.now()
+
+        # Autenticando com o token
+        endpoint_url = reverse('customusuario-detail', args=[usuario.id])
+        response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+        assert json.loads(response.content)['email'] == "usuario@email.com"
+        response = api_client.get(endpoint_url, HTTP_AUTHORIZATION='Token invalido')
+        assert response.status_code == 401
+        assert response['WWW-Authenticate'] == 'Token'
+
+        # Token expirado
+        token_de_acesso.expira_em = timezone.now()
+        token_de_acesso.save()
+        response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 401
+
+        # Usuário inativo
+        token = json.loads(obter_token().content)['token']
+        usuario.is_active = False
+        usuario.save()
+        response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 401
+
+    def test_cache(self, db, api_client, usuario, obter_token, settings,
+                   django_assert_num_queries, django_capture_on_commit_callbacks):
+        settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT = 60
+        token = json.loads(obter_token().content)['token']
+        endpoint_url = reverse('customusuario-detail', args=[usuario.id])
+
+        # Na primeira requisição, o token é consultado; nas seguintes, vem do cache
+        with django_assert_num_queries(4):
+            response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+        with django_assert_num_queries(3):
+            response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+
+        # A desativação do usuário remove seus tokens do cache
+        usuario = CustomUsuario.objects.get(id=usuario.id)
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            usuario.is_active = False
+            usuario.save()
+        response = api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 401
+
+    def test_revogados_ao_mudar_password(self, db, api_client, usuario, obter_token, password_reset_token,
+                                         django_capture_on_commit_callbacks, settings):
+        settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT = 60
+        endpoint_url = reverse('customusuario-detail', args=[usuario.id])
+
+        # Mudando a senha com um token de acesso (após colocá-lo em cache)
+        token = json.loads(obter_token().content)['token']
+        outro_token = json.loads(obter_token().content)['token']
+        assert api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {outro_token}').status_code == 200
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            response = api_client.patch(reverse('customusuario-mudar-password', args=[usuario.id]),
+                                        data={'password': 'usuario', 'nova_senha': 'SenhaNova123'},
+                                        format='json',
+                                        HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+        assert api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}').status_code == 401
+        assert api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {outro_token}').status_code == 401
+
+        # Mudando a senha após o reset
+        token = json.loads(obter_token(password='SenhaNova123').content)['token']
+        assert api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}').status_code == 200
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            response = api_client.patch(reverse('customusuario-mudar-password-apos-reset', args=[usuario.id])
+                                        + f'?token={password_reset_token.token}',
+                                        data={'nova_senha': 'OutraSenha123'},
+                                        format='json')
+        assert response.status_code == 200
+        assert api_client.get(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}').status_code == 401
+
+    def test_revogar(self, db, api_client, usuario, obter_token, django_capture_on_commit_callbacks, settings):
+        settings.TOKENS_DE_ACESSO_CACHE_TIMEOUT = 60
+        endpoint_url = reverse('tokendeacesso-revogar')
+        token = json.loads(obter_token().content)['token']
+        outro_token = json.loads(obter_token().content)['token']
+
+        # Por Anônimo
+        response = api_client.post(endpoint_url)
+        assert response.status_code == 401
+
+        # Revogando o token utilizado na requisição (após colocá-lo em cache)
+        response = api_client.get(reverse('customusuario-detail', args=[usuario.id]),
+                                  HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            response = api_client.post(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 200
+        assert json.loads(response.content)['status'] == "1 tokens de acesso revogados."
+        response = api_client.post(endpoint_url, HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code == 401
+        response = api_client.post(endpoint_url, HTTP_AUTHORIZATION=f'Token {outro_token}')
+        assert response.status_code == 200
+
+        # Sem token de acesso, somente com todos=true
+        token = json.loads(obter_token().content)['token']
+        api_client.force_authenticate(user=usuario)
+        response = api_client.post(endpoint_url)
+        assert response.status_code == 400
+        response = api_client.post(endpoint_url + '?todos=true')
+        assert response.status_code == 200
+        assert usuario.tokens_de_acesso.filter(ativo=True).count() == 0
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+
+from controle_colaboradores_api.apps.usuarios.models import EmailDeSaida
+
+
+class TestCommand:
+
+    def test_handle(self, db, settings, django_assert_max_num_queries):
+        settings.CAIXA_DE_SAIDA_TAMANHO_DO_LOTE = 2
+        emails = baker.make('EmailDeSaida', assunto="Assunto", mensagem="Mensagem", destinatario="fulano@email.com",
+                            _quantity=3)
+        baker.make('EmailDeSaida', enviado_em=timezone.now())
+        agendado = baker.make('EmailDeSaida', proxima_tentativa=timezone.now() + timedelta(minutes=5))
+
+        # 2 lotes (reserva e registro do envio) e a verificação da caixa de saída vazia
+        with django_assert_max_num_queries(13):
+            assert call_command('enviar_emails') == "Fim da execução bem sucedida."
+        assert len(mail.outbox) == 3
+        assert mail.outbox[0].subject == "Assunto"
+        assert mail.outbox[0].body == "Mensagem"
+        assert mail.outbox[0].to == ["fulano@email.com"]
+        for email in emails:
+            email.refresh_from_db()
+            assert email.enviado_em is not None
+            assert email.mensagem == ''
+        agendado.refresh_from_db()
+        assert agendado.enviado_em is None
+
+        call_command('enviar_emails')
+        assert len(mail.outbox) == 3
+
+    def test_handle_falha_no_envio(self, db, settings, mocker):
+        settings.CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS = 2
+        settings.CAIXA_DE_SAIDA_ESPERA_ENTRE_TENTATIVAS = 60
+        email = baker.make('EmailDeSaida')
+        mocker.patch.object(EmailMessage, 'send', side_effect=SMTPException("Servidor indisponível"))
+
+        call_command('enviar_emails')
+        email.refresh_from_db()
+        assert email.enviado_em is None
+        assert email.tentativas == 1
+        assert email.ultimo_erro == "SMTPException: Servidor indisponível"
+        assert timedelta(seconds=50) < email.proxima_tentativa - timezone.now() <= timedelta(seconds=60)
+
+        # Nova tentativa somente após a espera, que dobra a cada falha
+        call_command('enviar_emails')
+        email.refresh_from_db()
+        assert email.tentativas == 1
+        EmailDeSaida.objects.update(proxima_tentativa=timezone.now())
+        call_command('enviar_emails')
+        email.refresh_from_db()
+        assert email.tentativas == 2
+        assert timedelta(seconds=110) < email.proxima_tentativa - timezone.now() <= timedelta(seconds=120)
+
+        # Esgotadas as tentativas, não é mais enviado
+        mocker.stopall()
+        EmailDeSaida.objects.update(proxima_tentativa=timezone.now())
+        call_command('enviar_emails')
+        assert mail.outbox == []
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+
+from controle_colaboradores_api.apps.usuarios.models import EmailDeSaida, PasswordResetToken, TokenDeAcesso
+
+
+class TestCommand:
+
+    def test_handle(self, db, django_assert_num_queries):
+        pendente = baker.make('PasswordResetToken')
+        baker.make('PasswordResetToken', ativo=False, _quantity=2)
+        baker.make('PasswordResetToken', expira_em=timezone.now() - timedelta(minutes=1), _quantity=2)
+
+        token_de_acesso = baker.make('TokenDeAcesso')
+        baker.make('TokenDeAcesso', ativo=False)
+
+        # Tokens de reset: 2 lotes (consulta e exclusão) e a consulta do lote vazio; tokens de acesso: 1 lote;
+        # caixa de saída vazia: a consulta do lote vazio
+        with django_assert_num_queries(9):
+            assert call_command('purgar_tokens_expirados', lote=3) == "Fim da execução bem sucedida."
+        assert list(PasswordResetToken.objects.all()) == [pendente]
+        assert list(TokenDeAcesso.objects.all()) == [token_de_acesso]
+
+    def test_handle_caixa_de_saida(self, db, settings):
+        settings.CAIXA_DE_SAIDA_RETENCAO = 60 * 60
+        settings.CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS = 2
+        fora_da_retencao = timezone.now() - timedelta(hours=2)
+        mantidos = [
+            baker.make('EmailDeSaida'),
+            baker.make('EmailDeSaida', tentativas=1),
+            baker.make('EmailDeSaida', enviado_em=timezone.now()),
+            baker.make('EmailDeSaida', tentativas=2),
+        ]
+        enviado = baker.make('EmailDeSaida', enviado_em=fora_da_retencao)
+        esgotado = baker.make('EmailDeSaida', tentativas=2)
+        pendente_antigo = baker.make('EmailDeSaida', tentativas=1)
+        EmailDeSaida.objects.filter(id__in=[esgotado.id, pendente_antigo.id]).update(criacao=fora_da_retencao)
+        mantidos.append(pendente_antigo)
+
+        call_command('purgar_tokens_expirados')
+        assert set(EmailDeSaida.objects.all()) == set(mantidos)
+        assert not EmailDeSaida.objects.filter(id=enviado.id).exists()
@@ -1,8 +1,9 @@
 from rest_framework.routers import DefaultRouter
 
-from .views import CustomUsuarioViewSet, GroupViewSet, PasswordResetTokenViewSet
+from .views import CustomUsuarioViewSet, GroupViewSet, PasswordResetTokenViewSet, TokenDeAcessoViewSet
 
 router = DefaultRouter()
 router.register(r'usuarios', CustomUsuarioViewSet, basename='customusuario')
 router.register(r'grupos', GroupViewSet, basename='group')
 router.register(r'pwd-reset-tokens', PasswordResetTokenViewSet, basename='passwordresettoken')
+router.register(r'tokens', TokenDeAcessoViewSet, basename='tokendeacesso')
@@ -1,7 +1,8 @@
 from django.db import transaction
 from django.contrib.auth.models import Group
+from django.utils import timezone
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import no_body, swagger_auto_schema
 
 from rest_framework import status, mixins
 from rest_framework.decorators import action
@@ -9,7 +10,11 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, GenericViewSet
 from rest_access_policy import AccessViewSetMixin
 
-from .models import CustomUsuario, PasswordResetToken
+from controle_colaboradores_api.cache_de_respostas import RespostaEmCacheMixin
+from controle_colaboradores_api.views_mixins import ObjetoEmCacheMixin
+
+from .authentication import TokenDeAcessoAuthentication
+from .models import CustomUsuario, PasswordResetToken, TokenDeAcesso
 from .serializers import (
     GroupSerializer,
     CustomUsuarioSerializer,
@@ -18,11 +23,19 @@ from .serializers import (
     CustomUsuarioMudarEmailSerializer,
     CustomUsuarioMudarGrupoSerializer,
     CustomUsuarioMudarAtivacaoSerializer,
-    PasswordResetTokenSerializer
+    PasswordResetTokenSerializer,
+    TokenDeAcessoSerializer
+)
+from .views_access_policies import (
+    GroupAccessPolicy,
+    CustomUsuarioAccessPolicy,
+    PasswordResetTokenAccessPolicy,
+    TokenDeAcessoAccessPolicy
 )
-from .views_access_policies import GroupAccessPolicy, CustomUsuarioAccessPolicy, PasswordResetTokenAccessPolicy
 
-class CustomUsuarioViewSet(AccessViewSetMixin,
+class CustomUsuarioViewSet(RespostaEmCacheMixin,
+                           ObjetoEmCacheMixin,
+                           AccessViewSetMixin,
                            mixins.CreateModelMixin,
                            mixins.RetrieveModelMixin,
                            mixins.ListModelMixin,
@@ -43,9 +56,21 @@ class CustomUsuarioViewSet(AccessViewSetMixin,
     """
     access_policy = CustomUsuarioAccessPolicy
     serializer_class = CustomUsuarioSerializer
+    custos_de_throttle = {
+        # Actions que geram ou verificam hashes de senhas (Argon2)
+        'create': 5,
+        'mudar_password': 5,
+        'mudar_password_apos_reset': 5,
+        'mudar_email': 5
+    }
+    models_do_cache = (CustomUsuario, Group)
 
     def get_queryset(self):
-        return CustomUsuario.objects.all().order_by('id')
+        queryset = CustomUsuario.objects.all().order_by('id')
+        if self.action in ('list', 'retrieve'):
+            # Os grupos são serializados com cada usuário; as demais actions não os consultam
+            queryset = queryset.prefetch_related('groups')
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(usuario_modificacao=self.request.user)
@@ -66,18 +91,23 @@ class CustomUsuarioViewSet(AccessViewSetMixin,
         except KeyError:
             return Response({'status': 'Token não informado.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        try:
-            token_instance = usuario.password_reset_tokens.get(token=token)
-        except PasswordResetToken.DoesNotExist:
-            return Response({'status': 'Token inválido.'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        serializer_token = PasswordResetTokenSerializer(token_instance,
-                                                        data={'ativo': False},
-                                                        partial=True)
-        if serializer_token.is_valid():
-            serializer_token.save()
-        else:
+        # Valida e desativa o token em uma única query, que também impede o seu uso simultâneo
+        token_utilizado = usuario.password_reset_tokens.filter(
+            token=token,
+            ativo=True,
+            expira_em__gt=timezone.now()
+        ).update(ativo=False)
+        if not token_utilizado:
+            try:
+                token_instance = usuario.password_reset_tokens.get(token=token)
+            except PasswordResetToken.DoesNotExist:
+                return Response({'status': 'Token inválido.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Informa se o token já foi utilizado ou está expirado
+            serializer_token = PasswordResetTokenSerializer(token_instance,
+                                                            data={'ativo': False},
+                                                            partial=True)
+            serializer_token.is_valid()
             return Response(serializer_token.errors,
                             status=status.HTTP_400_BAD_REQUEST)
 
@@ -89,11 +119,14 @@ class CustomUsuarioViewSet(AccessViewSetMixin,
 
         if serializer_usuario.is_valid():
             serializer_usuario.save()
+            # Tokens de acesso obtidos com a senha anterior, possivelmente por terceiros
+            TokenDeAcesso.revogar(usuario.tokens_de_acesso.all())
             return Response({'status': 'A nova senha foi registrada.'},
                             status=status.HTTP_200_OK)
         return Response(serializer_usuario.errors,
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @transaction.atomic
     @action(detail=True, methods=['patch'], serializer_class=CustomUsuarioMudarPasswordSerializer)
     def mudar_password(self, request, pk=None):
         usuario = self.get_object()
@@ -103,6 +136,8 @@ class CustomUsuarioViewSet(AccessViewSetMixin,
 
         if serializer.is_valid():
             serializer.save()
+            # Inclusive o da requisição: um novo token deve ser obtido com a nova senha
+            TokenDeAcesso.revogar(usuario.tokens_de_acesso.all())
             return Response({'status': 'A nova senha foi registrada.'},
                             status=status.HTTP_200_OK)
 
@@ -209,7 +244,10 @@ class PasswordResetTokenViewSet(AccessViewSetMixin,
     serializer_class = PasswordResetTokenSerializer
 
     def get_queryset(self):
-        return PasswordResetToken.objects.all().order_by('id')
+        # O usuário e os seus grupos são serializados com cada token
+        return PasswordResetToken.objects.select_related('usuario').prefetch_related(
+            'usuario__groups'
+        ).order_by('id')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -219,3 +257,45 @@ class PasswordResetTokenViewSet(AccessViewSetMixin,
         return Response({'status': 'Token criado. E-mail enviado ao '
                                    'usuário para criação de nova senha.'},
                         status=status.HTTP_201_CREATED, headers=headers)
+
+
+class TokenDeAcessoViewSet(AccessViewSetMixin, GenericViewSet):
+    """
+    Token de Acesso ViewSet description:
+
+    create: Obter um token de acesso com e-mail e senha. Nas requisições seguintes, envie-o
+     no cabeçalho Authorization: Token <token>.
+    revogar: Revogar o token de acesso utilizado na requisição ou, com todos=true,
+     todos os tokens de acesso do usuário.
+    """
+    access_policy = TokenDeAcessoAccessPolicy
+    serializer_class = TokenDeAcessoSerializer
+    custos_de_throttle = {'create': 5}
+
+    def get_queryset(self):
+        return TokenDeAcesso.objects.all().order_by('id')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token_de_acesso, token = TokenDeAcesso.criar(serializer.validated_data['usuario'])
+        return Response({'token': token, 'expira_em': token_de_acesso.expira_em},
+                        status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(method='post', request_body=no_body,
+                         manual_parameters=[openapi.Parameter('todos',
+                                                              openapi.IN_QUERY,
+                                                              type=openapi.TYPE_BOOLEAN,
+                                                              required=False)])
+    @action(detail=False, methods=['post'])
+    def revogar(self, request):
+        tokens_de_acesso = TokenDeAcesso.objects.filter(usuario=request.user)
+        if request.query_params.get('todos') != 'true':
+            if not isinstance(request.successful_authenticator, TokenDeAcessoAuthentication):
+                return Response({'status': 'A requisição não foi autenticada com um token de acesso. '
+                                           'Informe todos=true para revogar todos os seus tokens.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            tokens_de_acesso = tokens_de_acesso.filter(digest=request.auth)
+        revogados = TokenDeAcesso.revogar(tokens_de_acesso)
+        return Response({'status': f'{revogados} tokens de acesso revogados.'},
+                        status=status.HTTP_200_OK)
@@ -1,7 +1,25 @@
 from rest_access_policy import AccessPolicy
 
 
-class CustomUsuarioAccessPolicy(AccessPolicy):
+class BaseAccessPolicy(AccessPolicy):
+    """
+    Compartilha uma única consulta aos grupos do usuário entre a avaliação
+    dos statements e os scope_queryset, durante toda a requisição.
+    """
+
+    def get_user_group_values(self, user):
+        if user.is_anonymous:
+            return []
+        return list(user.obter_nomes_dos_grupos())
+
+    @classmethod
+    def is_administrador(cls, request) -> bool:
+        if request.user.is_anonymous:
+            return False
+        return 'Administradores' in request.user.obter_nomes_dos_grupos()
+
+
+class CustomUsuarioAccessPolicy(BaseAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve",
@@ -38,7 +56,7 @@ class CustomUsuarioAccessPolicy(AccessPolicy):
         return request.user != usuario
 
 
-class GroupAccessPolicy(AccessPolicy):
+class GroupAccessPolicy(BaseAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve"],
@@ -62,3 +80,18 @@ class PasswordResetTokenAccessPolicy(AccessPolicy):
             "effect": "allow"
         }
     ]
+
+
+class TokenDeAcessoAccessPolicy(AccessPolicy):
+    statements = [
+        {
+            "action": ["create"],
+            "principal": ["*"],
+            "effect": "allow"
+        },
+        {
+            "action": ["revogar"],
+            "principal": ["authenticated"],
+            "effect": "allow"
+        }
+    ]
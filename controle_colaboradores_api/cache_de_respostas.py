@@ -0,0 +1,109 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+PREFIXO = 'respostas'
+
+
+def _chave_da_versao(model):
+    return f'{PREFIXO}:versao:{model._meta.label_lower}'
+
+
+def _chave_do_contador(basename, contador):
+    return f'{PREFIXO}:estatisticas:{basename}:{contador}'
+
+
+def obter_versoes(models):
+    """Versões atuais dos dados dos models, que mudam a cada alteração (vide invalidar_respostas)."""
+    chaves = [_chave_da_versao(model) for model in models]
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            cache.add(chave, uuid.uuid4().hex, None)
+            versoes[chave] = cache.get(chave)
+    return [versoes[chave] for chave in chaves]
+
+
+def invalidar_respostas(model):
+    """
+    Invalida, após o commit, as respostas em cache que dependem do model: uma nova versão
+    dos seus dados passa a compor as chaves, e as respostas antigas expiram sem ser lidas.
+    """
+    if settings.CACHE_DE_RESPOSTAS_TIMEOUT:
+        chave = _chave_da_versao(model)
+        transaction.on_commit(lambda: cache.set(chave, uuid.uuid4().hex, None))
+
+
+def _contar(basename, contador):
+    chave = _chave_do_contador(basename, contador)
+    if not cache.add(chave, 1, None):
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.add(chave, 1, None)
+
+
+def obter_estatisticas(basenames):
+    """Acertos e falhas do cache de respostas de cada viewset, desde a última limpeza do cache."""
+    chaves = [_chave_do_contador(basename, contador)
+              for basename in basenames for contador in ('acertos', 'falhas')]
+    contadores = cache.get_many(chaves)
+    return {
+        basename: {contador: contadores.get(_chave_do_contador(basename, contador), 0)
+                   for contador in ('acertos', 'falhas')}
+        for basename in basenames
+    }
+
+
+class RespostaEmCacheMixin:
+    """
+    Mantém em cache, por CACHE_DE_RESPOSTAS_TIMEOUT segundos, as respostas já serializadas
+    de list e retrieve, separadas pelo escopo do usuário: uma para todos os administradores
+    e uma para cada um dos demais usuários, cujas respostas dependem dos seus vínculos.
+
+    As respostas são invalidadas quando muda qualquer um dos models_do_cache (vide
+    invalidar_respostas, chamada pelos signals dos apps), os quais devem incluir os models
+    consultados pela serialização e pelo scope_queryset da access policy. O cabeçalho
+    X-Cache informa se a resposta veio do cache (HIT) ou não (MISS).
+    """
+    models_do_cache = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.responder_com_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_com_cache(super().retrieve, request, *args, **kwargs)
+
+    def obter_escopo_do_cache(self, request):
+        if self.access_policy.is_administrador(request):
+            return 'administradores'
+        return f'usuario:{request.user.id}'
+
+    def responder_com_cache(self, handler, request, *args, **kwargs):
+        timeout = settings.CACHE_DE_RESPOSTAS_TIMEOUT
+        if not timeout:
+            return handler(request, *args, **kwargs)
+
+        identificador = ':'.join([
+            *obter_versoes(self.models_do_cache),
+            self.obter_escopo_do_cache(request),
+            request.accepted_media_type,
+            request.build_absolute_uri()
+        ])
+        chave = f'{PREFIXO}:{self.basename}:{hashlib.sha256(identificador.encode()).hexdigest()}'
+        dados = cache.get(chave)
+        if dados is not None:
+            _contar(self.basename, 'acertos')
+            return Response(dados, headers={'X-Cache': 'HIT'})
+
+        _contar(self.basename, 'falhas')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(chave, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
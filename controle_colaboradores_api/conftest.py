@@ -0,0 +1,11 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    # Os ids se repetem entre os testes, e as versões dos dados só mudam após o commit, que não ocorre
+    # nos testes em transação: sem limpar os caches, um teste receberia as respostas em cache e
+    # consumiria o limite do throttling de outro
+    for cache in caches.all():
+        cache.clear()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from controle_colaboradores_api.cache_de_respostas import RespostaEmCacheMixin, obter_estatisticas
+from controle_colaboradores_api.urls import main_router
+
+
+class Command(BaseCommand):
+    help = "Mostra os acertos e as falhas do cache de respostas de cada endpoint."
+
+    def handle(self, *args, **options):
+        prefixos = {
+            basename: prefixo
+            for prefixo, viewset, basename in main_router.registry
+            if issubclass(viewset, RespostaEmCacheMixin)
+        }
+        estatisticas = obter_estatisticas(list(prefixos))
+        for basename, contadores in estatisticas.items():
+            total = contadores['acertos'] + contadores['falhas']
+            taxa = f"{contadores['acertos'] / total:.0%}" if total else "-"
+            self.stdout.write(f"{prefixos[basename]}: {contadores['acertos']} acertos, "
+                              f"{contadores['falhas']} falhas (taxa de acertos: {taxa})")
+        return "Fim da execução bem sucedida."
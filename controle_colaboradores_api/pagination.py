@@ -0,0 +1,62 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PaginacaoPorCursor(CursorPagination):
+    """
+    Paginação por chave (keyset): cada página continua a partir do último registro da
+    anterior, sem OFFSET e sem COUNT(*), de modo que o custo não cresce com a profundidade.
+    Ordena por id ou, com ?ordenacao=modificacao, por (modificacao, id). Uma view pode declarar
+    outras ordenações no atributo ordenacoes, que substitui o padrão.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordenacao_query_param = 'ordenacao'
+    ordenacoes = {
+        'id': ('id',),
+        'modificacao': ('modificacao', 'id')
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordenacoes = getattr(view, 'ordenacoes', self.ordenacoes)
+        ordenacao = request.query_params.get(self.ordenacao_query_param, 'id')
+        campos = ordenacoes.get(ordenacao)
+        if campos is None:
+            raise ValidationError({self.ordenacao_query_param: f"Ordenação inválida. "
+                                                               f"Opções: {', '.join(ordenacoes)}."})
+        nomes_dos_campos = {campo.name for campo in queryset.model._meta.get_fields()}
+        if not set(campos) <= nomes_dos_campos:
+            raise ValidationError({self.ordenacao_query_param: f"Ordenação '{ordenacao}' "
+                                                               f"indisponível neste endpoint."})
+        return campos
+
+
+class PaginacaoPadrao(PageNumberPagination):
+    """
+    Paginação por número de página (?page=) ou, quando informado o parâmetro ?cursor=
+    (mesmo vazio, para a primeira página), paginação por cursor. O tamanho da página
+    pode ser ajustado pelo cliente com ?page_size=, limitado a max_page_size.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = PaginacaoPorCursor.cursor_query_param
+
+    paginacao_por_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.paginacao_por_cursor = PaginacaoPorCursor()
+            return self.paginacao_por_cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.paginacao_por_cursor is not None:
+            return self.paginacao_por_cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        campos = super().get_schema_fields(view)
+        nomes_dos_campos = {campo.name for campo in campos}
+        return campos + [campo for campo in PaginacaoPorCursor().get_schema_fields(view)
+                         if campo.name not in nomes_dos_campos]
@@ -0,0 +1,39 @@
+class CamposSelecionaveisMixin:
+    """
+    Permite ao cliente escolher os campos da representação pela query string:
+    ?fields= limita os campos retornados e ?expand= escolhe quais das relações
+    aninhadas (campos_expansiveis) são incluídas; sem ?expand=, todas são incluídas.
+    Campos não selecionados não são serializados e, com otimizar_queryset,
+    as relações correspondentes também não são consultadas.
+
+    Aplica-se somente ao serializer principal da view, não aos serializers aninhados,
+    e somente à representação: os dados de entrada continuam sendo validados normalmente.
+    """
+    campos_expansiveis = ()
+
+    @staticmethod
+    def _ler_lista(request, parametro):
+        if request is None or parametro not in request.query_params:
+            return None
+        return {valor.strip() for valor in request.query_params[parametro].split(',') if valor.strip()}
+
+    @classmethod
+    def campos_selecionados(cls, request):
+        campos = set(cls.Meta.fields)
+        solicitados = cls._ler_lista(request, 'fields')
+        if solicitados is not None:
+            campos &= solicitados
+        expandidos = cls._ler_lista(request, 'expand')
+        if expandidos is not None:
+            campos -= set(cls.campos_expansiveis) - expandidos
+        return campos
+
+    @property
+    def _readable_fields(self):
+        if 'view' not in self.context:
+            yield from super()._readable_fields
+            return
+        campos = self.campos_selecionados(self.context.get('request'))
+        for field in super()._readable_fields:
+            if field.field_name in campos:
+                yield field
@@ -42,6 +42,9 @@ INSTALLED_APPS = [
     'rest_framework',
     'drf_yasg',
 
+    # Comandos do projeto como um todo (vide controle_colaboradores_api/management)
+    'controle_colaboradores_api',
+
     'controle_colaboradores_api.apps.localidades_brasileiras',
     'controle_colaboradores_api.apps.usuarios',
     'controle_colaboradores_api.apps.perfis',
@@ -133,21 +136,37 @@ LOGOUT_REDIRECT_URL = 'api-root'
 # DRF - Django Rest Framwork
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
+        'controle_colaboradores_api.apps.usuarios.authentication.TokenDeAcessoAuthentication',
         'rest_framework.authentication.SessionAuthentication'
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'controle_colaboradores_api.pagination.PaginacaoPadrao',
     'PAGE_SIZE': 10,
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'controle_colaboradores_api.throttling.ThrottleDeAnonimos',
+        'controle_colaboradores_api.throttling.ThrottleDeUsuarios',
     ),
+    # Requisições por minuto, consumidas conforme o custo de cada action (vide throttling.py)
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '60/minute',
-        'user': '60/minute'
+        'anon': os.getenv("THROTTLE_ANON_RATE", '60/minute'),
+        'user': os.getenv("THROTTLE_USER_RATE", '60/minute')
+    }
+}
+
+# Caches: 'default' guarda as respostas, os grupos dos usuários e os tokens de acesso (vide os
+# respectivos *_TIMEOUT abaixo) e 'throttle', os contadores do throttling (vide
+# controle_colaboradores_api.throttling). Localmente, cada processo tem os seus; em produção,
+# devem ser caches compartilhados (Redis ou Memcached), para que as invalidações e os limites
+# valham para todos os processos em conjunto.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
     }
 }
 
@@ -158,6 +177,9 @@ MIDDLEWARE_CLASSES = [
 # Swagger - Documentação on-line da API
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,  # True caso deseje login pelas urls do DRF
+    'SECURITY_DEFINITIONS': {
+        'Token': {'type': 'apiKey', 'name': 'Authorization', 'in': 'header'}
+    },
     'LOGIN_URL': 'rest_framework:login',
     'LOGOUT_URL': 'rest_framework:logout'
 }
@@ -170,6 +192,43 @@ USER_GROUPS_DO_PROJETO = [
     'Colaboradores'
 ]
 
+# Tempo (em segundos) que os grupos de cada usuário ficam em cache entre requisições.
+# Mantenha 0 (desativado) enquanto o cache não for compartilhado entre todos os processos,
+# pois a invalidação ao mudar os grupos de um usuário só alcança o cache do próprio processo.
+CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT = 0
+
+# Validade (em segundos) dos tokens de acesso à API e tempo (em segundos) que ficam em cache,
+# com o respectivo usuário, entre requisições. Assim como o cache de grupos, mantenha o cache
+# desativado (0) enquanto não for compartilhado entre todos os processos, pois a revogação de um
+# token só alcança o cache do próprio processo.
+TOKENS_DE_ACESSO_VALIDADE = 30 * 24 * 60 * 60
+TOKENS_DE_ACESSO_CACHE_TIMEOUT = 0
+
+# Tempo (em segundos) que as respostas de list e retrieve das viewsets com RespostaEmCacheMixin
+# ficam em cache (vide controle_colaboradores_api.cache_de_respostas). Assim como os demais
+# caches invalidados por signals, mantenha 0 (desativado) enquanto o cache não for compartilhado
+# entre todos os processos.
+CACHE_DE_RESPOSTAS_TIMEOUT = 0
+
+# Tempo (em segundos) que as respostas dos endpoints de localidades brasileiras, dados de
+# referência que raramente mudam, ficam em cache no servidor e nos clientes (Cache-Control).
+LOCALIDADES_CACHE_TIMEOUT = 60 * 60
+
+# Quantidade de threads que geram os hashes das senhas na importação de perfis em lote.
+# Cada hash Argon2 usa cerca de 100 MB de memória enquanto é gerado.
+IMPORTACAO_DE_PERFIS_THREADS = 4
+
+# Caixa de saída de e-mails (app usuarios > models > EmailDeSaida), enviada pelo comando enviar_emails:
+# e-mails por lote (uma conexão com o servidor de e-mail por lote), máximo de tentativas de envio,
+# espera (em segundos) antes da 2ª tentativa, que dobra a cada nova falha, e prazo (em segundos)
+# pelo qual um lote fica reservado ao worker que o está enviando. Os e-mails enviados e os que esgotaram
+# as tentativas são excluídos pelo comando purgar_tokens_expirados após a retenção (em segundos).
+CAIXA_DE_SAIDA_TAMANHO_DO_LOTE = 100
+CAIXA_DE_SAIDA_MAXIMO_DE_TENTATIVAS = 8
+CAIXA_DE_SAIDA_ESPERA_ENTRE_TENTATIVAS = 60
+CAIXA_DE_SAIDA_PRAZO_DA_RESERVA = 10 * 60
+CAIXA_DE_SAIDA_RETENCAO = 7 * 24 * 60 * 60
+
 # TODO Definir a url abaixo que será enviada por e-mail ao usuário quando solicitar reset da password:
 #  (Obs: é utilizada no app usuarios > models > PasswordResetToken > enviar_token_por_email)
 URL_FRONTEND_BASE_PARA_ADICIONAR_TOKEN_PARA_EMAIL_DE_CRIAR_NOVA_PASSWORD = "url/criar-nova-senha?token="
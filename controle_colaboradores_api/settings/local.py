@@ -15,4 +15,10 @@ DATABASES = {
         'HOST': os.getenv("DATABASE_HOST"),
         'PORT': os.getenv("DATABASE_PORT")
     }
-}
\ No newline at end of file
+}
+
+# O servidor de desenvolvimento roda em um único processo, de modo que o cache local
+# alcança todas as requisições e as invalidações
+CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT = 5 * 60
+TOKENS_DE_ACESSO_CACHE_TIMEOUT = 5 * 60
+CACHE_DE_RESPOSTAS_TIMEOUT = 5 * 60
@@ -15,6 +15,29 @@ DATABASES = {
     }
 }
 
+# Cache compartilhado entre os processos, por exemplo:
+#  CACHE_BACKEND='django_redis.cache.RedisCache' e CACHE_LOCATION='redis://host:6379/0'
+# Somente com ele são ativados os caches invalidados por signals.
+if os.getenv("CACHE_BACKEND"):
+    CACHES['default'] = {
+        'BACKEND': os.getenv("CACHE_BACKEND"),
+        'LOCATION': os.getenv("CACHE_LOCATION")
+    }
+    CACHE_GRUPOS_DOS_USUARIOS_TIMEOUT = 5 * 60
+    TOKENS_DE_ACESSO_CACHE_TIMEOUT = 5 * 60
+    CACHE_DE_RESPOSTAS_TIMEOUT = 5 * 60
+
+# Cache compartilhado para o throttling, por exemplo:
+#  THROTTLE_CACHE_BACKEND='django_redis.cache.RedisCache' e THROTTLE_CACHE_LOCATION='redis://host:6379/1'
+#  ou THROTTLE_CACHE_BACKEND='django.core.cache.backends.memcached.PyMemcacheCache' e
+#  THROTTLE_CACHE_LOCATION='host:11211'
+if os.getenv("THROTTLE_CACHE_BACKEND"):
+    CACHES['throttle'] = {
+        'BACKEND': os.getenv("THROTTLE_CACHE_BACKEND"),
+        'LOCATION': os.getenv("THROTTLE_CACHE_LOCATION"),
+        'KEY_PREFIX': 'throttle'
+    }
+
 # TODO Definir as configurações de e-mail:
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_USE_TSL = True
@@ -0,0 +1,24 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from model_bakery import baker
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+
+class TestCommand:
+
+    def test_handle(self, db, settings):
+        settings.CACHE_DE_RESPOSTAS_TIMEOUT = 60
+        cache.clear()
+        api_client = APIClient()
+        api_client.force_authenticate(user=baker.make('CustomUsuario', groups=[baker.make('auth.Group',
+                                                                                          name="Administradores")]))
+        for _ in range(3):
+            assert api_client.get(reverse('cargo-list')).status_code == 200
+
+        saida = StringIO()
+        assert call_command('estatisticas_do_cache_de_respostas', stdout=saida) == "Fim da execução bem sucedida."
+        assert "cargos: 2 acertos, 1 falhas (taxa de acertos: 67%)" in saida.getvalue()
+        assert "departamentos: 0 acertos, 0 falhas (taxa de acertos: -)" in saida.getvalue()
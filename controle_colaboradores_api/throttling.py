@@ -0,0 +1,69 @@
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class ThrottlePonderadoMixin:
+    """
+    Limita as requisições por janela fixa de tempo, com um contador por cliente e janela
+    no cache 'throttle', incrementado atomicamente (cache.add e cache.incr). Com um cache
+    compartilhado (Redis, Memcached), o limite vale para todos os processos e servidores,
+    e não para cada um deles.
+
+    Cada requisição consome o custo da action na view, definido em custos_de_throttle
+    (ex.: {'list': 5}), ou 1. Assim, endpoints caros esgotam o limite mais rápido. Com o
+    limite padrão de 60 por minuto, um usuário pode, por minuto, fazer 60 requisições comuns,
+    12 listagens de perfis (custo 5), 6 importações (10) ou 3 exportações (20).
+    """
+    cache_alias = 'throttle'
+    custo_padrao = 1
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_rate(self):
+        # Lida a cada requisição, para acompanhar alterações nas settings
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    @classmethod
+    def obter_custo(cls, view):
+        custos = getattr(view, 'custos_de_throttle', {})
+        return custos.get(getattr(view, 'action', None), cls.custo_padrao)
+
+    def allow_request(self, request, view):
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        agora = self.timer()
+        janela = int(agora // self.duration)
+        chave = f'{self.key}:{janela}'
+        custo = self.obter_custo(view)
+        if self.cache.add(chave, custo, self.duration):
+            consumido = custo
+        else:
+            try:
+                consumido = self.cache.incr(chave, custo)
+            except ValueError:
+                # A chave expirou entre o add e o incr
+                self.cache.add(chave, custo, self.duration)
+                consumido = custo
+
+        self.espera = (janela + 1) * self.duration - agora
+        return consumido <= self.num_requests
+
+    def wait(self):
+        return self.espera
+
+
+class ThrottleDeAnonimos(ThrottlePonderadoMixin, AnonRateThrottle):
+    pass
+
+
+class ThrottleDeUsuarios(ThrottlePonderadoMixin, UserRateThrottle):
+    pass
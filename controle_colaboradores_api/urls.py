@@ -39,7 +39,9 @@ schema_view = get_schema_view(
                   "Os endpoints **enderecos**, **telefones** e **outros-emails** referem-se aos **perfis**.\n"
                   "O endpoint **pwd-reset-tokens** serve para criar tokens para resetar a senha do usuário, "
                   "os quais são enviados automaticamente para o e-mail do usuário e, posteriormente, "
-                  "utilizados com o endpoint **usuarios***/{id}/mudar_password_apos_reset/*.",
+                  "utilizados com o endpoint **usuarios***/{id}/mudar_password_apos_reset/*.\n"
+                  "Para autenticar as requisições, obtenha um token de acesso com e-mail e senha no endpoint "
+                  "**tokens** e envie-o no cabeçalho *Authorization: Token {token}*.",
       terms_of_service="",
       contact=openapi.Contact(email=settings.ADMINS[0][1]),
       license=openapi.License(name="BSD License"),
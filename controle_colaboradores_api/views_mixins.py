@@ -0,0 +1,63 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+class ObjetoEmCacheMixin:
+    """
+    Reaproveita, durante a requisição, o objeto obtido pelo primeiro get_object(),
+    seja ele chamado pelas conditions das access policies ou pela própria action.
+    """
+
+    def get_object(self):
+        if not hasattr(self, '_objeto_em_cache'):
+            self._objeto_em_cache = super().get_object()
+        return self._objeto_em_cache
+
+
+def obter_data_e_hora(request, parametro, fim_do_dia=False):
+    """
+    Data e hora ISO 8601 informadas no parâmetro da requisição, ou None se ausente. Uma data
+    sem hora corresponde ao início do dia ou, com fim_do_dia, ao seu último instante.
+    """
+    valor = request.query_params.get(parametro)
+    if not valor:
+        return None
+
+    try:
+        data_e_hora = parse_datetime(valor)
+        if data_e_hora is None:
+            data = parse_date(valor)
+            if data is not None:
+                data_e_hora = datetime.combine(data, time.max if fim_do_dia else time.min)
+    except ValueError:
+        data_e_hora = None
+    if data_e_hora is None:
+        raise ValidationError({parametro: "Data e hora inválidas. Use o formato ISO 8601, "
+                                          "ex.: 2021-09-30 ou 2021-09-30T18:00:00-03:00."})
+    if timezone.is_naive(data_e_hora):
+        data_e_hora = timezone.make_aware(data_e_hora)
+    return data_e_hora
+
+
+class FiltroModificadoDesdeMixin:
+    """
+    Com ?modificado_desde=<data e hora ISO 8601>, lista somente os objetos modificados a partir
+    do momento informado (inclusive), para que os sistemas que acompanham os dados consultem
+    apenas as alterações. Combinado com ?cursor=&ordenacao=modificacao, percorre as alterações
+    em ordem. As exclusões dos dados para contato são consultadas em exclusoes/ (com
+    ?cursor=&ordenacao=exclusao), cujo campo_de_modificacao é a data da exclusão.
+    """
+    modificado_desde_query_param = 'modificado_desde'
+    campo_de_modificacao = 'modificacao'
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        modificado_desde = obter_data_e_hora(self.request, self.modificado_desde_query_param)
+        if modificado_desde is None:
+            return queryset
+        return queryset.filter(**{f'{self.campo_de_modificacao}__gte': modificado_desde})